@@ -19,6 +19,7 @@ class UserAdmin(BaseUserAdmin):
     inlines = (ProfilInline,)
     list_display = ('username', 'email', 'first_name', 'last_name', 
                    'get_role', 'is_staff', 'is_active')
+    list_select_related = ('profil',)
     list_filter = ('is_staff', 'is_superuser', 'is_active', 'profil__role')
     
     def get_role(self, obj):
@@ -37,6 +38,7 @@ admin.site.register(User, UserAdmin)
 @admin.register(Profil)
 class ProfilAdmin(admin.ModelAdmin):
     list_display = ('user', 'role', 'telephone', 'actif', 'date_creation')
+    list_select_related = ('user',)
     search_fields = ('user__username', 'user__first_name', 'user__last_name', 
                     'telephone')
     list_filter = ('role', 'actif', 'date_creation')
@@ -73,6 +75,7 @@ class ProfilAdmin(admin.ModelAdmin):
 @admin.register(HistoriqueConnexion)
 class HistoriqueConnexionAdmin(admin.ModelAdmin):
     list_display = ('user', 'date_connexion', 'ip_address')
+    list_select_related = ('user',)
     search_fields = ('user__username', 'ip_address')
     list_filter = ('date_connexion',)
     ordering = ('-date_connexion',)
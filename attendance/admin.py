@@ -1,7 +1,9 @@
 from django.contrib import admin
+from django.db import transaction
 from import_export import resources
 from import_export.admin import ImportExportModelAdmin
-from .models import Presence, Justificatif
+from .models import Presence, Justificatif, LotSynchronisation, CompteurPresence
+from .services import appliquer_justificatifs, retirer_justificatifs
 from students.models import Etudiant
 from courses.models import SeanceCours
 
@@ -58,6 +60,7 @@ class PresenceAdmin(ImportExportModelAdmin):
     resource_class = PresenceResource
     list_display = ('etudiant', 'seance', 'statut_display', 'heure_arrivee', 
                    'remarque_courte', 'date_saisie', 'saisi_par')
+    list_select_related = ('etudiant', 'seance__cours', 'saisi_par')
     search_fields = ('etudiant__matricule', 'etudiant__nom', 'etudiant__prenom', 
                     'seance__cours__code', 'seance__cours__intitule')
     list_filter = ('statut', 'seance__date', 'seance__cours__filiere', 
@@ -132,6 +135,7 @@ class JustificatifAdmin(ImportExportModelAdmin):
     resource_class = JustificatifResource
     list_display = ('etudiant', 'type_justificatif', 'date_debut', 'date_fin', 
                    'nombre_jours_display', 'valide_display', 'date_soumission')
+    list_select_related = ('etudiant',)
     search_fields = ('etudiant__matricule', 'etudiant__nom', 'etudiant__prenom', 'motif')
     list_filter = ('type_justificatif', 'valide', 'date_debut', 'date_fin', 'date_soumission')
     ordering = ('-date_soumission',)
@@ -169,19 +173,27 @@ class JustificatifAdmin(ImportExportModelAdmin):
     
     def valider_justificatifs(self, request, queryset):
         from django.utils import timezone
-        count = 0
-        for justificatif in queryset:
-            justificatif.valide = True
-            justificatif.valide_par = request.user
-            justificatif.date_validation = timezone.now()
-            justificatif.save()
-            count += 1
-        self.message_user(request, f'{count} justificatif(s) validé(s).')
+        ids = list(queryset.values_list('id', flat=True))
+        maintenant = timezone.now()
+        with transaction.atomic():
+            count = Justificatif.objects.filter(id__in=ids).update(
+                valide=True, valide_par=request.user,
+                date_validation=maintenant, date_modification=maintenant,
+            )
+            nb_presences = appliquer_justificatifs(ids)
+        self.message_user(request, f'{count} justificatif(s) validé(s), appliqué(s) à {nb_presences} présence(s).')
     valider_justificatifs.short_description = "Valider les justificatifs sélectionnés"
     
     def refuser_justificatifs(self, request, queryset):
-        updated = queryset.update(valide=False, valide_par=None, date_validation=None)
-        self.message_user(request, f'{updated} justificatif(s) refusé(s).')
+        from django.utils import timezone
+        ids = list(queryset.values_list('id', flat=True))
+        with transaction.atomic():
+            nb_presences = retirer_justificatifs(ids)
+            updated = Justificatif.objects.filter(id__in=ids).update(
+                valide=False, valide_par=None, date_validation=None,
+                date_modification=timezone.now(),
+            )
+        self.message_user(request, f'{updated} justificatif(s) refusé(s), {nb_presences} présence(s) remise(s) en Absent.')
     refuser_justificatifs.short_description = "Refuser les justificatifs sélectionnés"
     
     def save_model(self, request, obj, form, change):
@@ -190,4 +202,33 @@ class JustificatifAdmin(ImportExportModelAdmin):
             from django.utils import timezone
             obj.valide_par = request.user
             obj.date_validation = timezone.now()
-        super().save_model(request, obj, form, change)
\ No newline at end of file
+        super().save_model(request, obj, form, change)
+
+
+# ============================================
+# ADMIN POUR LOT DE SYNCHRONISATION
+# ============================================
+
+@admin.register(LotSynchronisation)
+class LotSynchronisationAdmin(admin.ModelAdmin):
+    list_display = ('cle_idempotence', 'utilisateur', 'nombre_marques', 'date_reception')
+    search_fields = ('cle_idempotence', 'utilisateur__username')
+    list_filter = ('date_reception',)
+    ordering = ('-date_reception',)
+    readonly_fields = ('cle_idempotence', 'utilisateur', 'nombre_marques', 'resultat', 'date_reception')
+    date_hierarchy = 'date_reception'
+
+
+@admin.register(CompteurPresence)
+class CompteurPresenceAdmin(admin.ModelAdmin):
+    """Consultation seule : les compteurs sont maintenus par la base (recalculer_compteurs)"""
+    list_display = ('etudiant', 'cours', 'total', 'presents', 'absents', 'retards', 'justifies')
+    search_fields = ('etudiant__matricule', 'etudiant__nom', 'cours__code')
+    list_filter = ('cours__filiere',)
+    list_select_related = ('etudiant', 'cours')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
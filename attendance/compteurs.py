@@ -0,0 +1,128 @@
+# ============================================
+# attendance/compteurs.py
+# Compteurs de présence dénormalisés par étudiant et par cours
+# ============================================
+#
+# La table CompteurPresence est tenue à jour par des triggers sur
+# attendance_presence : chaque INSERT / UPDATE / DELETE ajuste les compteurs
+# dans la même instruction, donc dans la même transaction. Tous les chemins
+# d'écriture sont couverts (save, bulk_create, bulk_update, queryset.update()
+# des actions d'admin, suppressions en cascade, import/export).
+#
+# Triggers installés pour SQLite et PostgreSQL par les migrations attendance
+# 0008 et 0009 (SQL figé dans la migration : toute modification passe par une
+# nouvelle migration). Sur un autre moteur, ou après une écriture SQL faite
+# triggers désactivés : python manage.py recalculer_compteurs (qui recopie
+# aussi la date des séances dans Presence.date_seance).
+
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+STATUTS_COMPTES = [('P', 'presents'), ('A', 'absents'), ('R', 'retards'), ('J', 'justifies')]
+CHAMPS_COMPTEURS = ['total'] + [champ for _, champ in STATUTS_COMPTES]
+
+
+# ============================================
+# RÉCAPITULATIF PAR SÉANCE (colonnes nombre_* de SeanceCours)
+# ============================================
+
+CHAMPS_SEANCE = [(statut, f'nombre_{champ}') for statut, champ in STATUTS_COMPTES]
+
+
+def _nombres_seance():
+    """Expressions {champ: sous-requête} recalculant le récapitulatif depuis les présences"""
+    from .models import Presence
+
+    expressions = {}
+    for statut, champ in CHAMPS_SEANCE:
+        nombre = Presence.objects.filter(seance=OuterRef('pk'), statut=statut).order_by().values(
+            'seance').annotate(n=Count('id')).values('n')
+        expressions[champ] = Coalesce(Subquery(nombre), 0)
+    return expressions
+
+
+# ============================================
+# RECONSTRUCTION / VÉRIFICATION
+# ============================================
+
+def calculer_compteurs(presences):
+    """Compteurs recalculés depuis les présences : {(etudiant_id, cours_id): {champ: valeur}}"""
+    agregats = {'total': Count('id')}
+    for statut, champ in STATUTS_COMPTES:
+        agregats[champ] = Count('id', filter=Q(statut=statut))
+    lignes = presences.order_by().values('etudiant_id', 'seance__cours_id').annotate(**agregats)
+    return {
+        (ligne.pop('etudiant_id'), ligne.pop('seance__cours_id')): ligne
+        for ligne in lignes.iterator(chunk_size=2000)
+    }
+
+
+def reconstruire_compteurs(taille_lot=1000):
+    """Recalcule tous les compteurs depuis la table des présences. Retourne le nombre de lignes"""
+    from .models import Presence, CompteurPresence
+
+    with transaction.atomic():
+        CompteurPresence.objects.all().delete()
+        compteurs = [
+            CompteurPresence(etudiant_id=etudiant_id, cours_id=cours_id, **valeurs)
+            for (etudiant_id, cours_id), valeurs in calculer_compteurs(Presence.objects.all()).items()
+        ]
+        CompteurPresence.objects.bulk_create(compteurs, batch_size=taille_lot)
+        reconstruire_recapitulatifs_seances()
+        reconstruire_dates_seances()
+    return len(compteurs)
+
+
+def reconstruire_recapitulatifs_seances(seances=None):
+    """Recalcule les colonnes nombre_* des séances (une seule requête UPDATE)"""
+    from courses.models import SeanceCours
+
+    seances = SeanceCours.objects.all() if seances is None else seances
+    return seances.update(**_nombres_seance())
+
+
+def reconstruire_dates_seances():
+    """Recopie seance.date dans Presence.date_seance (une seule requête UPDATE)"""
+    from courses.models import SeanceCours
+    from .models import Presence
+
+    return Presence.objects.update(date_seance=Subquery(
+        SeanceCours.objects.filter(pk=OuterRef('seance_id')).values('date')[:1]))
+
+
+def verifier_compteurs():
+    """
+    Compare les compteurs stockés aux présences réelles.
+    Retourne la liste des écarts [(etudiant_id, cours_id, attendu, stocke)].
+    """
+    from .models import Presence, CompteurPresence
+
+    attendus = calculer_compteurs(Presence.objects.all())
+    stockes = {
+        (ligne.pop('etudiant_id'), ligne.pop('cours_id')): ligne
+        for ligne in CompteurPresence.objects.values('etudiant_id', 'cours_id', *CHAMPS_COMPTEURS)
+    }
+    vide = dict.fromkeys(CHAMPS_COMPTEURS, 0)
+    ecarts = []
+    for cle in attendus.keys() | stockes.keys():
+        attendu, stocke = attendus.get(cle, vide), stockes.get(cle, vide)
+        if attendu != stocke:
+            ecarts.append((*cle, attendu, stocke))
+    return sorted(ecarts, key=lambda ecart: ecart[:2])
+
+
+def verifier_recapitulatifs_seances():
+    """Séances dont le récapitulatif diffère des présences : [(seance_id, attendu, stocke)]"""
+    from courses.models import SeanceCours
+
+    champs = [champ for _, champ in CHAMPS_SEANCE]
+    ecarts = []
+    calcules = {f'calcule_{champ}': expression for champ, expression in _nombres_seance().items()}
+    for ligne in SeanceCours.objects.order_by('id').annotate(**calcules).values(
+            'id', *champs, *calcules).iterator(chunk_size=2000):
+        attendu = {champ: ligne[f'calcule_{champ}'] for champ in champs}
+        stocke = {champ: ligne[champ] for champ in champs}
+        if attendu != stocke:
+            ecarts.append((ligne['id'], attendu, stocke))
+    return ecarts
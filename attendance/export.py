@@ -0,0 +1,77 @@
+# ============================================
+# attendance/export.py
+# Export en flux (CSV / XLSX) des listes de présences
+# ============================================
+#
+# Les lignes sont lues par paquets (iterator(chunk_size)) sous forme de tuples,
+# sans instancier de modèles, puis écrites au fil de l'eau :
+# - CSV  : StreamingHttpResponse, rien n'est accumulé en mémoire ;
+# - XLSX : openpyxl en mode write_only (lignes écrites sur disque), le
+#          fichier final est renvoyé par FileResponse depuis un fichier temporaire.
+
+import csv
+import tempfile
+
+from django.http import FileResponse, StreamingHttpResponse
+from openpyxl import Workbook
+
+from .models import Presence
+
+TAILLE_PAQUET = 2000
+
+ENTETES = ['Date', 'Cours', 'Matricule', 'Matricule département', 'Nom', 'Prénom',
+           'Statut', "Heure d'arrivée", 'Remarque']
+CHAMPS = ['seance__date', 'seance__cours__code', 'etudiant__matricule',
+          'etudiant__matricule_departement', 'etudiant__nom', 'etudiant__prenom',
+          'statut', 'heure_arrivee', 'remarque']
+
+LIBELLES_STATUT = dict(Presence.STATUTS)
+
+
+def lignes_presences(presences, taille_paquet=TAILLE_PAQUET):
+    """Génère les lignes d'export (tuples) d'un queryset de présences, par paquets"""
+    for (date_seance, cours, matricule, matricule_dept, nom, prenom,
+         statut, heure, remarque) in presences.values_list(*CHAMPS).iterator(chunk_size=taille_paquet):
+        yield (
+            date_seance, cours, matricule, matricule_dept or '', nom, prenom,
+            LIBELLES_STATUT.get(statut, statut),
+            heure.strftime('%H:%M') if heure else '',
+            remarque or '',
+        )
+
+
+class _Tampon:
+    """Pseudo-fichier pour csv.writer : renvoie la ligne au lieu de l'écrire"""
+
+    def write(self, valeur):
+        return valeur
+
+
+def reponse_csv(presences, nom_fichier):
+    writer = csv.writer(_Tampon(), delimiter=';')
+
+    def contenu():
+        yield '\ufeff'  # BOM : ouverture correcte des accents dans Excel
+        yield writer.writerow(ENTETES)
+        for ligne in lignes_presences(presences):
+            yield writer.writerow(ligne)
+
+    response = StreamingHttpResponse(contenu(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nom_fichier}.csv"'
+    return response
+
+
+def reponse_xlsx(presences, nom_fichier):
+    classeur = Workbook(write_only=True)
+    feuille = classeur.create_sheet('Présences')
+    feuille.append(ENTETES)
+    for ligne in lignes_presences(presences):
+        feuille.append(ligne)
+
+    fichier = tempfile.TemporaryFile()
+    classeur.save(fichier)
+    fichier.seek(0)
+    return FileResponse(
+        fichier, as_attachment=True, filename=f"{nom_fichier}.xlsx",
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
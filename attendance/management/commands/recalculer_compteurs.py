@@ -0,0 +1,33 @@
+# ============================================
+# python manage.py recalculer_compteurs [--verifier]
+# ============================================
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.compteurs import (
+    reconstruire_compteurs, verifier_compteurs, verifier_recapitulatifs_seances,
+)
+
+
+class Command(BaseCommand):
+    help = ("Reconstruit les compteurs de présence (par étudiant et cours, "
+            "et le récapitulatif de chaque séance), puis les vérifie")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verifier', action='store_true',
+                            help="Vérifier seulement, sans reconstruire")
+
+    def handle(self, *args, **options):
+        if not options['verifier']:
+            nombre = reconstruire_compteurs()
+            self.stdout.write(f"{nombre} compteur(s) reconstruit(s)")
+
+        ecarts = verifier_compteurs()
+        for etudiant_id, cours_id, attendu, stocke in ecarts[:20]:
+            self.stderr.write(f"Étudiant {etudiant_id} / cours {cours_id} : attendu {attendu}, stocké {stocke}")
+        ecarts_seances = verifier_recapitulatifs_seances()
+        for seance_id, attendu, stocke in ecarts_seances[:20]:
+            self.stderr.write(f"Séance {seance_id} : attendu {attendu}, stocké {stocke}")
+        if ecarts or ecarts_seances:
+            raise CommandError(f"{len(ecarts)} compteur(s) et {len(ecarts_seances)} séance(s) incorrect(s)")
+        self.stdout.write(self.style.SUCCESS("Compteurs cohérents avec les présences"))
@@ -0,0 +1,37 @@
+# ============================================
+# python manage.py vider_pointages [--boucle] [--intervalle N]
+# ============================================
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from attendance.pointage import purger_pointages, reprendre_lots_abandonnes, vider_tampon
+
+
+class Command(BaseCommand):
+    help = ("Convertit les auto-pointages QR déposés en présences, par lots. Avec --boucle, "
+            "reste actif et surveille le tampon (processus de travail, plusieurs instances possibles)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--boucle', action='store_true',
+                            help="Ne pas s'arrêter quand le tampon est vide")
+        parser.add_argument('--intervalle', type=float, default=2,
+                            help="Secondes entre deux consultations du tampon (avec --boucle)")
+
+    def handle(self, *args, **options):
+        while True:
+            repris = reprendre_lots_abandonnes()
+            if repris:
+                self.stdout.write(f"{repris} pointage(s) d'un vidage interrompu remis en file")
+            nombre = 0
+            while lot := vider_tampon():
+                nombre += lot
+            if nombre:
+                self.stdout.write(f"{nombre} pointage(s) traité(s)")
+                purger_pointages()
+            if not options['boucle']:
+                break
+            close_old_connections()
+            time.sleep(options['intervalle'])
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0004_presence_justificatif_formel_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LotSynchronisation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cle_idempotence', models.CharField(help_text="Clé générée par l'appareil pour ce lot", max_length=64, unique=True, verbose_name="Clé d'idempotence")),
+                ('nombre_marques', models.IntegerField(default=0, verbose_name='Nombre de marques')),
+                ('resultat', models.JSONField(default=dict, help_text="Réponse renvoyée à l'appareil (rejouée à l'identique)", verbose_name='Résultat')),
+                ('date_reception', models.DateTimeField(auto_now_add=True, verbose_name='Date de réception')),
+                ('utilisateur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lots_synchronisation', to=settings.AUTH_USER_MODEL, verbose_name='Envoyé par')),
+            ],
+            options={
+                'verbose_name': 'Lot de synchronisation',
+                'verbose_name_plural': 'Lots de synchronisation',
+                'ordering': ['-date_reception'],
+            },
+        ),
+    ]
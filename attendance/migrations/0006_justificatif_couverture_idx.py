@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0005_lotsynchronisation'),
+        ('students', '0005_alter_filiere_niveau'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='justificatif',
+            index=models.Index(fields=['etudiant', 'valide', 'date_debut', 'date_fin'], name='justificatif_couverture_idx'),
+        ),
+    ]
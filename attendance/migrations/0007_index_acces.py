@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0006_justificatif_couverture_idx'),
+        ('courses', '0008_index_acces'),
+        ('students', '0007_index_acces'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='justificatif',
+            index=models.Index(condition=models.Q(('valide', False)), fields=['-date_soumission'], name='justificatif_en_attente_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='justificatif',
+            index=models.Index(condition=models.Q(('valide', True)), fields=['-date_soumission'], name='justificatif_valides_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='presence',
+            index=models.Index(fields=['seance', 'statut'], name='presence_seance_statut_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='presence',
+            index=models.Index(fields=['etudiant', 'statut'], name='presence_etudiant_statut_idx'),
+        ),
+    ]
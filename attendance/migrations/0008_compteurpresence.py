@@ -0,0 +1,259 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+# SQL figé à la création de la migration (ne pas le régénérer depuis le code)
+
+CREATION_SQLITE = [
+    """
+    CREATE TRIGGER attendance_compteur_ai AFTER INSERT
+    ON attendance_presence
+    BEGIN
+        INSERT INTO attendance_compteurpresence (etudiant_id, cours_id, total, presents, absents, retards, justifies)
+        SELECT new.etudiant_id, s.cours_id, 1, CASE WHEN new.statut = 'P' THEN 1 ELSE 0 END,
+        CASE WHEN new.statut = 'A' THEN 1 ELSE 0 END,
+        CASE WHEN new.statut = 'R' THEN 1 ELSE 0 END,
+        CASE WHEN new.statut = 'J' THEN 1 ELSE 0 END
+        FROM courses_seancecours s
+        WHERE s.id = new.seance_id
+        ON CONFLICT (etudiant_id, cours_id)
+        DO UPDATE SET total = attendance_compteurpresence.total + EXCLUDED.total,
+        presents = attendance_compteurpresence.presents + EXCLUDED.presents,
+        absents = attendance_compteurpresence.absents + EXCLUDED.absents,
+        retards = attendance_compteurpresence.retards + EXCLUDED.retards,
+        justifies = attendance_compteurpresence.justifies + EXCLUDED.justifies;
+    END
+    """,
+    """
+    CREATE TRIGGER attendance_compteur_ad AFTER DELETE
+    ON attendance_presence
+    BEGIN
+        UPDATE attendance_compteurpresence
+        SET total = total - 1,
+        presents = presents - CASE WHEN old.statut = 'P' THEN 1 ELSE 0 END,
+        absents = absents - CASE WHEN old.statut = 'A' THEN 1 ELSE 0 END,
+        retards = retards - CASE WHEN old.statut = 'R' THEN 1 ELSE 0 END,
+        justifies = justifies - CASE WHEN old.statut = 'J' THEN 1 ELSE 0 END
+        WHERE etudiant_id = old.etudiant_id
+        AND cours_id = (SELECT cours_id
+        FROM courses_seancecours
+        WHERE id = old.seance_id);
+    END
+    """,
+    """
+    CREATE TRIGGER attendance_compteur_au AFTER UPDATE OF statut, etudiant_id, seance_id
+    ON attendance_presence
+    WHEN old.statut <> new.statut
+    OR old.etudiant_id <> new.etudiant_id
+    OR old.seance_id <> new.seance_id
+    BEGIN
+        UPDATE attendance_compteurpresence
+        SET total = total - 1,
+        presents = presents - CASE WHEN old.statut = 'P' THEN 1 ELSE 0 END,
+        absents = absents - CASE WHEN old.statut = 'A' THEN 1 ELSE 0 END,
+        retards = retards - CASE WHEN old.statut = 'R' THEN 1 ELSE 0 END,
+        justifies = justifies - CASE WHEN old.statut = 'J' THEN 1 ELSE 0 END
+        WHERE etudiant_id = old.etudiant_id
+        AND cours_id = (SELECT cours_id
+        FROM courses_seancecours
+        WHERE id = old.seance_id);
+        INSERT INTO attendance_compteurpresence (etudiant_id, cours_id, total, presents, absents, retards, justifies)
+        SELECT new.etudiant_id, s.cours_id, 1, CASE WHEN new.statut = 'P' THEN 1 ELSE 0 END,
+        CASE WHEN new.statut = 'A' THEN 1 ELSE 0 END,
+        CASE WHEN new.statut = 'R' THEN 1 ELSE 0 END,
+        CASE WHEN new.statut = 'J' THEN 1 ELSE 0 END
+        FROM courses_seancecours s
+        WHERE s.id = new.seance_id
+        ON CONFLICT (etudiant_id, cours_id)
+        DO UPDATE SET total = attendance_compteurpresence.total + EXCLUDED.total,
+        presents = attendance_compteurpresence.presents + EXCLUDED.presents,
+        absents = attendance_compteurpresence.absents + EXCLUDED.absents,
+        retards = attendance_compteurpresence.retards + EXCLUDED.retards,
+        justifies = attendance_compteurpresence.justifies + EXCLUDED.justifies;
+    END
+    """,
+    """
+    CREATE TRIGGER attendance_compteur_seance_au AFTER UPDATE OF cours_id
+    ON courses_seancecours
+    WHEN old.cours_id <> new.cours_id
+    BEGIN
+        DELETE FROM attendance_compteurpresence
+        WHERE cours_id IN (old.cours_id, new.cours_id)
+        AND etudiant_id IN (SELECT etudiant_id
+        FROM attendance_presence
+        WHERE seance_id = new.id);
+        INSERT INTO attendance_compteurpresence (etudiant_id, cours_id, total, presents, absents, retards, justifies)
+        SELECT p.etudiant_id, s.cours_id, COUNT(*),
+        SUM(CASE WHEN p.statut = 'P' THEN 1 ELSE 0 END),
+        SUM(CASE WHEN p.statut = 'A' THEN 1 ELSE 0 END),
+        SUM(CASE WHEN p.statut = 'R' THEN 1 ELSE 0 END),
+        SUM(CASE WHEN p.statut = 'J' THEN 1 ELSE 0 END)
+        FROM attendance_presence p
+        JOIN courses_seancecours s ON s.id = p.seance_id
+        WHERE s.cours_id IN (old.cours_id, new.cours_id)
+        AND p.etudiant_id IN (SELECT etudiant_id
+        FROM attendance_presence
+        WHERE seance_id = new.id)
+        GROUP BY p.etudiant_id, s.cours_id;
+    END
+    """,
+]
+
+SUPPRESSION_SQLITE = [
+    "DROP TRIGGER IF EXISTS attendance_compteur_ai",
+    "DROP TRIGGER IF EXISTS attendance_compteur_ad",
+    "DROP TRIGGER IF EXISTS attendance_compteur_au",
+    "DROP TRIGGER IF EXISTS attendance_compteur_seance_au",
+]
+
+CREATION_POSTGRESQL = [
+    """
+    CREATE OR REPLACE FUNCTION attendance_compteur_presence() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            UPDATE attendance_compteurpresence
+            SET total = total - 1,
+            presents = presents - CASE WHEN old.statut = 'P' THEN 1 ELSE 0 END,
+            absents = absents - CASE WHEN old.statut = 'A' THEN 1 ELSE 0 END,
+            retards = retards - CASE WHEN old.statut = 'R' THEN 1 ELSE 0 END,
+            justifies = justifies - CASE WHEN old.statut = 'J' THEN 1 ELSE 0 END
+            WHERE etudiant_id = old.etudiant_id
+            AND cours_id = (SELECT cours_id
+            FROM courses_seancecours
+            WHERE id = old.seance_id);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO attendance_compteurpresence (etudiant_id, cours_id, total, presents, absents, retards, justifies)
+            SELECT new.etudiant_id, s.cours_id, 1, CASE WHEN new.statut = 'P' THEN 1 ELSE 0 END,
+            CASE WHEN new.statut = 'A' THEN 1 ELSE 0 END,
+            CASE WHEN new.statut = 'R' THEN 1 ELSE 0 END,
+            CASE WHEN new.statut = 'J' THEN 1 ELSE 0 END
+            FROM courses_seancecours s
+            WHERE s.id = new.seance_id
+            ON CONFLICT (etudiant_id, cours_id)
+            DO UPDATE SET total = attendance_compteurpresence.total + EXCLUDED.total,
+            presents = attendance_compteurpresence.presents + EXCLUDED.presents,
+            absents = attendance_compteurpresence.absents + EXCLUDED.absents,
+            retards = attendance_compteurpresence.retards + EXCLUDED.retards,
+            justifies = attendance_compteurpresence.justifies + EXCLUDED.justifies;
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER attendance_compteur_aid AFTER INSERT OR DELETE
+    ON attendance_presence
+    FOR EACH ROW
+    EXECUTE FUNCTION attendance_compteur_presence()
+    """,
+    """
+    CREATE TRIGGER attendance_compteur_au AFTER UPDATE OF statut, etudiant_id, seance_id
+    ON attendance_presence
+    FOR EACH ROW WHEN (old.statut <> new.statut
+    OR old.etudiant_id <> new.etudiant_id
+    OR old.seance_id <> new.seance_id)
+    EXECUTE FUNCTION attendance_compteur_presence()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION attendance_compteur_seance() RETURNS trigger AS $$
+    BEGIN
+        DELETE FROM attendance_compteurpresence
+        WHERE cours_id IN (old.cours_id, new.cours_id)
+        AND etudiant_id IN (SELECT etudiant_id
+        FROM attendance_presence
+        WHERE seance_id = new.id);
+        INSERT INTO attendance_compteurpresence (etudiant_id, cours_id, total, presents, absents, retards, justifies)
+        SELECT p.etudiant_id, s.cours_id, COUNT(*),
+        SUM(CASE WHEN p.statut = 'P' THEN 1 ELSE 0 END),
+        SUM(CASE WHEN p.statut = 'A' THEN 1 ELSE 0 END),
+        SUM(CASE WHEN p.statut = 'R' THEN 1 ELSE 0 END),
+        SUM(CASE WHEN p.statut = 'J' THEN 1 ELSE 0 END)
+        FROM attendance_presence p
+        JOIN courses_seancecours s ON s.id = p.seance_id
+        WHERE s.cours_id IN (old.cours_id, new.cours_id)
+        AND p.etudiant_id IN (SELECT etudiant_id
+        FROM attendance_presence
+        WHERE seance_id = new.id)
+        GROUP BY p.etudiant_id, s.cours_id;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER attendance_compteur_seance_au AFTER UPDATE OF cours_id
+    ON courses_seancecours
+    FOR EACH ROW WHEN (old.cours_id <> new.cours_id)
+    EXECUTE FUNCTION attendance_compteur_seance()
+    """,
+]
+
+SUPPRESSION_POSTGRESQL = [
+    "DROP TRIGGER IF EXISTS attendance_compteur_aid ON attendance_presence",
+    "DROP TRIGGER IF EXISTS attendance_compteur_au ON attendance_presence",
+    "DROP TRIGGER IF EXISTS attendance_compteur_seance_au ON courses_seancecours",
+    "DROP FUNCTION IF EXISTS attendance_compteur_presence()",
+    "DROP FUNCTION IF EXISTS attendance_compteur_seance()",
+]
+
+CREATION = {'sqlite': CREATION_SQLITE, 'postgresql': CREATION_POSTGRESQL}
+SUPPRESSION = {'sqlite': SUPPRESSION_SQLITE, 'postgresql': SUPPRESSION_POSTGRESQL}
+
+
+def initialiser_compteurs(apps, schema_editor):
+    Presence = apps.get_model('attendance', 'Presence')
+    CompteurPresence = apps.get_model('attendance', 'CompteurPresence')
+    lignes = Presence.objects.order_by().values('etudiant_id', 'seance__cours_id').annotate(
+        total=Count('id'),
+        presents=Count('id', filter=Q(statut='P')),
+        absents=Count('id', filter=Q(statut='A')),
+        retards=Count('id', filter=Q(statut='R')),
+        justifies=Count('id', filter=Q(statut='J')),
+    )
+    CompteurPresence.objects.bulk_create([
+        CompteurPresence(etudiant_id=ligne.pop('etudiant_id'), cours_id=ligne.pop('seance__cours_id'), **ligne)
+        for ligne in lignes
+    ], batch_size=1000)
+
+
+def creer_triggers(apps, schema_editor):
+    # Autres moteurs : pas de triggers (python manage.py recalculer_compteurs)
+    for sql in CREATION.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def supprimer_triggers(apps, schema_editor):
+    for sql in SUPPRESSION.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0007_index_acces'),
+        ('courses', '0008_index_acces'),
+        ('students', '0007_index_acces'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompteurPresence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.IntegerField(default=0, verbose_name='Total')),
+                ('presents', models.IntegerField(default=0, verbose_name='Présents')),
+                ('absents', models.IntegerField(default=0, verbose_name='Absents')),
+                ('retards', models.IntegerField(default=0, verbose_name='Retards')),
+                ('justifies', models.IntegerField(default=0, verbose_name='Justifiés')),
+                ('cours', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='compteurs_presence', to='courses.cours', verbose_name='Cours')),
+                ('etudiant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='compteurs_presence', to='students.etudiant', verbose_name='Étudiant')),
+            ],
+            options={
+                'verbose_name': 'Compteur de présence',
+                'verbose_name_plural': 'Compteurs de présence',
+                'unique_together': {('etudiant', 'cours')},
+            },
+        ),
+        migrations.RunPython(initialiser_compteurs, migrations.RunPython.noop),
+        migrations.RunPython(creer_triggers, supprimer_triggers),
+    ]
@@ -0,0 +1,143 @@
+# Triggers du récapitulatif des présences par séance (SeanceCours.nombre_*)
+
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+# SQL figé à la création de la migration (ne pas le régénérer depuis le code)
+
+CREATION_SQLITE = [
+    """
+    CREATE TRIGGER attendance_seance_ai AFTER INSERT
+    ON attendance_presence
+    BEGIN
+        UPDATE courses_seancecours
+        SET nombre_presents = nombre_presents + CASE WHEN new.statut = 'P' THEN 1 ELSE 0 END,
+        nombre_absents = nombre_absents + CASE WHEN new.statut = 'A' THEN 1 ELSE 0 END,
+        nombre_retards = nombre_retards + CASE WHEN new.statut = 'R' THEN 1 ELSE 0 END,
+        nombre_justifies = nombre_justifies + CASE WHEN new.statut = 'J' THEN 1 ELSE 0 END
+        WHERE id = new.seance_id;
+    END
+    """,
+    """
+    CREATE TRIGGER attendance_seance_ad AFTER DELETE
+    ON attendance_presence
+    BEGIN
+        UPDATE courses_seancecours
+        SET nombre_presents = nombre_presents - CASE WHEN old.statut = 'P' THEN 1 ELSE 0 END,
+        nombre_absents = nombre_absents - CASE WHEN old.statut = 'A' THEN 1 ELSE 0 END,
+        nombre_retards = nombre_retards - CASE WHEN old.statut = 'R' THEN 1 ELSE 0 END,
+        nombre_justifies = nombre_justifies - CASE WHEN old.statut = 'J' THEN 1 ELSE 0 END
+        WHERE id = old.seance_id;
+    END
+    """,
+    """
+    CREATE TRIGGER attendance_seance_au AFTER UPDATE OF statut, seance_id
+    ON attendance_presence
+    WHEN old.statut <> new.statut
+    OR old.seance_id <> new.seance_id
+    BEGIN
+        UPDATE courses_seancecours
+        SET nombre_presents = nombre_presents - CASE WHEN old.statut = 'P' THEN 1 ELSE 0 END,
+        nombre_absents = nombre_absents - CASE WHEN old.statut = 'A' THEN 1 ELSE 0 END,
+        nombre_retards = nombre_retards - CASE WHEN old.statut = 'R' THEN 1 ELSE 0 END,
+        nombre_justifies = nombre_justifies - CASE WHEN old.statut = 'J' THEN 1 ELSE 0 END
+        WHERE id = old.seance_id;
+        UPDATE courses_seancecours
+        SET nombre_presents = nombre_presents + CASE WHEN new.statut = 'P' THEN 1 ELSE 0 END,
+        nombre_absents = nombre_absents + CASE WHEN new.statut = 'A' THEN 1 ELSE 0 END,
+        nombre_retards = nombre_retards + CASE WHEN new.statut = 'R' THEN 1 ELSE 0 END,
+        nombre_justifies = nombre_justifies + CASE WHEN new.statut = 'J' THEN 1 ELSE 0 END
+        WHERE id = new.seance_id;
+    END
+    """,
+]
+
+SUPPRESSION_SQLITE = [
+    "DROP TRIGGER IF EXISTS attendance_seance_ai",
+    "DROP TRIGGER IF EXISTS attendance_seance_ad",
+    "DROP TRIGGER IF EXISTS attendance_seance_au",
+]
+
+CREATION_POSTGRESQL = [
+    """
+    CREATE OR REPLACE FUNCTION attendance_recapitulatif_seance() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            UPDATE courses_seancecours
+            SET nombre_presents = nombre_presents - CASE WHEN old.statut = 'P' THEN 1 ELSE 0 END,
+            nombre_absents = nombre_absents - CASE WHEN old.statut = 'A' THEN 1 ELSE 0 END,
+            nombre_retards = nombre_retards - CASE WHEN old.statut = 'R' THEN 1 ELSE 0 END,
+            nombre_justifies = nombre_justifies - CASE WHEN old.statut = 'J' THEN 1 ELSE 0 END
+            WHERE id = old.seance_id;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            UPDATE courses_seancecours
+            SET nombre_presents = nombre_presents + CASE WHEN new.statut = 'P' THEN 1 ELSE 0 END,
+            nombre_absents = nombre_absents + CASE WHEN new.statut = 'A' THEN 1 ELSE 0 END,
+            nombre_retards = nombre_retards + CASE WHEN new.statut = 'R' THEN 1 ELSE 0 END,
+            nombre_justifies = nombre_justifies + CASE WHEN new.statut = 'J' THEN 1 ELSE 0 END
+            WHERE id = new.seance_id;
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER attendance_seance_aid AFTER INSERT OR DELETE
+    ON attendance_presence
+    FOR EACH ROW
+    EXECUTE FUNCTION attendance_recapitulatif_seance()
+    """,
+    """
+    CREATE TRIGGER attendance_seance_au AFTER UPDATE OF statut, seance_id
+    ON attendance_presence
+    FOR EACH ROW WHEN (old.statut <> new.statut
+    OR old.seance_id <> new.seance_id)
+    EXECUTE FUNCTION attendance_recapitulatif_seance()
+    """,
+]
+
+SUPPRESSION_POSTGRESQL = [
+    "DROP TRIGGER IF EXISTS attendance_seance_aid ON attendance_presence",
+    "DROP TRIGGER IF EXISTS attendance_seance_au ON attendance_presence",
+    "DROP FUNCTION IF EXISTS attendance_recapitulatif_seance()",
+]
+
+CREATION = {'sqlite': CREATION_SQLITE, 'postgresql': CREATION_POSTGRESQL}
+SUPPRESSION = {'sqlite': SUPPRESSION_SQLITE, 'postgresql': SUPPRESSION_POSTGRESQL}
+
+
+def initialiser_recapitulatifs(apps, schema_editor):
+    Presence = apps.get_model('attendance', 'Presence')
+    SeanceCours = apps.get_model('courses', 'SeanceCours')
+    valeurs = {}
+    for statut, champ in [('P', 'nombre_presents'), ('A', 'nombre_absents'),
+                          ('R', 'nombre_retards'), ('J', 'nombre_justifies')]:
+        nombre = Presence.objects.filter(seance=OuterRef('pk'), statut=statut).order_by().values(
+            'seance').annotate(n=Count('id')).values('n')
+        valeurs[champ] = Coalesce(Subquery(nombre), 0)
+    SeanceCours.objects.update(**valeurs)
+
+
+def creer_triggers(apps, schema_editor):
+    # Autres moteurs : pas de triggers (python manage.py recalculer_compteurs)
+    for sql in CREATION.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def supprimer_triggers(apps, schema_editor):
+    for sql in SUPPRESSION.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0008_compteurpresence'),
+        ('courses', '0009_seancecours_recapitulatif'),
+    ]
+
+    operations = [
+        migrations.RunPython(initialiser_recapitulatifs, migrations.RunPython.noop),
+        migrations.RunPython(creer_triggers, supprimer_triggers),
+    ]
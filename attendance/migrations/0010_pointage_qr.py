@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-17 07:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0009_recapitulatif_seances'),
+        ('courses', '0009_seancecours_recapitulatif'),
+        ('students', '0008_sequence_matricule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PointageQR',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('appareil', models.CharField(help_text='Identifiant aléatoire du navigateur (cookie signé)', max_length=32, verbose_name='Appareil')),
+                ('horodatage', models.DateTimeField(verbose_name='Heure du scan')),
+                ('date_traitement', models.DateTimeField(blank=True, null=True, verbose_name='Converti en présence le')),
+                ('etudiant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pointages_qr', to='students.etudiant', verbose_name='Étudiant')),
+                ('seance', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pointages_qr', to='courses.seancecours', verbose_name='Séance')),
+            ],
+            options={
+                'verbose_name': 'Pointage QR',
+                'verbose_name_plural': 'Pointages QR',
+                'indexes': [models.Index(fields=['date_traitement', 'id'], name='pointage_a_traiter_idx')],
+                'constraints': [models.UniqueConstraint(fields=('seance', 'etudiant'), name='pointage_seance_etudiant_uniq'), models.UniqueConstraint(fields=('seance', 'appareil'), name='pointage_seance_appareil_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-17 07:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0010_pointage_qr'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='lotsynchronisation',
+            name='cle_idempotence',
+            field=models.CharField(help_text="Clé générée par l'appareil pour ce lot", max_length=64, verbose_name="Clé d'idempotence"),
+        ),
+        migrations.AddConstraint(
+            model_name='lotsynchronisation',
+            constraint=models.UniqueConstraint(fields=('utilisateur', 'cle_idempotence'), name='lot_utilisateur_cle_uniq'),
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.7 on 2026-10-17 07:25
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+# Presence.date_seance : copie de seance.date écrite par l'application
+# (Presence.save, écritures groupées, SeanceCours.save). Ajoutée nullable,
+# remplie, puis rendue obligatoire.
+#
+# Sous SQLite, rendre la colonne obligatoire reconstruit la table : les
+# triggers qui la lisent ou l'écrivent (compteurs, migrations 0008 et 0009)
+# sont mis de côté pendant la reconstruction puis recréés à l'identique.
+
+
+def initialiser_dates(apps, schema_editor):
+    Presence = apps.get_model('attendance', 'Presence')
+    SeanceCours = apps.get_model('courses', 'SeanceCours')
+    Presence.objects.update(date_seance=Subquery(
+        SeanceCours.objects.filter(pk=OuterRef('seance_id')).values('date')[:1]))
+
+
+def _triggers_presence(connection):
+    """Triggers SQLite dont le code porte sur attendance_presence : [(nom, sql)]"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND sql LIKE %s",
+                       ['%attendance_presence%'])
+        return cursor.fetchall()
+
+
+def _modifier_date_seance(apps, schema_editor, null):
+    Presence = apps.get_model('attendance', 'Presence')
+    ancien = Presence._meta.get_field('date_seance')
+    nouveau = ancien.clone()
+    nouveau.null = nouveau.blank = null
+    nouveau.set_attributes_from_name('date_seance')
+    nouveau.model = Presence
+
+    triggers = []
+    if schema_editor.connection.vendor == 'sqlite':
+        triggers = _triggers_presence(schema_editor.connection)
+        for nom, _ in triggers:
+            schema_editor.execute(f"DROP TRIGGER {nom}")
+    schema_editor.alter_field(Presence, ancien, nouveau)
+    for _, sql in triggers:
+        schema_editor.execute(sql)
+
+
+def rendre_obligatoire(apps, schema_editor):
+    _modifier_date_seance(apps, schema_editor, null=False)
+
+
+def rendre_facultative(apps, schema_editor):
+    _modifier_date_seance(apps, schema_editor, null=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0011_lot_cle_par_utilisateur'),
+        ('courses', '0009_seancecours_recapitulatif'),
+        ('students', '0008_sequence_matricule'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='presence',
+            name='date_seance',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Date de la séance'),
+        ),
+        migrations.AddIndex(
+            model_name='presence',
+            index=models.Index(fields=['-date_seance', 'id'], name='presence_date_seance_idx'),
+        ),
+        migrations.RunPython(initialiser_dates, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(rendre_obligatoire, rendre_facultative)],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='presence',
+                    name='date_seance',
+                    field=models.DateField(editable=False, verbose_name='Date de la séance'),
+                ),
+            ],
+        ),
+    ]
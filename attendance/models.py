@@ -2,7 +2,7 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import FileExtensionValidator
 from students.models import Etudiant
-from courses.models import SeanceCours
+from courses.models import SeanceCours, Cours
 from datetime import datetime
 
 
@@ -51,16 +51,36 @@ class Presence(models.Model):
                                        verbose_name="Date de saisie")
     date_modification = models.DateTimeField(auto_now=True,
                                             verbose_name="Date de modification")
+    # Copie de seance.date (clé de la pagination par curseur, indexée), écrite
+    # par save(), par les écritures groupées de services.py et par
+    # SeanceCours.save() quand la date change. Non nulle : un chemin
+    # d'écriture qui l'oublierait échoue au lieu de cacher des lignes.
+    date_seance = models.DateField(editable=False, verbose_name="Date de la séance")
     
     class Meta:
         verbose_name = "Présence"
         verbose_name_plural = "Présences"
         ordering = ['-seance__date', 'etudiant__nom']
         unique_together = ['etudiant', 'seance']
+        indexes = [
+            # Comptages par statut d'une séance (feuille d'appel, statistiques de séance)
+            models.Index(fields=['seance', 'statut'], name='presence_seance_statut_idx'),
+            # Comptages par statut d'un étudiant (taux de présence, fiche étudiant)
+            models.Index(fields=['etudiant', 'statut'], name='presence_etudiant_statut_idx'),
+            # Listes paginées par curseur (attendance/pagination.py)
+            models.Index(fields=['-date_seance', 'id'], name='presence_date_seance_idx'),
+        ]
     
     def __str__(self):
         return f"{self.etudiant.matricule} - {self.seance.cours.code} ({self.get_statut_display()})"
     
+    def save(self, *args, **kwargs):
+        """Recopie la date de la séance (relue : l'instance chargée peut être périmée)"""
+        self.date_seance = SeanceCours.objects.filter(pk=self.seance_id).values_list('date', flat=True).first()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'date_seance'}
+        super().save(*args, **kwargs)
+    
     def est_present(self):
         """Vérifie si l'étudiant est considéré comme présent"""
         return self.statut in ['P', 'R', 'J']
@@ -138,6 +158,18 @@ class Justificatif(models.Model):
         verbose_name = "Justificatif"
         verbose_name_plural = "Justificatifs"
         ordering = ['-date_soumission']
+        indexes = [
+            # Recherche des justificatifs validés couvrant une date (saisie des présences)
+            models.Index(fields=['etudiant', 'valide', 'date_debut', 'date_fin'],
+                         name='justificatif_couverture_idx'),
+            # Listes des justificatifs en attente / validés, les plus récents d'abord.
+            # Index partiels : Django écrit valide=False en "NOT valide", ce qu'un
+            # index (valide, date_soumission) ne peut pas servir sous SQLite.
+            models.Index(fields=['-date_soumission'], condition=models.Q(valide=False),
+                         name='justificatif_en_attente_idx'),
+            models.Index(fields=['-date_soumission'], condition=models.Q(valide=True),
+                         name='justificatif_valides_idx'),
+        ]
     
     def __str__(self):
         return f"{self.etudiant.matricule} - {self.get_type_justificatif_display()} ({self.date_debut})"
@@ -173,28 +205,112 @@ class Justificatif(models.Model):
         return Presence.objects.filter(query)
     
     def appliquer_aux_presences(self):
-        """Applique ce justificatif à toutes les présences concernées"""
-        presences = self.presences_concernees()
-        count = 0
-        
-        for presence in presences:
-            if presence.statut == 'A':  # Seulement les absences
-                presence.statut = 'J'
-                presence.justificatif_formel = self
-                presence.save()
-                count += 1
-        
-        return count
+        """
+        Applique ce justificatif à toutes les absences concernées
+        (une seule requête UPDATE). Retourne le nombre de présences modifiées.
+        """
+        from .services import appliquer_justificatifs
+        return appliquer_justificatifs([self.id])
     
     def retirer_des_presences(self):
-        """Retire ce justificatif des présences (en cas de refus)"""
-        presences = Presence.objects.filter(justificatif_formel=self)
-        count = 0
-        
-        for presence in presences:
-            presence.statut = 'A'  # Remettre en absent
-            presence.justificatif_formel = None
-            presence.save()
-            count += 1
-        
-        return count
\ No newline at end of file
+        """
+        Retire ce justificatif des présences (en cas de refus)
+        (une seule requête UPDATE). Retourne le nombre de présences modifiées.
+        """
+        from .services import retirer_justificatifs
+        return retirer_justificatifs([self.id])
+
+
+class LotSynchronisation(models.Model):
+    """Lots de présences envoyés hors ligne (garantit l'idempotence des renvois)"""
+    
+    cle_idempotence = models.CharField(max_length=64,
+                                       verbose_name="Clé d'idempotence",
+                                       help_text="Clé générée par l'appareil pour ce lot")
+    utilisateur = models.ForeignKey(User, on_delete=models.SET_NULL,
+                                    null=True, blank=True,
+                                    related_name='lots_synchronisation',
+                                    verbose_name="Envoyé par")
+    nombre_marques = models.IntegerField(default=0,
+                                         verbose_name="Nombre de marques")
+    resultat = models.JSONField(default=dict,
+                                verbose_name="Résultat",
+                                help_text="Réponse renvoyée à l'appareil (rejouée à l'identique)")
+    date_reception = models.DateTimeField(auto_now_add=True,
+                                          verbose_name="Date de réception")
+    
+    class Meta:
+        verbose_name = "Lot de synchronisation"
+        verbose_name_plural = "Lots de synchronisation"
+        ordering = ['-date_reception']
+        constraints = [
+            # La clé est propre à l'utilisateur : celle d'un autre ne rejoue jamais son lot
+            models.UniqueConstraint(fields=['utilisateur', 'cle_idempotence'],
+                                    name='lot_utilisateur_cle_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.cle_idempotence} ({self.nombre_marques} marque(s))"
+
+
+class PointageQR(models.Model):
+    """
+    Auto-pointages QR vérifiés (voir attendance/pointage.py).
+    Écrits par lots depuis le tampon de fichiers, avec les présences correspondantes.
+    """
+    
+    seance = models.ForeignKey(SeanceCours, on_delete=models.CASCADE,
+                               related_name='pointages_qr',
+                               verbose_name="Séance")
+    etudiant = models.ForeignKey(Etudiant, on_delete=models.CASCADE,
+                                 related_name='pointages_qr',
+                                 verbose_name="Étudiant")
+    appareil = models.CharField(max_length=32, verbose_name="Appareil",
+                                help_text="Identifiant aléatoire du navigateur (cookie signé)")
+    horodatage = models.DateTimeField(verbose_name="Heure du scan")
+    date_traitement = models.DateTimeField(null=True, blank=True,
+                                           verbose_name="Converti en présence le")
+    
+    class Meta:
+        verbose_name = "Pointage QR"
+        verbose_name_plural = "Pointages QR"
+        constraints = [
+            # Un pointage par étudiant et un étudiant par appareil, pour chaque séance
+            models.UniqueConstraint(fields=['seance', 'etudiant'], name='pointage_seance_etudiant_uniq'),
+            models.UniqueConstraint(fields=['seance', 'appareil'], name='pointage_seance_appareil_uniq'),
+        ]
+        indexes = [
+            # Pointages d'un lot (vidage du tampon) et purge des plus anciens
+            models.Index(fields=['date_traitement', 'id'], name='pointage_a_traiter_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.etudiant_id} - séance {self.seance_id} ({self.horodatage:%H:%M:%S})"
+
+
+class CompteurPresence(models.Model):
+    """
+    Compteurs de présence d'un étudiant pour un cours (dénormalisés).
+    Tenus à jour par des triggers sur les présences (voir attendance/compteurs.py) :
+    ne pas modifier à la main, utiliser la commande recalculer_compteurs.
+    """
+    
+    etudiant = models.ForeignKey(Etudiant, on_delete=models.CASCADE,
+                                 related_name='compteurs_presence',
+                                 verbose_name="Étudiant")
+    cours = models.ForeignKey(Cours, on_delete=models.CASCADE,
+                              related_name='compteurs_presence',
+                              verbose_name="Cours")
+    total = models.IntegerField(default=0, verbose_name="Total")
+    presents = models.IntegerField(default=0, verbose_name="Présents")
+    absents = models.IntegerField(default=0, verbose_name="Absents")
+    retards = models.IntegerField(default=0, verbose_name="Retards")
+    justifies = models.IntegerField(default=0, verbose_name="Justifiés")
+    
+    class Meta:
+        verbose_name = "Compteur de présence"
+        verbose_name_plural = "Compteurs de présence"
+        unique_together = ['etudiant', 'cours']
+    
+    def __str__(self):
+        return f"{self.etudiant.matricule} - {self.cours.code} ({self.total})"
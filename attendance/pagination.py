@@ -0,0 +1,137 @@
+# ============================================
+# attendance/pagination.py
+# Pagination par curseur (keyset) des listes de présences
+# ============================================
+#
+# Au lieu de OFFSET (de plus en plus lent sur les pages éloignées) et d'un
+# COUNT à chaque page, on repart de la dernière ligne affichée :
+# la page 500 coûte autant que la page 1.
+#
+# Clé : (date de séance décroissante, nom de l'étudiant, id), l'ordre des
+# listes. La date est lue dans l'index presence_date_seance_idx à partir du
+# curseur (date_seance est la copie de seance.date dans la présence) : seules
+# les présences d'une même date sont triées par nom, jamais tout l'historique.
+
+from datetime import date
+
+from django.core import signing
+from django.db import DatabaseError, connection
+from django.db.models import Q
+
+SEL_CURSEUR = 'attendance.pagination'
+ORDRE_PRESENCES = ('-date_seance', 'etudiant__nom', 'id')
+ORDRE_INVERSE = ('date_seance', '-etudiant__nom', '-id')
+
+
+class PageCurseur:
+    """Page de résultats obtenue par curseur (interface proche de django.core.paginator.Page)"""
+
+    def __init__(self, object_list, curseur_suivant=None, curseur_precedent=None):
+        self.object_list = object_list
+        self.curseur_suivant = curseur_suivant
+        self.curseur_precedent = curseur_precedent
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.curseur_suivant is not None
+
+    def has_previous(self):
+        return self.curseur_precedent is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def _encoder_curseur(presence, sens):
+    """Jeton opaque (signé) désignant la position d'une présence dans l'ordre de tri"""
+    return signing.dumps(
+        {'d': presence.date_seance.isoformat(), 'n': presence.etudiant.nom, 'i': presence.id, 's': sens},
+        salt=SEL_CURSEUR, compress=True,
+    )
+
+
+def _decoder_curseur(curseur):
+    try:
+        valeur = signing.loads(curseur, salt=SEL_CURSEUR)
+        return date.fromisoformat(valeur['d']), str(valeur['n']), int(valeur['i']), valeur['s']
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        return None
+
+
+def paginer_par_curseur(presences, curseur=None, par_page=50):
+    """
+    Pagine un queryset de présences trié par (date de séance décroissante,
+    nom de l'étudiant, id). Les curseurs sont construits depuis les lignes de
+    la page, sans requête supplémentaire.
+    """
+    presences = presences.select_related('etudiant')
+    position = _decoder_curseur(curseur) if curseur else None
+
+    if position is None:
+        lignes = list(presences.order_by(*ORDRE_PRESENCES)[:par_page + 1])
+        suivante = len(lignes) > par_page
+        lignes = lignes[:par_page]
+        return PageCurseur(
+            lignes,
+            curseur_suivant=_encoder_curseur(lignes[-1], 'apres') if suivante else None,
+        )
+
+    date_seance, nom, presence_id, sens = position
+
+    if sens == 'avant':
+        lignes = list(presences.filter(date_seance__gte=date_seance).filter(
+            Q(date_seance__gt=date_seance)
+            | Q(etudiant__nom__lt=nom)
+            | Q(etudiant__nom=nom, id__lt=presence_id)
+        ).order_by(*ORDRE_INVERSE)[:par_page + 1])
+        precedente = len(lignes) > par_page
+        lignes = lignes[:par_page][::-1]
+        return PageCurseur(
+            lignes,
+            curseur_suivant=_encoder_curseur(lignes[-1], 'apres') if lignes else None,
+            curseur_precedent=_encoder_curseur(lignes[0], 'avant') if precedente else None,
+        )
+
+    # Borne sur la date seule : un parcours de l'index dans l'ordre, le reste
+    # de la clé est vérifié ligne à ligne
+    lignes = list(presences.filter(date_seance__lte=date_seance).filter(
+        Q(date_seance__lt=date_seance)
+        | Q(etudiant__nom__gt=nom)
+        | Q(etudiant__nom=nom, id__gt=presence_id)
+    ).order_by(*ORDRE_PRESENCES)[:par_page + 1])
+    suivante = len(lignes) > par_page
+    lignes = lignes[:par_page]
+    return PageCurseur(
+        lignes,
+        curseur_suivant=_encoder_curseur(lignes[-1], 'apres') if suivante else None,
+        curseur_precedent=_encoder_curseur(lignes[0], 'avant') if lignes else None,
+    )
+
+
+def estimer_nombre_lignes(modele):
+    """
+    Nombre approximatif de lignes d'une table, lu dans les statistiques du
+    moteur (sans COUNT). Retourne None si aucune statistique n'est disponible.
+    """
+    table = modele._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+            elif connection.vendor == 'sqlite':
+                # Alimentée par ANALYZE : "nb_lignes nb_par_valeur ..."
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+            else:
+                return None
+            ligne = cursor.fetchone()
+    except DatabaseError:
+        return None
+
+    if not ligne or ligne[0] is None:
+        return None
+    return max(int(str(ligne[0]).split()[0]), 0)
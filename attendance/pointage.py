@@ -0,0 +1,245 @@
+# ============================================
+# attendance/pointage.py
+# Auto-pointage des étudiants par QR code
+# ============================================
+#
+# - L'écran de l'enseignant affiche un jeton signé qui change toutes les
+#   ROTATION_JETON secondes (séances non annulées uniquement).
+# - La page étudiant n'accède pas à la base : le jeton est vérifié par
+#   signature, puis le pointage est déposé dans un fichier du répertoire
+#   POINTAGES_QR_ROOT (écrit à part, puis renommé : un dépôt est visible en
+#   entier ou pas du tout). Un pointage acquitté survit à l'arrêt du processus
+#   web, et 300 pointages simultanés ne se disputent pas le verrou d'écriture
+#   SQLite.
+# - Les étudiants n'ont pas de compte : chaque navigateur reçoit un identifiant
+#   aléatoire (cookie signé), et un cookie signé par séance retient le
+#   matricule pointé pour refuser aussitôt un second étudiant.
+# - La commande vider_pointages convertit les dépôts en présences par lots :
+#   matricule vérifié (étudiant actif de la filière du cours, séance non
+#   annulée), un pointage par étudiant et un étudiant par appareil (contraintes
+#   de PointageQR, premier dépôt gagnant), puis présences en une écriture
+#   groupée. Les dépôts refusés sont journalisés et écartés.
+
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+SEL_JETON = 'attendance.pointage'
+ROTATION_JETON = 30          # secondes entre deux jetons
+VALIDITE_JETON = 2 * ROTATION_JETON
+TAILLE_MAX_LOT = 500
+COOKIE_APPAREIL = 'pointage_appareil'
+CONSERVATION = timedelta(days=1)   # pointages convertis gardés (un étudiant par appareil)
+DELAI_REPRISE = timedelta(minutes=10)   # lot réservé par un vidage interrompu
+
+# Sous-répertoires du tampon
+TEMPORAIRES = 'tmp'
+NOUVEAUX = 'nouveaux'
+EN_COURS = 'en_cours'
+
+
+class PointageRefuse(Exception):
+    """Pointage impossible (appareil déjà utilisé pour un autre étudiant)"""
+
+
+# ============================================
+# JETONS SIGNÉS
+# ============================================
+
+def generer_jeton(seance_id):
+    """Génère le jeton signé de la fenêtre de rotation courante"""
+    fenetre = int(time.time() // ROTATION_JETON)
+    return signing.TimestampSigner(salt=SEL_JETON).sign(f"{seance_id}:{fenetre}")
+
+
+def verifier_jeton(jeton):
+    """
+    Vérifie la signature et la fraîcheur d'un jeton (sans accès à la base).
+    Retourne l'id de la séance, ou None si le jeton est invalide ou expiré.
+    """
+    try:
+        valeur = signing.TimestampSigner(salt=SEL_JETON).unsign(jeton, max_age=VALIDITE_JETON)
+        return int(valeur.split(':', 1)[0])
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def nouvel_appareil():
+    return uuid.uuid4().hex
+
+
+def cookie_seance(seance_id):
+    """Nom du cookie retenant le matricule pointé par l'appareil pour une séance"""
+    return f"pointage_s{seance_id}"
+
+
+# ============================================
+# DÉPÔT (sans accès à la base)
+# ============================================
+
+def _repertoire(nom):
+    chemin = Path(settings.POINTAGES_QR_ROOT) / nom
+    chemin.mkdir(parents=True, exist_ok=True)
+    return chemin
+
+
+def enregistrer_pointage(seance_id, matricule, appareil, matricule_pointe=None, horodatage=None):
+    """
+    Dépose le pointage d'un étudiant depuis un appareil.
+    - matricule_pointe : matricule déjà pointé par cet appareil pour la séance (cookie)
+    Retourne True pour un nouveau pointage, False si ce matricule avait déjà pointé.
+    Lève PointageRefuse si l'appareil a déjà servi à pointer un autre matricule.
+    """
+    if matricule_pointe == matricule:
+        return False
+    if matricule_pointe:
+        raise PointageRefuse("Cet appareil a déjà servi à pointer un autre étudiant pour cette séance.")
+
+    horodatage = horodatage or timezone.now()
+    nom = f"{time.time_ns():020d}-{uuid.uuid4().hex}.json"
+    temporaire = _repertoire(TEMPORAIRES) / nom
+    with open(temporaire, 'w', encoding='utf-8') as fichier:
+        json.dump({
+            'seance': seance_id,
+            'matricule': matricule,
+            'appareil': appareil,
+            'horodatage': horodatage.isoformat(),
+        }, fichier)
+    os.replace(temporaire, _repertoire(NOUVEAUX) / nom)
+    return True
+
+
+# ============================================
+# CONVERSION EN PRÉSENCES (par lots)
+# ============================================
+
+def _reserver_lot():
+    """
+    Réserve les plus anciens dépôts (au plus TAILLE_MAX_LOT) en les déplaçant
+    dans EN_COURS : plusieurs vidages concurrents ne traitent jamais le même dépôt.
+    """
+    nouveaux, en_cours = _repertoire(NOUVEAUX), _repertoire(EN_COURS)
+    reserves = []
+    for nom in sorted(os.listdir(nouveaux))[:TAILLE_MAX_LOT]:
+        try:
+            os.replace(nouveaux / nom, en_cours / nom)
+        except FileNotFoundError:
+            # Réservé entre-temps par un autre vidage
+            continue
+        # Date de réservation (voir reprendre_lots_abandonnes)
+        os.utime(en_cours / nom)
+        reserves.append(en_cours / nom)
+    return reserves
+
+
+def _lire_depot(fichier):
+    with open(fichier, encoding='utf-8') as contenu:
+        depot = json.load(contenu)
+    return (int(depot['seance']), str(depot['matricule']), str(depot['appareil']),
+            datetime.fromisoformat(depot['horodatage']))
+
+
+def vider_tampon():
+    """
+    Convertit un lot de dépôts (au plus TAILLE_MAX_LOT) en pointages et présences.
+    Retourne le nombre de dépôts traités (acceptés ou écartés).
+    """
+    from courses.models import SeanceCours
+    from students.models import Etudiant
+    from .models import PointageQR
+    from .services import enregistrer_pointages
+
+    fichiers = _reserver_lot()
+    if not fichiers:
+        return 0
+
+    depots = []
+    for fichier in fichiers:
+        try:
+            depots.append(_lire_depot(fichier))
+        except (OSError, ValueError, KeyError, TypeError):
+            logger.warning("Pointage QR illisible écarté : %s", fichier.name)
+
+    # Filière du cours de chaque séance non annulée du lot
+    filieres = dict(SeanceCours.objects.filter(
+        id__in={depot[0] for depot in depots}, annulee=False
+    ).values_list('id', 'cours__filiere_id'))
+
+    # Étudiants actifs de ces filières, par matricule personnel ou département
+    matricules = {depot[1] for depot in depots}
+    etudiants = {}
+    for etudiant_id, filiere_id, matricule, matricule_departement in Etudiant.objects.filter(
+        Q(matricule__in=matricules) | Q(matricule_departement__in=matricules),
+        actif=True, filiere_id__in=set(filieres.values()),
+    ).values_list('id', 'filiere_id', 'matricule', 'matricule_departement'):
+        etudiants[(filiere_id, matricule)] = etudiant_id
+        if matricule_departement:
+            etudiants[(filiere_id, matricule_departement)] = etudiant_id
+
+    traitement = timezone.now()
+    pointages = []
+    for seance_id, matricule, appareil, horodatage in depots:
+        etudiant_id = etudiants.get((filieres.get(seance_id), matricule))
+        if etudiant_id is None:
+            logger.info("Pointage QR refusé (séance %s) : matricule %s inconnu ou non inscrit",
+                        seance_id, matricule)
+            continue
+        pointages.append(PointageQR(seance_id=seance_id, etudiant_id=etudiant_id, appareil=appareil,
+                                    horodatage=horodatage, date_traitement=traitement))
+
+    with transaction.atomic():
+        # Dans l'ordre des dépôts : le premier pointage de l'étudiant et de
+        # l'appareil est gardé, les suivants sont ignorés par les contraintes
+        PointageQR.objects.bulk_create(pointages, ignore_conflicts=True)
+        pointages_par_seance = {}
+        for seance_id, etudiant_id, horodatage in PointageQR.objects.filter(
+            date_traitement=traitement
+        ).values_list('seance_id', 'etudiant_id', 'horodatage'):
+            pointages_par_seance.setdefault(seance_id, {})[etudiant_id] = horodatage
+        enregistrer_pointages(pointages_par_seance)
+
+    # Après la validation : un lot interrompu est repris sans doublon
+    for fichier in fichiers:
+        fichier.unlink(missing_ok=True)
+    return len(fichiers)
+
+
+def reprendre_lots_abandonnes():
+    """
+    Remet en file les dépôts réservés depuis plus de DELAI_REPRISE (vidage
+    arrêté avant d'avoir fini). Retourne leur nombre.
+    """
+    nouveaux, en_cours = _repertoire(NOUVEAUX), _repertoire(EN_COURS)
+    limite = time.time() - DELAI_REPRISE.total_seconds()
+    nombre = 0
+    for fichier in en_cours.iterdir():
+        try:
+            if fichier.stat().st_mtime < limite:
+                os.replace(fichier, nouveaux / fichier.name)
+                nombre += 1
+        except FileNotFoundError:
+            continue
+    return nombre
+
+
+def purger_pointages():
+    """Supprime les pointages convertis depuis plus de CONSERVATION. Retourne leur nombre"""
+    from .models import PointageQR
+
+    anciens = PointageQR.objects.filter(date_traitement__lt=timezone.now() - CONSERVATION)
+    # Lecture d'abord : pas de verrou d'écriture quand il n'y a rien à supprimer
+    if not anciens.exists():
+        return 0
+    return anciens.delete()[0]
@@ -0,0 +1,480 @@
+from datetime import datetime, timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime, parse_time
+from courses.models import SeanceCours
+from students.models import Etudiant
+from .models import Presence, Justificatif, LotSynchronisation
+
+
+# ============================================
+# ÉCRITURE EN MASSE DES PRÉSENCES
+# ============================================
+
+CHAMPS_SAISIE = ['statut', 'heure_arrivee', 'remarque', 'justificatif_formel',
+                 'saisi_par', 'date_modification']
+
+
+def _normaliser_heure(heure):
+    """Convertit une heure saisie ('HH:MM' ou time) en objet time (ou None)"""
+    if not heure:
+        return None
+    if isinstance(heure, str):
+        return parse_time(heure)
+    return heure
+
+
+def justificatifs_couvrants(date_seance, etudiant_ids):
+    """
+    Retourne {etudiant_id: justificatif_id} des justificatifs VALIDÉS couvrant
+    la date donnée, pour un ensemble d'étudiants (une seule requête, appuyée
+    sur l'index justificatif_couverture_idx).
+    """
+    if not etudiant_ids:
+        return {}
+
+    couvrants = Justificatif.objects.annotate(
+        fin_effective=Coalesce('date_fin', 'date_debut'),
+    ).filter(
+        etudiant_id__in=list(etudiant_ids),
+        valide=True,
+        date_debut__lte=date_seance,
+        fin_effective__gte=date_seance,
+    ).order_by('date_soumission').values_list('etudiant_id', 'id')
+
+    # En cas de chevauchement, le justificatif le plus récent l'emporte
+    return dict(couvrants)
+
+
+def enregistrer_presences(seance, saisies, utilisateur=None):
+    """
+    Enregistre un lot de présences pour une séance en une seule transaction.
+
+    - saisies : dict {etudiant_id: {'statut': ..., 'heure_arrivee': ..., 'remarque': ...}}
+    - Les présences existantes de la séance sont chargées en UNE requête,
+      comparées aux saisies, puis écrites via bulk_create / bulk_update.
+    - Si une saisie porte un 'horodatage' (saisie hors ligne), elle n'écrase
+      une présence existante que si elle est plus récente que sa
+      date_modification (le dernier écrivain gagne).
+    - Une absence couverte par un justificatif déjà validé est directement
+      enregistrée en 'J' et liée à ce justificatif.
+
+    Retourne un tuple (nb_crees, nb_modifies, nb_inchanges).
+    """
+    if not saisies:
+        return 0, 0, 0
+
+    maintenant = timezone.now()
+
+    with transaction.atomic():
+        existantes = {
+            p.etudiant_id: p
+            for p in Presence.objects.filter(seance=seance, etudiant_id__in=list(saisies)).order_by()
+        }
+
+        # Une seule requête pour toutes les absences du lot
+        couvertures = justificatifs_couvrants(
+            seance.date,
+            [etudiant_id for etudiant_id, saisie in saisies.items() if saisie['statut'] == 'A'],
+        )
+
+        a_creer = []
+        a_modifier = []
+        horodates = []
+        inchanges = 0
+
+        for etudiant_id, saisie in saisies.items():
+            statut = saisie['statut']
+            heure_arrivee = _normaliser_heure(saisie.get('heure_arrivee'))
+            remarque = saisie.get('remarque')
+            horodatage = saisie.get('horodatage')
+
+            justificatif_id = couvertures.get(etudiant_id) if statut == 'A' else None
+            if justificatif_id:
+                statut = 'J'
+
+            presence = existantes.get(etudiant_id)
+
+            if presence is None:
+                presence = Presence(
+                    etudiant_id=etudiant_id,
+                    seance=seance,
+                    date_seance=seance.date,
+                    statut=statut,
+                    heure_arrivee=heure_arrivee,
+                    remarque=remarque,
+                    justificatif_formel_id=justificatif_id,
+                    saisi_par=utilisateur,
+                )
+                a_creer.append(presence)
+                if horodatage:
+                    horodates.append((presence, horodatage))
+                continue
+
+            # Une saisie plus ancienne que la dernière modification est ignorée
+            if horodatage and horodatage <= presence.date_modification:
+                inchanges += 1
+                continue
+
+            if justificatif_id is None and statut == 'J':
+                # Présence déjà justifiée : conserver son lien éventuel
+                justificatif_id = presence.justificatif_formel_id
+
+            if (presence.statut == statut
+                    and presence.heure_arrivee == heure_arrivee
+                    and (presence.remarque or '') == (remarque or '')
+                    and presence.justificatif_formel_id == justificatif_id):
+                inchanges += 1
+                continue
+
+            presence.statut = statut
+            presence.justificatif_formel_id = justificatif_id
+            presence.heure_arrivee = heure_arrivee
+            presence.remarque = remarque
+            presence.saisi_par = utilisateur
+            # bulk_update ne déclenche pas auto_now
+            presence.date_modification = horodatage or maintenant
+            a_modifier.append(presence)
+
+        if a_creer:
+            Presence.objects.bulk_create(a_creer)
+        if horodates:
+            # auto_now impose l'heure serveur à la création : on restaure celle du client
+            for presence, horodatage in horodates:
+                presence.date_modification = horodatage
+            Presence.objects.bulk_update([p for p, _ in horodates], ['date_modification'])
+        if a_modifier:
+            Presence.objects.bulk_update(a_modifier, CHAMPS_SAISIE)
+
+    return len(a_creer), len(a_modifier), inchanges
+
+
+# ============================================
+# STATISTIQUES DE PRÉSENCE
+# ============================================
+
+def compter_par_statut(presences):
+    """
+    Compte un queryset de présences par statut en UNE requête d'agrégation
+    (COUNT conditionnels) au lieu d'un COUNT par statut.
+
+    Retourne {'total', 'presents', 'absents', 'retards', 'justifies'}.
+    """
+    return presences.aggregate(
+        total=Count('id'),
+        presents=Count('id', filter=Q(statut='P')),
+        absents=Count('id', filter=Q(statut='A')),
+        retards=Count('id', filter=Q(statut='R')),
+        justifies=Count('id', filter=Q(statut='J')),
+    )
+
+
+# ============================================
+# FEUILLE D'APPEL
+# ============================================
+
+def construire_feuille_appel(seance, etudiants):
+    """
+    Associe à chaque étudiant sa présence existante pour la séance.
+
+    Les présences de la séance sont chargées en UNE requête et indexées
+    par etudiant_id (au lieu d'une requête par étudiant).
+    """
+    presences = {
+        p.etudiant_id: p
+        for p in Presence.objects.filter(seance=seance).order_by()
+    }
+    return [
+        {'obj': etudiant, 'presence': presences.get(etudiant.id)}
+        for etudiant in etudiants
+    ]
+
+
+# ============================================
+# SYNCHRONISATION HORS LIGNE
+# ============================================
+
+def _normaliser_horodatage(valeur):
+    """Horodatage ISO 8601 envoyé par l'appareil -> datetime aware, ou None s'il est invalide"""
+    if not isinstance(valeur, str):
+        return None
+    try:
+        horodatage = parse_datetime(valeur)
+    except ValueError:
+        # Bien formé mais impossible (30 février, 25h...)
+        return None
+    if horodatage is None:
+        return None
+    if timezone.is_naive(horodatage):
+        horodatage = timezone.make_aware(horodatage)
+    return horodatage
+
+
+def _est_identifiant(valeur):
+    return isinstance(valeur, int) and not isinstance(valeur, bool) and valeur > 0
+
+
+def _valider_marque(marque, statuts_valides):
+    """
+    Vérifie le type et la forme d'une marque (sans accès à la base).
+    Retourne (marque normalisée, None) ou (None, motif du rejet).
+    """
+    if not isinstance(marque, dict):
+        return None, "Marque invalide"
+    if not _est_identifiant(marque.get('seance')):
+        return None, "Séance invalide"
+    if not _est_identifiant(marque.get('etudiant')):
+        return None, "Étudiant invalide"
+    statut = marque.get('statut')
+    if not isinstance(statut, str) or statut not in statuts_valides:
+        return None, "Statut invalide"
+    horodatage = _normaliser_horodatage(marque.get('horodatage'))
+    if horodatage is None:
+        return None, "Horodatage invalide"
+
+    heure_arrivee = marque.get('heure_arrivee')
+    if heure_arrivee not in (None, ''):
+        try:
+            heure_arrivee = parse_time(heure_arrivee) if isinstance(heure_arrivee, str) else None
+        except ValueError:
+            heure_arrivee = None
+        if heure_arrivee is None:
+            return None, "Heure d'arrivée invalide"
+    remarque = marque.get('remarque')
+    if remarque is not None and not isinstance(remarque, str):
+        return None, "Remarque invalide"
+
+    return {
+        'seance': marque['seance'],
+        'etudiant': marque['etudiant'],
+        'statut': statut,
+        'horodatage': horodatage,
+        'heure_arrivee': heure_arrivee or None,
+        'remarque': remarque,
+    }, None
+
+
+def _acces_toutes_seances(utilisateur):
+    """Administrateurs et scolarité saisissent pour toutes les séances"""
+    profil = getattr(utilisateur, 'profil', None)
+    return utilisateur.is_superuser or (profil is not None and (profil.est_admin() or profil.est_scolarite()))
+
+
+def synchroniser_presences(cle_idempotence, marques, utilisateur):
+    """
+    Applique un lot de marques de présence envoyé par un appareil.
+
+    - marques : liste de dicts {'seance', 'etudiant', 'statut', 'horodatage',
+      'heure_arrivee', 'remarque'} pouvant concerner plusieurs séances.
+      Chaque marque mal formée (type, date ou heure invalide) est rejetée
+      individuellement, avec son motif, sans faire échouer le lot.
+    - Un lot déjà reçu du même utilisateur (même clé d'idempotence) n'est pas
+      réappliqué : le résultat enregistré est renvoyé tel quel (une seule requête).
+    - Un enseignant ne peut marquer que les séances de ses cours ; les
+      administrateurs et la scolarité, toutes les séances.
+
+    Retourne un tuple (resultat, rejoue).
+    """
+    lots = LotSynchronisation.objects.filter(utilisateur=utilisateur, cle_idempotence=cle_idempotence)
+    resultat = lots.values_list('resultat', flat=True).first()
+    if resultat is not None:
+        return resultat, True
+
+    statuts_valides = {code for code, _ in Presence.STATUTS}
+    rejetees = []
+    valides = []
+    for index, marque in enumerate(marques):
+        marque, motif = _valider_marque(marque, statuts_valides)
+        if motif:
+            rejetees.append({'index': index, 'motif': motif})
+        else:
+            valides.append((index, marque))
+
+    seance_ids = {marque['seance'] for _, marque in valides}
+    etudiant_ids = {marque['etudiant'] for _, marque in valides}
+
+    # Deux requêtes pour valider tout le lot
+    seances = {
+        seance.id: seance
+        for seance in SeanceCours.objects.filter(id__in=seance_ids)
+        .select_related('cours__enseignant').only('id', 'date', 'cours__filiere_id', 'cours__enseignant__user_id')
+    }
+    toutes_seances = _acces_toutes_seances(utilisateur)
+    filieres_etudiants = dict(
+        Etudiant.objects.filter(id__in=etudiant_ids, actif=True).values_list('id', 'filiere_id')
+    )
+
+    saisies_par_seance = {}
+
+    for index, marque in valides:
+        seance_id = marque['seance']
+        etudiant_id = marque['etudiant']
+        horodatage = marque['horodatage']
+
+        if seance_id not in seances:
+            motif = "Séance inconnue"
+        elif not (toutes_seances or (seances[seance_id].cours.enseignant is not None
+                                     and seances[seance_id].cours.enseignant.user_id == utilisateur.id)):
+            motif = "Séance d'un autre enseignant"
+        elif filieres_etudiants.get(etudiant_id) != seances[seance_id].cours.filiere_id:
+            motif = "Étudiant inconnu pour cette séance"
+        else:
+            motif = None
+
+        if motif:
+            rejetees.append({'index': index, 'motif': motif})
+            continue
+
+        saisies = saisies_par_seance.setdefault(seance_id, {})
+        precedente = saisies.get(etudiant_id)
+        # Dans un même lot, la marque la plus récente l'emporte
+        if precedente is None or precedente['horodatage'] < horodatage:
+            saisies[etudiant_id] = {
+                'statut': marque['statut'],
+                'heure_arrivee': marque['heure_arrivee'],
+                'remarque': marque['remarque'],
+                'horodatage': horodatage,
+            }
+
+    rejetees.sort(key=lambda rejet: rejet['index'])
+    resultat = {'crees': 0, 'modifies': 0, 'ignores': 0, 'rejetees': rejetees}
+
+    try:
+        with transaction.atomic():
+            for seance_id, saisies in saisies_par_seance.items():
+                crees, modifies, ignores = enregistrer_presences(seances[seance_id], saisies, utilisateur)
+                resultat['crees'] += crees
+                resultat['modifies'] += modifies
+                resultat['ignores'] += ignores
+
+            if saisies_par_seance:
+                SeanceCours.objects.filter(id__in=list(saisies_par_seance)).update(
+                    presente=True, date_modification=timezone.now()
+                )
+
+            LotSynchronisation.objects.create(
+                cle_idempotence=cle_idempotence,
+                utilisateur=utilisateur,
+                nombre_marques=len(marques),
+                resultat=resultat,
+            )
+    except IntegrityError:
+        # Le même lot a été traité en parallèle : renvoyer son résultat
+        resultat = lots.values_list('resultat', flat=True).first()
+        if resultat is None:
+            raise
+        return resultat, True
+
+    return resultat, False
+
+
+# ============================================
+# AUTO-POINTAGE (QR CODE)
+# ============================================
+
+TOLERANCE_RETARD = timedelta(minutes=15)
+
+
+def enregistrer_pointages(pointages_par_seance):
+    """
+    Écrit en une fois un lot de pointages QR (voir attendance/pointage.py).
+
+    - pointages_par_seance : dict {seance_id: {etudiant_id: horodatage}}
+    - Les étudiants ont été vérifiés au vidage du tampon.
+    - Un étudiant déjà enregistré pour la séance n'est pas modifié
+      (la saisie de l'enseignant reste prioritaire).
+
+    Retourne le nombre de pointages transmis à la base.
+    """
+    seances = {
+        s['id']: s
+        for s in SeanceCours.objects.filter(
+            id__in=list(pointages_par_seance), annulee=False
+        ).order_by().values('id', 'date', 'heure_debut')
+    }
+
+    nouvelles = []
+    for seance_id, pointages in pointages_par_seance.items():
+        seance = seances.get(seance_id)
+        if seance is None:
+            continue
+
+        limite_retard = timezone.make_aware(
+            datetime.combine(seance['date'], seance['heure_debut'])
+        ) + TOLERANCE_RETARD
+
+        for etudiant_id, horodatage in pointages.items():
+            nouvelles.append(Presence(
+                etudiant_id=etudiant_id,
+                seance_id=seance_id,
+                date_seance=seance['date'],
+                statut='R' if horodatage > limite_retard else 'P',
+                heure_arrivee=timezone.localtime(horodatage).time().replace(microsecond=0),
+                remarque="Auto-pointage QR",
+            ))
+
+    if not nouvelles:
+        return 0
+
+    with transaction.atomic():
+        # Les doublons (étudiant déjà enregistré) sont ignorés par la base
+        Presence.objects.bulk_create(nouvelles, ignore_conflicts=True)
+        SeanceCours.objects.filter(
+            id__in={p.seance_id for p in nouvelles}, presente=False
+        ).update(presente=True, date_modification=timezone.now())
+
+    return len(nouvelles)
+
+
+# ============================================
+# APPLICATION DES JUSTIFICATIFS (ENSEMBLISTE)
+# ============================================
+
+def appliquer_justificatifs(justificatif_ids):
+    """
+    Passe en 'J' toutes les absences couvertes par les justificatifs donnés,
+    en une seule requête UPDATE (quel que soit le nombre de justificatifs).
+
+    Une absence est couverte si elle concerne le même étudiant et que la date
+    de la séance est comprise entre date_debut et date_fin (ou égale à
+    date_debut si date_fin est vide).
+
+    Retourne le nombre de présences modifiées.
+    """
+    # Justificatif couvrant la présence courante (référencée par son id uniquement,
+    # les jointures restent dans la sous-requête)
+    couvrants = Justificatif.objects.annotate(
+        fin_effective=Coalesce('date_fin', 'date_debut'),
+    ).filter(
+        id__in=list(justificatif_ids),
+        etudiant__presences__pk=OuterRef('pk'),
+        date_debut__lte=F('etudiant__presences__seance__date'),
+        fin_effective__gte=F('etudiant__presences__seance__date'),
+    )
+
+    with transaction.atomic():
+        return Presence.objects.filter(
+            Exists(couvrants),
+            statut='A',
+        ).update(
+            statut='J',
+            justificatif_formel=Subquery(couvrants.values('id')[:1]),
+            date_modification=timezone.now(),
+        )
+
+
+def retirer_justificatifs(justificatif_ids):
+    """
+    Remet en 'A' les présences liées aux justificatifs donnés (une seule requête UPDATE).
+    Retourne le nombre de présences modifiées.
+    """
+    with transaction.atomic():
+        return Presence.objects.filter(
+            justificatif_formel_id__in=list(justificatif_ids),
+        ).update(
+            statut='A',
+            justificatif_formel=None,
+            date_modification=timezone.now(),
+        )
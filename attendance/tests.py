@@ -1,3 +1,842 @@
-from django.test import TestCase
+import os
+import re
+import shutil
+import tempfile
+from datetime import date, time
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from courses.models import Cours, SeanceCours
+from students.models import Etudiant, Filiere
+from teachers.models import Enseignant
+from . import pointage
+from .compteurs import verifier_compteurs, verifier_recapitulatifs_seances
+from .models import Presence, Justificatif, CompteurPresence, PointageQR
+from .services import enregistrer_presences
+
+
+def requetes_sql(capture):
+    """Requêtes capturées, sans les SAVEPOINT des blocs atomic imbriqués"""
+    return [q['sql'] for q in capture.captured_queries
+            if not q['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))]
+
+
+def creer_filiere_avec_etudiants(nb_etudiants, specialite='GI', niveau='N3'):
+    """Crée une filière, un cours, une séance et nb_etudiants étudiants actifs"""
+    filiere = Filiere.objects.create(specialite=specialite, formation='FI', niveau=niveau)
+    cours = Cours.objects.create(
+        code=f"C-{filiere.code}", intitule="Cours de test", filiere=filiere,
+        semestre=1, annee_academique='2024-2025',
+    )
+    seance = SeanceCours.objects.create(
+        cours=cours, date=date(2025, 1, 6),
+        heure_debut=time(8, 0), heure_fin=time(10, 0),
+    )
+    etudiants = [
+        Etudiant.objects.create(
+            matricule=f"{filiere.code}-{i:04d}", nom=f"Nom{i:04d}",
+            prenom="Test", filiere=filiere,
+        )
+        for i in range(nb_etudiants)
+    ]
+    return seance, etudiants
+
+
+class EnregistrerPresencesTests(TestCase):
+    """Moteur d'écriture groupée des présences"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@test.cm', 'pass')
+        self.seance, self.etudiants = creer_filiere_avec_etudiants(5)
+
+    def test_creation_puis_mise_a_jour(self):
+        saisies = {e.id: {'statut': 'P'} for e in self.etudiants}
+        self.assertEqual(enregistrer_presences(self.seance, saisies, self.user), (5, 0, 0))
+
+        saisies[self.etudiants[0].id] = {'statut': 'R', 'heure_arrivee': '08:15'}
+        self.assertEqual(enregistrer_presences(self.seance, saisies, self.user), (0, 1, 4))
+
+        presence = Presence.objects.get(etudiant=self.etudiants[0], seance=self.seance)
+        self.assertEqual(presence.statut, 'R')
+        self.assertEqual(presence.heure_arrivee, time(8, 15))
+
+
+class PrendrePresenceBenchmarkTests(TestCase):
+    """Le nombre de requêtes du POST ne dépend pas de la taille de la classe"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@test.cm', 'pass')
+        self.client.force_login(self.user)
+
+    def _nombre_requetes_post(self, nb_etudiants, niveau, statut='P'):
+        seance, etudiants = creer_filiere_avec_etudiants(nb_etudiants, niveau=niveau)
+        data = {f'presence_{e.id}': statut for e in etudiants}
+        url = reverse('prendre_presence', args=[seance.id])
+
+        with CaptureQueriesContext(connection) as creation:
+            response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Presence.objects.filter(seance=seance).count(), nb_etudiants)
+
+        data = {f'presence_{e.id}': 'A' for e in etudiants}
+        with CaptureQueriesContext(connection) as modification:
+            self.client.post(url, data)
+        self.assertEqual(Presence.objects.filter(seance=seance, statut='A').count(), nb_etudiants)
+
+        return len(creation), len(modification)
+
+    def test_nombre_de_requetes_constant(self):
+        petite_classe = self._nombre_requetes_post(5, niveau='N3')
+        grande_classe = self._nombre_requetes_post(60, niveau='N4')
+        self.assertEqual(petite_classe, grande_classe)
+
+
+class FeuilleAppelTests(TestCase):
+    """L'affichage de la feuille d'appel se fait en un nombre constant de requêtes"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@test.cm', 'pass')
+        self.client.force_login(self.user)
+
+    def _nombre_requetes_get(self, nb_etudiants, niveau):
+        seance, etudiants = creer_filiere_avec_etudiants(nb_etudiants, niveau=niveau)
+        enregistrer_presences(seance, {e.id: {'statut': 'P'} for e in etudiants[::2]}, self.user)
+
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(reverse('prendre_presence', args=[seance.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['etudiants_data']), nb_etudiants)
+        return len(requetes)
+
+    def test_nombre_de_requetes_constant(self):
+        self.assertEqual(
+            self._nombre_requetes_get(3, niveau='N3'),
+            self._nombre_requetes_get(40, niveau='N4'),
+        )
+
+
+class SynchronisationPresencesTests(TestCase):
+    """API de synchronisation hors ligne avec clé d'idempotence"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@test.cm', 'pass')
+        self.client.force_login(self.user)
+        self.seance, self.etudiants = creer_filiere_avec_etudiants(3)
+        self.url = reverse('synchroniser_presences_api')
+
+    def _envoyer(self, cle, marques):
+        return self.client.post(
+            self.url,
+            data={'cle_idempotence': cle, 'marques': marques},
+            content_type='application/json',
+        ).json()
+
+    def _marque(self, etudiant, statut, horodatage):
+        return {'seance': self.seance.id, 'etudiant': etudiant.id,
+                'statut': statut, 'horodatage': horodatage}
+
+    def test_lot_rejoue_sans_ecriture(self):
+        marques = [self._marque(e, 'P', '2025-01-06T08:05:00+01:00') for e in self.etudiants]
+        premiere = self._envoyer('lot-1', marques)
+        self.assertEqual(premiere['crees'], 3)
+        self.assertFalse(premiere['rejoue'])
+        self.seance.refresh_from_db()
+        self.assertTrue(self.seance.presente)
+
+        with CaptureQueriesContext(connection) as requetes:
+            seconde = self._envoyer('lot-1', marques)
+        self.assertTrue(seconde['rejoue'])
+        self.assertEqual(seconde['crees'], 3)
+        self.assertFalse(any(q['sql'].startswith(('INSERT', 'UPDATE')) and 'attendance_presence' in q['sql']
+                             for q in requetes.captured_queries))
+
+    def test_dernier_ecrivain_gagne(self):
+        etudiant = self.etudiants[0]
+        self._envoyer('lot-recent', [self._marque(etudiant, 'R', '2025-01-06T08:30:00+01:00')])
+        resultat = self._envoyer('lot-ancien', [self._marque(etudiant, 'A', '2025-01-06T08:00:00+01:00')])
+
+        self.assertEqual(resultat['ignores'], 1)
+        self.assertEqual(Presence.objects.get(etudiant=etudiant, seance=self.seance).statut, 'R')
+
+    def test_marques_invalides_rejetees(self):
+        resultat = self._envoyer('lot-invalide', [
+            self._marque(self.etudiants[0], 'X', '2025-01-06T08:00:00+01:00'),
+            {'seance': 999999, 'etudiant': self.etudiants[1].id, 'statut': 'P',
+             'horodatage': '2025-01-06T08:00:00+01:00'},
+        ])
+        self.assertEqual(len(resultat['rejetees']), 2)
+        self.assertFalse(Presence.objects.exists())
+
+    def _enseignant(self, username):
+        user = User.objects.create_user(username, f'{username}@test.cm', 'pass')
+        Enseignant.objects.create(user=user, matricule=username.upper(), nom=username, prenom='Test',
+                                  email=f'{username}@test.cm')
+        return user
+
+    def test_cle_propre_a_l_utilisateur_et_seances_de_l_enseignant(self):
+        titulaire = self._enseignant('titulaire')
+        Cours.objects.filter(pk=self.seance.cours_id).update(enseignant=titulaire.enseignant)
+        marques = [self._marque(e, 'P', '2025-01-06T08:05:00+01:00') for e in self.etudiants]
+        self._envoyer('lot-partage', marques[:1])
+
+        # Même clé, autre utilisateur : pas de rejeu, et pas de droit sur la séance
+        self.client.force_login(self._enseignant('autre'))
+        resultat = self._envoyer('lot-partage', marques)
+        self.assertFalse(resultat['rejoue'])
+        self.assertEqual({rejet['motif'] for rejet in resultat['rejetees']}, {"Séance d'un autre enseignant"})
+        self.assertEqual(Presence.objects.count(), 1)
+
+        self.client.force_login(titulaire)
+        resultat = self._envoyer('lot-partage', marques)
+        self.assertEqual((resultat['crees'], resultat['rejetees']), (2, []))
+
+    def test_corps_non_objet_refuse(self):
+        for corps in ([1, 2], '"texte"', '42', 'null'):
+            response = self.client.post(self.url, data=corps if isinstance(corps, str) else corps,
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+        response = self.client.post(self.url, data={'cle_idempotence': ['x'], 'marques': []},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_marques_mal_formees_rejetees_une_a_une(self):
+        etudiant = self.etudiants[0]
+        valide = self._marque(self.etudiants[1], 'P', '2025-01-06T08:00:00+01:00')
+        marques = [
+            {**self._marque(etudiant, 'P', None), 'horodatage': 1736150400},
+            self._marque(etudiant, 'P', '2025-02-30T08:00'),
+            {**self._marque(etudiant, 'R', '2025-01-06T08:20:00+01:00'), 'heure_arrivee': '25:00'},
+            {**self._marque(etudiant, 'P', '2025-01-06T08:00:00+01:00'), 'seance': [self.seance.id]},
+            {**self._marque(etudiant, 'P', '2025-01-06T08:00:00+01:00'), 'etudiant': {'id': etudiant.id}},
+            self._marque(etudiant, ['P'], '2025-01-06T08:00:00+01:00'),
+            'marque',
+            valide,
+        ]
+        response = self.client.post(self.url, data={'cle_idempotence': 'lot-forme', 'marques': marques},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        resultat = response.json()
+        self.assertEqual([rejet['motif'] for rejet in resultat['rejetees']], [
+            'Horodatage invalide', 'Horodatage invalide', "Heure d'arrivée invalide",
+            'Séance invalide', 'Étudiant invalide', 'Statut invalide', 'Marque invalide',
+        ])
+        self.assertEqual(resultat['crees'], 1)
+        self.assertEqual(Presence.objects.get().etudiant, self.etudiants[1])
+
+
+class PointageQRTests(TestCase):
+    """Auto-pointage : dépôt sans accès à la base, matricule vérifié et présences par lots au vidage"""
+
+    def setUp(self):
+        self.tampon = tempfile.mkdtemp()
+        reglages = override_settings(POINTAGES_QR_ROOT=self.tampon)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        self.addCleanup(shutil.rmtree, self.tampon, ignore_errors=True)
+
+        self.seance, self.etudiants = creer_filiere_avec_etudiants(4)
+        self.url = reverse('pointer_presence', args=[pointage.generer_jeton(self.seance.id)])
+
+    def pointer(self, matricule, appareil=None):
+        # Chaque appareil (navigateur) a son propre cookie
+        client = Client()
+        if appareil:
+            client.cookies = appareil
+        response = client.post(self.url, {'matricule': matricule})
+        return response, client.cookies
+
+    def test_depot_sans_base_puis_vidage_groupe(self):
+        for etudiant in self.etudiants:
+            with CaptureQueriesContext(connection) as capture:
+                response, _ = self.pointer(etudiant.matricule)
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(requetes_sql(capture), [])
+        # Déposé avant la réponse : un arrêt du processus web ne le perd pas
+        self.assertEqual(len(os.listdir(os.path.join(self.tampon, pointage.NOUVEAUX))), 4)
+        self.assertFalse(PointageQR.objects.exists())
+
+        with CaptureQueriesContext(connection) as capture:
+            self.assertEqual(pointage.vider_tampon(), 4)
+        # séances + étudiants + pointages + lot retenu + séances + INSERT groupé + UPDATE séance
+        self.assertEqual(len(requetes_sql(capture)), 7)
+        self.assertEqual(Presence.objects.filter(seance=self.seance).count(), 4)
+        self.assertEqual(PointageQR.objects.count(), 4)
+        self.seance.refresh_from_db()
+        self.assertTrue(self.seance.presente)
+        self.assertEqual(pointage.vider_tampon(), 0)
+        self.assertEqual(os.listdir(os.path.join(self.tampon, pointage.EN_COURS)), [])
+
+    def test_matricule_inconnu_ou_non_inscrit_ecarte(self):
+        _, autres = creer_filiere_avec_etudiants(1, specialite='GT')
+        for matricule in ('INCONNU', autres[0].matricule):
+            response, _ = self.pointer(matricule)
+            self.assertEqual(response.status_code, 202)
+        self.assertEqual(pointage.vider_tampon(), 2)
+        self.assertFalse(PointageQR.objects.exists())
+        self.assertFalse(Presence.objects.exists())
+
+    def test_un_etudiant_par_appareil(self):
+        response, appareil = self.pointer(self.etudiants[0].matricule)
+        self.assertEqual(response.status_code, 202)
+
+        # Même appareil, même matricule : déjà pointé
+        response, _ = self.pointer(self.etudiants[0].matricule, appareil)
+        self.assertEqual(response.status_code, 200)
+        # Même appareil, autre étudiant : refusé
+        response, _ = self.pointer(self.etudiants[1].matricule, appareil)
+        self.assertContains(response, 'déjà servi', status_code=400)
+
+        # Cookie de séance effacé : le vidage garde le premier dépôt de l'appareil,
+        # et un seul pointage par étudiant (matricule département compris)
+        appareil.pop(pointage.cookie_seance(self.seance.id))
+        self.pointer(self.etudiants[2].matricule, appareil)
+        self.pointer(self.etudiants[0].matricule_departement)
+        self.assertEqual(pointage.vider_tampon(), 3)
+        self.assertEqual(list(Presence.objects.values_list('etudiant', flat=True)), [self.etudiants[0].id])
+
+    def test_jeton_invalide_ou_seance_annulee(self):
+        response = self.client.post(reverse('pointer_presence', args=['faux:jeton']), {'matricule': 'X'})
+        self.assertEqual(response.status_code, 403)
+
+        SeanceCours.objects.filter(pk=self.seance.pk).update(annulee=True)
+        self.pointer(self.etudiants[0].matricule)
+        self.assertEqual(pointage.vider_tampon(), 1)
+        self.assertFalse(Presence.objects.exists())
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@test.cm', 'pass'))
+        response = self.client.get(reverse('pointage_qr_jeton', args=[self.seance.id]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_reprise_d_un_vidage_interrompu(self):
+        self.pointer(self.etudiants[0].matricule)
+        with mock.patch('attendance.services.enregistrer_pointages', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                pointage.vider_tampon()
+        # Le lot reste réservé, puis est remis en file passé le délai de reprise
+        self.assertEqual(pointage.reprendre_lots_abandonnes(), 0)
+        with mock.patch.object(pointage, 'DELAI_REPRISE', pointage.DELAI_REPRISE * -1):
+            self.assertEqual(pointage.reprendre_lots_abandonnes(), 1)
+
+        sortie = StringIO()
+        call_command('vider_pointages', stdout=sortie)
+        self.assertIn('1 pointage(s) traité(s)', sortie.getvalue())
+        self.assertEqual(Presence.objects.count(), 1)
+
+
+class JustificatifsEnsemblistesTests(TestCase):
+    """Application et retrait des justificatifs en requêtes UPDATE uniques"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@test.cm', 'pass')
+        self.filiere = Filiere.objects.create(specialite='GI', formation='FI', niveau='N3')
+        self.cours = Cours.objects.create(
+            code='C-JUST', intitule="Cours", filiere=self.filiere,
+            semestre=1, annee_academique='2024-2025',
+        )
+        self.etudiants = [
+            Etudiant.objects.create(matricule=f"J-{i}", nom=f"Nom{i}", prenom="T", filiere=self.filiere)
+            for i in range(3)
+        ]
+        for jour in range(1, 15):
+            seance = SeanceCours.objects.create(
+                cours=self.cours, date=date(2025, 3, jour),
+                heure_debut=time(8, 0), heure_fin=time(10, 0),
+            )
+            enregistrer_presences(seance, {e.id: {'statut': 'A'} for e in self.etudiants})
+
+    def _justificatif(self, etudiant, debut, fin=None):
+        return Justificatif.objects.create(
+            etudiant=etudiant, type_justificatif='MEDICAL', motif="Maladie",
+            date_debut=debut, date_fin=fin,
+        )
+
+    def test_application_et_retrait_en_une_requete(self):
+        justificatif = self._justificatif(self.etudiants[0], date(2025, 3, 3), date(2025, 3, 9))
+
+        with CaptureQueriesContext(connection) as requetes:
+            self.assertEqual(justificatif.appliquer_aux_presences(), 7)
+        self.assertEqual(len(requetes_sql(requetes)), 1)
+        self.assertEqual(Presence.objects.filter(justificatif_formel=justificatif, statut='J').count(), 7)
+
+        with CaptureQueriesContext(connection) as requetes:
+            self.assertEqual(justificatif.retirer_des_presences(), 7)
+        self.assertEqual(len(requetes_sql(requetes)), 1)
+        self.assertFalse(Presence.objects.filter(statut='J').exists())
+
+    def test_justificatif_d_un_jour(self):
+        justificatif = self._justificatif(self.etudiants[1], date(2025, 3, 5))
+        self.assertEqual(justificatif.appliquer_aux_presences(), 1)
+
+    def test_action_admin_validation_groupee(self):
+        from django.contrib.admin.sites import site
+        from .admin import JustificatifAdmin
+
+        justificatifs = [
+            self._justificatif(e, date(2025, 3, 1), date(2025, 3, 14)) for e in self.etudiants
+        ]
+        modele_admin = JustificatifAdmin(Justificatif, site)
+        modele_admin.message_user = mock.Mock()
+        request = mock.Mock(user=self.user)
+        queryset = Justificatif.objects.filter(id__in=[j.id for j in justificatifs])
+
+        with CaptureQueriesContext(connection) as requetes:
+            modele_admin.valider_justificatifs(request, queryset)
+        # ids sélectionnés + UPDATE justificatifs + UPDATE présences
+        self.assertEqual(len(requetes_sql(requetes)), 3)
+        self.assertEqual(Presence.objects.filter(statut='J').count(), 3 * 14)
+        self.assertEqual(Justificatif.objects.filter(valide=True).count(), 3)
+
+        modele_admin.refuser_justificatifs(request, queryset)
+        self.assertEqual(Presence.objects.filter(statut='A').count(), 3 * 14)
+
+
+class CouvertureAutomatiqueTests(TestCase):
+    """Les nouvelles absences couvertes par un justificatif validé passent en 'J'"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@test.cm', 'pass')
+        self.seance, self.etudiants = creer_filiere_avec_etudiants(3)
+        self.justificatif = Justificatif.objects.create(
+            etudiant=self.etudiants[0], type_justificatif='MEDICAL', motif="Maladie",
+            date_debut=date(2025, 1, 1), date_fin=date(2025, 1, 10), valide=True,
+        )
+        # Justificatif non validé : ne couvre rien
+        Justificatif.objects.create(
+            etudiant=self.etudiants[1], type_justificatif='FAMILLE', motif="Famille",
+            date_debut=date(2025, 1, 6),
+        )
+
+    def test_absence_couverte_a_la_creation(self):
+        saisies = {e.id: {'statut': 'A'} for e in self.etudiants}
+        with CaptureQueriesContext(connection) as requetes:
+            enregistrer_presences(self.seance, saisies, self.user)
+        # présences existantes + justificatifs couvrants + INSERT groupé
+        self.assertEqual(len(requetes_sql(requetes)), 3)
+
+        presences = {p.etudiant_id: p for p in Presence.objects.filter(seance=self.seance)}
+        self.assertEqual(presences[self.etudiants[0].id].statut, 'J')
+        self.assertEqual(presences[self.etudiants[0].id].justificatif_formel, self.justificatif)
+        self.assertEqual(presences[self.etudiants[1].id].statut, 'A')
+
+    def test_absence_couverte_a_la_modification(self):
+        enregistrer_presences(self.seance, {e.id: {'statut': 'P'} for e in self.etudiants}, self.user)
+        enregistrer_presences(self.seance, {self.etudiants[0].id: {'statut': 'A'}}, self.user)
+
+        presence = Presence.objects.get(seance=self.seance, etudiant=self.etudiants[0])
+        self.assertEqual(presence.statut, 'J')
+        self.assertEqual(presence.justificatif_formel, self.justificatif)
+
+
+class PresencesParFiliereTests(TestCase):
+    """Les statistiques de la page filière tiennent en une seule agrégation"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@test.cm', 'pass')
+        self.client.force_login(self.user)
+        self.seance, self.etudiants = creer_filiere_avec_etudiants(8)
+        statuts = ['P', 'P', 'P', 'A', 'A', 'R', 'J', 'P']
+        enregistrer_presences(self.seance, {
+            e.id: {'statut': statut} for e, statut in zip(self.etudiants, statuts)
+        })
+
+    def test_statistiques_en_une_requete(self):
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(reverse('presences_par_filiere'), {
+                'formation': 'FI', 'specialite': 'GI', 'niveau': 'N3',
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_presences'], 8)
+        self.assertEqual(response.context['stats'], {
+            'presents': 4, 'absents': 2, 'retards': 1, 'justifies': 1,
+        })
+        comptages = [sql for sql in requetes_sql(requetes)
+                     if 'COUNT(' in sql and 'attendance_presence' in sql]
+        self.assertEqual(len(comptages), 1)
+
+
+class PaginationCurseurTests(TestCase):
+    """Pagination par curseur des listes de présences (sans OFFSET)"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@test.cm', 'pass')
+        self.client.force_login(self.user)
+        self.seance, self.etudiants = creer_filiere_avec_etudiants(40)
+        seance2 = SeanceCours.objects.create(
+            cours=self.seance.cours, date=date(2025, 1, 13),
+            heure_debut=time(8, 0), heure_fin=time(10, 0),
+        )
+        for s in (self.seance, seance2):
+            enregistrer_presences(s, {e.id: {'statut': 'P'} for e in self.etudiants})
+
+    def test_parcours_avant_arriere(self):
+        url = reverse('liste_presences')
+        with CaptureQueriesContext(connection) as requetes:
+            page1 = self.client.get(url).context['page_obj']
+            page2 = self.client.get(url, {'curseur': page1.curseur_suivant}).context['page_obj']
+        self.assertFalse(any('OFFSET' in sql for sql in requetes_sql(requetes)))
+
+        self.assertEqual((len(page1), len(page2)), (50, 30))
+        self.assertFalse(page1.has_previous())
+        self.assertFalse(page2.has_next())
+        ids1 = [p.id for p in page1]
+        ids2 = [p.id for p in page2]
+        self.assertFalse(set(ids1) & set(ids2))
+        self.assertEqual(len(set(ids1 + ids2)), Presence.objects.count())
+
+        retour = self.client.get(url, {'curseur': page2.curseur_precedent}).context['page_obj']
+        self.assertEqual([p.id for p in retour], ids1)
+
+    def test_ordre_alphabetique_dans_la_journee(self):
+        # Noms dans l'ordre inverse de la saisie
+        for i, etudiant in enumerate(self.etudiants):
+            Etudiant.objects.filter(pk=etudiant.pk).update(nom=f"Nom{39 - i:04d}")
+        url = reverse('liste_presences')
+        page1 = self.client.get(url).context['page_obj']
+        page2 = self.client.get(url, {'curseur': page1.curseur_suivant}).context['page_obj']
+        lignes = [(p.date_seance, p.etudiant.nom) for p in [*page1, *page2]]
+        self.assertEqual(len(lignes), 80)
+        self.assertEqual(lignes, sorted(lignes, key=lambda ligne: (-ligne[0].toordinal(), ligne[1])))
+
+        retour = self.client.get(url, {'curseur': page2.curseur_precedent}).context['page_obj']
+        self.assertEqual([p.id for p in retour], [p.id for p in page1])
+
+    def test_date_seance_obligatoire(self):
+        # Un chemin d'écriture qui oublierait la date échoue au lieu de cacher la ligne
+        etudiant = Etudiant.objects.create(matricule='X-0001', nom='Sans', prenom='Date',
+                                           filiere=self.seance.cours.filiere)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Presence.objects.bulk_create([Presence(etudiant=etudiant, seance=self.seance)])
+
+    def test_date_seance_suit_la_seance(self):
+        seance = SeanceCours.objects.get(date=date(2025, 1, 13))
+        presence = Presence.objects.filter(seance=seance).first()
+        self.assertEqual(Presence.objects.get(pk=presence.pk).date_seance, date(2025, 1, 13))
+
+        seance.date = date(2025, 1, 20)
+        seance.save()
+        self.assertFalse(Presence.objects.filter(seance=seance).exclude(date_seance=date(2025, 1, 20)).exists())
+
+        # Instance en mémoire périmée : l'enregistrement ne ramène pas l'ancienne date
+        presence.statut = 'A'
+        presence.save()
+        self.assertEqual(Presence.objects.get(pk=presence.pk).date_seance, date(2025, 1, 20))
+
+    def test_page_lue_dans_l_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("Plan vérifié sous SQLite")
+        url = reverse('liste_presences')
+        page1 = self.client.get(url).context['page_obj']
+        with CaptureQueriesContext(connection) as requetes:
+            self.client.get(url, {'curseur': page1.curseur_suivant})
+        sql = next(sql for sql in requetes_sql(requetes) if 'ORDER BY' in sql and 'attendance_presence' in sql)
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = ' / '.join(ligne[3] for ligne in cursor.fetchall())
+        self.assertIn('presence_date_seance_idx', plan)
+        # Seules les présences d'une même date sont triées par nom
+        self.assertNotIn('TEMP B-TREE FOR ORDER BY', plan)
+        self.assertIn('TEMP B-TREE FOR RIGHT PART OF ORDER BY', plan)
+
+    def test_curseur_invalide_et_total_approximatif(self):
+        # Total estimé par défaut : aucun COUNT sur les présences
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(reverse('liste_presences'), {'curseur': 'falsifie'})
+        self.assertEqual(len(response.context['page_obj']), 50)
+        self.assertTrue(response.context['total_approximatif'])
+        self.assertFalse(any('COUNT' in sql and 'attendance_presence' in sql for sql in requetes_sql(requetes)))
+
+        response = self.client.get(reverse('liste_presences'), {'total': 'exact'})
+        self.assertEqual(response.context['total_presences'], 80)
+
+
+class PlansRequetesTests(TestCase):
+    """Les requêtes des vues principales passent par un index (pas de parcours complet)"""
+
+    # Tables qui grossissent avec l'historique : accès par SEARCH uniquement
+    TABLES_VOLUMINEUSES = {'attendance_presence', 'attendance_justificatif',
+                           'students_etudiant', 'courses_seancecours'}
+    # SQLite ne cherche pas dans un index sur « NOT valide » : le parcours de
+    # ces index partiels ne lit que les justificatifs du statut demandé
+    INDEX_PARTIELS = {'justificatif_en_attente_idx', 'justificatif_valides_idx'}
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@test.cm', 'pass')
+        self.client.force_login(self.user)
+        self.seance, self.etudiants = creer_filiere_avec_etudiants(30)
+        enregistrer_presences(self.seance, {
+            e.id: {'statut': 'A' if i % 4 == 0 else 'P'} for i, e in enumerate(self.etudiants)
+        })
+        self.justificatif = Justificatif.objects.create(
+            etudiant=self.etudiants[0], type_justificatif='MEDICAL', motif='Grippe',
+            date_debut=date(2025, 1, 6),
+        )
+
+    def parcours_complets(self, sql):
+        """Lignes 'SCAN' du plan SQLite portant sur une table volumineuse (ou un alias U0, T2...)"""
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = [ligne[3] for ligne in cursor.fetchall()]
+        parcours = []
+        for ligne in plan:
+            scan = re.match(r'SCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?', ligne)
+            if not scan or scan.group(2) in self.INDEX_PARTIELS:
+                continue
+            if scan.group(1) in self.TABLES_VOLUMINEUSES or re.fullmatch(r'[A-Z]\d+', scan.group(1)):
+                parcours.append(ligne)
+        return parcours
+
+    def test_requetes_des_vues(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("Plans vérifiés sous SQLite")
+        seance, filiere = self.seance, self.seance.cours.filiere
+        urls = {
+            'feuille_appel': reverse('prendre_presence', args=[seance.id]),
+            'detail_seance': reverse('detail_seance', args=[seance.id]),
+            'detail_cours': reverse('detail_cours', args=[seance.cours.code]),
+            'detail_etudiant': reverse('detail_etudiant', args=[self.etudiants[0].matricule]),
+            'presences_du_jour': reverse('liste_presences') + '?date=2025-01-06',
+            'presences_cours': reverse('liste_presences') + f'?cours={seance.cours.code}',
+            'recherche_etudiants': reverse('liste_etudiants') + '?search=Nom0005',
+            'recherche_fragment_matricule': reverse('liste_etudiants') + '?search=0005',
+            'recherche_presences': reverse('liste_presences') + '?search=0005',
+            'recherche_justificatifs': reverse('liste_justificatifs') + '?search=Nom0000',
+            'presences_filiere': reverse('presences_par_filiere') + (
+                f'?formation={filiere.formation}&specialite={filiere.specialite}&niveau=3'),
+            'detail_justificatif': reverse('detail_justificatif', args=[self.justificatif.id]),
+            'justificatifs_en_attente': reverse('liste_justificatifs') + '?statut=non_valide',
+            'justificatifs_valides': reverse('liste_justificatifs') + '?statut=valide',
+        }
+        for nom, url in urls.items():
+            with self.subTest(nom), CaptureQueriesContext(connection) as capture:
+                self.assertEqual(self.client.get(url).status_code, 200)
+                for requete in capture.captured_queries:
+                    sql = requete['sql']
+                    # Les totaux de la table entière (statistiques) parcourent par nature
+                    if not sql.startswith('SELECT') or sql.startswith('SELECT COUNT(*) AS "__count" FROM'):
+                        continue
+                    self.assertFalse(self.parcours_complets(sql), f"Parcours complet :\n{sql}")
+
+
+class ExportPresencesTests(TestCase):
+    """Export en flux des présences filtrées"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@test.cm', 'pass')
+        self.client.force_login(self.user)
+        self.seance, self.etudiants = creer_filiere_avec_etudiants(6)
+        enregistrer_presences(self.seance, {
+            e.id: {'statut': 'A' if i < 2 else 'P'} for i, e in enumerate(self.etudiants)
+        })
+
+    def test_csv_filtre_en_flux(self):
+        response = self.client.get(reverse('exporter_presences', args=['csv']), {
+            'formation': 'FI', 'specialite': 'GI', 'niveau': '3', 'statut': 'A',
+        })
+        self.assertTrue(response.streaming)
+        lignes = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(len(lignes), 3)
+        self.assertTrue(lignes[0].startswith('Date;Cours;Matricule'))
+        self.assertIn(';Absent;', lignes[1])
+
+    def test_xlsx(self):
+        from io import BytesIO
+        from openpyxl import load_workbook
+
+        response = self.client.get(reverse('exporter_presences', args=['xlsx']), {'search': 'Nom0005'})
+        classeur = load_workbook(BytesIO(b''.join(response.streaming_content)))
+        lignes = list(classeur.active.iter_rows(values_only=True))
+        self.assertEqual(len(lignes), 2)
+        self.assertEqual(lignes[1][4], 'Nom0005')
+
+    def test_format_inconnu(self):
+        self.assertEqual(self.client.get(reverse('exporter_presences', args=['pdf'])).status_code, 404)
+
+
+class CompteursPresenceTests(TestCase):
+    """Compteurs par étudiant et par cours tenus à jour sur tous les chemins d'écriture"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@test.cm', 'pass')
+        self.seance, self.etudiants = creer_filiere_avec_etudiants(4)
+        self.cours = self.seance.cours
+        self.seance2 = SeanceCours.objects.create(
+            cours=self.cours, date=date(2025, 1, 13),
+            heure_debut=time(8, 0), heure_fin=time(10, 0),
+        )
+
+    def compteur(self, etudiant, cours=None):
+        return CompteurPresence.objects.filter(etudiant=etudiant, cours=cours or self.cours).values(
+            'total', 'presents', 'absents', 'retards', 'justifies').first()
+
+    def assertCoherents(self):
+        self.assertEqual(verifier_compteurs(), [])
+
+    def test_chemins_d_ecriture(self):
+        from django.contrib.admin.sites import site
+        from .admin import PresenceAdmin
+
+        etudiant = self.etudiants[0]
+        # bulk_create puis bulk_update
+        enregistrer_presences(self.seance, {e.id: {'statut': 'A'} for e in self.etudiants})
+        enregistrer_presences(self.seance2, {e.id: {'statut': 'P'} for e in self.etudiants})
+        enregistrer_presences(self.seance2, {etudiant.id: {'statut': 'R'}})
+        self.assertEqual(self.compteur(etudiant),
+                         {'total': 2, 'presents': 0, 'absents': 1, 'retards': 1, 'justifies': 0})
+
+        # Action d'admin (queryset.update)
+        modele_admin = PresenceAdmin(Presence, site)
+        modele_admin.message_user = mock.Mock()
+        modele_admin.marquer_present(mock.Mock(user=self.user), Presence.objects.filter(seance=self.seance))
+        self.assertEqual(self.compteur(etudiant)['presents'], 1)
+        self.assertCoherents()
+
+        # Justificatif appliqué (UPDATE ensembliste)
+        Presence.objects.filter(etudiant=etudiant, seance=self.seance).update(statut='A')
+        justificatif = Justificatif.objects.create(
+            etudiant=etudiant, type_justificatif='MEDICAL', motif='Grippe', date_debut=date(2025, 1, 6),
+        )
+        justificatif.appliquer_aux_presences()
+        self.assertEqual(self.compteur(etudiant)['justifies'], 1)
+
+        # save() et delete() unitaires
+        presence = Presence.objects.get(etudiant=etudiant, seance=self.seance2)
+        presence.statut = 'A'
+        presence.save()
+        self.assertEqual(self.compteur(etudiant)['absents'], 1)
+        presence.delete()
+        self.assertEqual(self.compteur(etudiant)['total'], 1)
+        self.assertCoherents()
+
+        # Suppressions en cascade
+        self.seance.delete()
+        self.assertEqual(self.compteur(self.etudiants[1])['total'], 1)
+        self.etudiants[1].delete()
+        self.assertCoherents()
+
+    def test_seance_deplacee_vers_un_autre_cours(self):
+        enregistrer_presences(self.seance, {e.id: {'statut': 'P'} for e in self.etudiants})
+        autre_cours = Cours.objects.create(
+            code='C-AUTRE', intitule="Autre", filiere=self.cours.filiere,
+            semestre=1, annee_academique='2024-2025',
+        )
+        SeanceCours.objects.filter(pk=self.seance.pk).update(cours=autre_cours)
+        self.assertEqual(self.compteur(self.etudiants[0], autre_cours)['presents'], 1)
+        self.assertCoherents()
+
+    def test_taux_en_une_requete_et_commande(self):
+
+        enregistrer_presences(self.seance, {e.id: {'statut': 'P'} for e in self.etudiants})
+        enregistrer_presences(self.seance2, {e.id: {'statut': 'A'} for e in self.etudiants})
+        with self.assertNumQueries(1):
+            self.assertEqual(self.etudiants[0].get_taux_presence(), 50.0)
+
+        CompteurPresence.objects.update(total=0)
+        with self.assertRaises(CommandError):
+            call_command('recalculer_compteurs', verifier=True, stdout=StringIO(), stderr=StringIO())
+        call_command('recalculer_compteurs', stdout=StringIO())
+        self.assertCoherents()
+
+
+class RecapitulatifSeanceTests(TestCase):
+    """Récapitulatif des présences porté par la séance (sans COUNT à la lecture)"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@test.cm', 'pass')
+        self.client.force_login(self.user)
+        self.seance, self.etudiants = creer_filiere_avec_etudiants(4)
+
+    def test_saisie_et_justificatif(self):
+        statuts = ['P', 'R', 'A', 'A']
+        self.client.post(reverse('prendre_presence', args=[self.seance.id]), {
+            f'presence_{e.id}': statut for e, statut in zip(self.etudiants, statuts)
+        })
+        # Le save() de la séance dans la vue n'écrase pas le récapitulatif
+        seance = SeanceCours.objects.get(pk=self.seance.pk)
+        self.assertEqual((seance.nombre_presents, seance.nombre_retards, seance.nombre_absents), (1, 1, 2))
+
+        justificatif = Justificatif.objects.create(
+            etudiant=self.etudiants[2], type_justificatif='MEDICAL', motif='Grippe',
+            date_debut=self.seance.date,
+        )
+        justificatif.appliquer_aux_presences()
+        seance = SeanceCours.objects.get(pk=self.seance.pk)
+        self.assertEqual((seance.nombre_absents, seance.nombre_justifies), (1, 1))
+        with self.assertNumQueries(0):
+            self.assertEqual(seance.get_taux_presence(), 50.0)
+            self.assertEqual(seance.get_nombre_presents(), 2)
+
+        seance.remarque = "Modifiée"
+        seance.save()
+        Presence.objects.filter(seance=seance, etudiant=self.etudiants[3]).delete()
+        seance.refresh_from_db()
+        self.assertEqual((seance.get_total_presences(), seance.nombre_absents), (3, 0))
+        self.assertEqual(verifier_recapitulatifs_seances(), [])
+
+
+class AdminChangelistTests(TestCase):
+    """Les listes de l'admin s'affichent en un nombre de requêtes indépendant du nombre de lignes"""
+
+    LISTES = [
+        'admin:students_etudiant_changelist', 'admin:students_filiere_changelist',
+        'admin:courses_cours_changelist', 'admin:courses_seancecours_changelist',
+        'admin:courses_salle_changelist', 'admin:teachers_enseignant_changelist',
+        'admin:attendance_presence_changelist', 'admin:attendance_justificatif_changelist',
+    ]
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@test.cm', 'pass')
+        self.client.force_login(self.user)
+
+    def _peupler(self, nb_etudiants, niveau):
+        from courses.models import Salle
+        from teachers.models import Enseignant
+
+        seance, etudiants = creer_filiere_avec_etudiants(nb_etudiants, niveau=niveau)
+        enregistrer_presences(seance, {e.id: {'statut': 'P'} for e in etudiants}, self.user)
+        for i, etudiant in enumerate(etudiants):
+            Justificatif.objects.create(etudiant=etudiant, type_justificatif='AUTRE',
+                                        motif='-', date_debut=seance.date)
+            Salle.objects.create(nom=f"S{niveau}-{i}", capacite=30)
+            enseignant = Enseignant.objects.create(
+                user=User.objects.create_user(f"ens{niveau}{i}"), matricule=f"E{niveau}-{i}",
+                nom="Ens", prenom="T", email=f"ens{niveau}{i}@test.cm",
+            )
+            Cours.objects.create(code=f"C{niveau}-{i}", intitule="Cours", filiere=seance.cours.filiere,
+                                 enseignant=enseignant, semestre=1, annee_academique='2024-2025')
+            SeanceCours.objects.create(cours=seance.cours, date=date(2025, 2, 1 + i % 28),
+                                       heure_debut=time(8 + i // 28, 0), heure_fin=time(10, 0))
+
+    def _nombre_requetes(self):
+        resultats = {}
+        for nom in self.LISTES:
+            with CaptureQueriesContext(connection) as requetes:
+                response = self.client.get(reverse(nom), {'o': '-1'})
+            self.assertEqual(response.status_code, 200, nom)
+            resultats[nom] = len(requetes)
+        return resultats
+
+    def test_nombre_de_requetes_constant(self):
+        self._peupler(3, 'N3')
+        petites_listes = self._nombre_requetes()
+        self._peupler(40, 'N4')
+        self.assertEqual(self._nombre_requetes(), petites_listes)
+
+    def test_tri_par_colonnes_calculees(self):
+        self._peupler(3, 'N3')
+        for nom, colonne, annotation in [('admin:students_etudiant_changelist', 8, 'taux_presence'),
+                                         ('admin:students_filiere_changelist', 7, 'nb_cours_actifs'),
+                                         ('admin:courses_cours_changelist', 11, 'nb_seances_total')]:
+            response = self.client.get(reverse(nom), {'o': f'-{colonne}'})
+            self.assertEqual(response.status_code, 200)
+            changelist = response.context['cl']
+            ordre = changelist.get_ordering(response.wsgi_request, changelist.queryset)
+            self.assertEqual(ordre[0], f'-{annotation}')
+
 
-# Create your tests here.
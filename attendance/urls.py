@@ -19,6 +19,14 @@ urlpatterns = [
     path('', views.liste_presences, name='liste_presences'),
     path('prendre/<int:seance_id>/', views.prendre_presence, name='prendre_presence'),
     path('modifier/<int:presence_id>/', views.modifier_presence, name='modifier_presence'),
+    path('exporter/<str:format_export>/', views.exporter_presences, name='exporter_presences'),
+    
+    # ============================================
+    # AUTO-POINTAGE PAR QR CODE
+    # ============================================
+    path('pointage/<int:seance_id>/qr/', views.pointage_qr, name='pointage_qr'),
+    path('pointage/<int:seance_id>/jeton/', views.pointage_qr_jeton, name='pointage_qr_jeton'),
+    path('pointer/<str:jeton>/', views.pointer_presence, name='pointer_presence'),
     
     # ============================================
     # JUSTIFICATIFS
@@ -35,6 +43,9 @@ urlpatterns = [
     path('api/specialites/', views.get_specialites_ajax, name='get_specialites_ajax'),
     path('api/niveaux/', views.get_niveaux_ajax, name='get_niveaux_ajax'),
     
+    # Synchronisation des présences saisies hors ligne
+    path('api/synchroniser/', views.synchroniser_presences_api, name='synchroniser_presences_api'),
+    
     # ============================================
     # JUSTIFICATIFS - GESTION MANUELLE (Nouveau)
     # ============================================
@@ -2,13 +2,20 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.db.models import Q, Count
+from django.db import transaction
 from django.utils import timezone
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404
+from django.urls import reverse
+import json
 from .models import Presence, Justificatif
+from .services import (
+    enregistrer_presences, construire_feuille_appel, synchroniser_presences, compter_par_statut,
+)
+from . import export, pointage
+from .pagination import paginer_par_curseur, estimer_nombre_lignes
 from students.models import Etudiant, Filiere
+from students.recherche import rechercher_etudiants
 from courses.models import SeanceCours, Cours
-from teachers.models import Enseignant
 
 
 # ============================================
@@ -70,6 +77,48 @@ CONFIGURATION_FILIERES = {
 }
 
 
+def _normaliser_niveau(niveau_param):
+    """Accepte le niveau avec ou sans "N" ('3' -> 'N3')"""
+    if niveau_param and not niveau_param.startswith('N'):
+        return f"N{niveau_param}"
+    return niveau_param
+
+
+def _filtrer_presences(request, presences):
+    """
+    Applique les filtres GET communs aux listes de présences (et à leur export).
+    Retourne (queryset filtré, valeurs des filtres).
+    """
+    filtres = {
+        'search': request.GET.get('search', ''),
+        'statut': request.GET.get('statut', ''),
+        'date': request.GET.get('date', ''),
+        'cours': request.GET.get('cours', ''),
+    }
+    
+    if filtres['search']:
+        presences = rechercher_etudiants(presences, filtres['search'], 'etudiant__')
+    
+    if filtres['statut']:
+        presences = presences.filter(statut=filtres['statut'])
+    
+    if filtres['date']:
+        presences = presences.filter(seance__date=filtres['date'])
+    
+    if filtres['cours']:
+        presences = presences.filter(seance__cours__code=filtres['cours'])
+    
+    return presences, filtres
+
+
+def _filtres_url(request):
+    """Paramètres GET courants (sans le curseur) pour construire les liens de pagination"""
+    parametres = request.GET.copy()
+    parametres.pop('curseur', None)
+    parametres.pop('page', None)
+    return parametres.urlencode()
+
+
 @login_required
 def navigation_presences(request):
     """
@@ -165,13 +214,7 @@ def presences_par_filiere(request):
     niveau_param = request.GET.get('niveau', '')
     
     # ✅ Gérer le niveau correctement (avec ou sans "N")
-    if niveau_param:
-        if not niveau_param.startswith('N'):
-            niveau = f"N{niveau_param}"
-        else:
-            niveau = niveau_param
-    else:
-        niveau = ''
+    niveau = _normaliser_niveau(niveau_param)
     
     # Vérifier que tous les paramètres sont présents
     if not all([formation, specialite, niveau]):
@@ -215,53 +258,27 @@ def presences_par_filiere(request):
         return render(request, 'attendance/presences_par_filiere.html', context)
     
     # Récupérer les présences pour cette filière
+    # Ordre (date, nom, id) fixé par la pagination par curseur
     presences = Presence.objects.filter(
         etudiant__filiere=filiere
     ).select_related(
         'etudiant',
         'seance__cours',
         'seance__salle'
-    ).order_by('-seance__date', 'etudiant__nom')
+    )
     
     # Filtres supplémentaires
-    search_query = request.GET.get('search', '')
-    statut_filtre = request.GET.get('statut', '')
-    date_filtre = request.GET.get('date', '')
-    cours_filtre = request.GET.get('cours', '')
-    
-    # Appliquer les filtres
-    if search_query:
-        presences = presences.filter(
-            Q(etudiant__matricule__icontains=search_query) |
-            Q(etudiant__nom__icontains=search_query) |
-            Q(etudiant__prenom__icontains=search_query)
-        )
-    
-    if statut_filtre:
-        presences = presences.filter(statut=statut_filtre)
-    
-    if date_filtre:
-        presences = presences.filter(seance__date=date_filtre)
-    
-    if cours_filtre:
-        presences = presences.filter(seance__cours__code=cours_filtre)
+    presences, filtres = _filtrer_presences(request, presences)
     
-    # Statistiques
-    total_presences = presences.count()
-    stats = {
-        'presents': presences.filter(statut='P').count(),
-        'absents': presences.filter(statut='A').count(),
-        'retards': presences.filter(statut='R').count(),
-        'justifies': presences.filter(statut='J').count(),
-    }
+    # Statistiques (une seule requête d'agrégation)
+    stats = compter_par_statut(presences)
+    total_presences = stats.pop('total')
     
     # Liste des cours pour le filtre
     cours_list = Cours.objects.filter(filiere=filiere, actif=True)
     
-    # Pagination
-    paginator = Paginator(presences, 50)  # 50 résultats par page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Pagination par curseur (pas d'OFFSET ni de COUNT supplémentaire)
+    page_obj = paginer_par_curseur(presences, request.GET.get('curseur'), 50)  # 50 résultats par page
     
     # Choix de statuts pour le formulaire
     statuts = Presence.STATUTS
@@ -277,10 +294,11 @@ def presences_par_filiere(request):
         'stats': stats,
         'cours_list': cours_list,
         'statuts': statuts,
-        'search_query': search_query,
-        'statut_filtre': statut_filtre,
-        'date_filtre': date_filtre,
-        'cours_filtre': cours_filtre,
+        'search_query': filtres['search'],
+        'statut_filtre': filtres['statut'],
+        'date_filtre': filtres['date'],
+        'cours_filtre': filtres['cours'],
+        'filtres_url': _filtres_url(request),
         'aucun_etudiant': False,
     }
     
@@ -292,7 +310,10 @@ def prendre_presence(request, seance_id):
     """
     Prendre la présence pour une séance donnée
     """
-    seance = get_object_or_404(SeanceCours, id=seance_id)
+    seance = get_object_or_404(
+        SeanceCours.objects.select_related('cours__filiere', 'salle'),
+        id=seance_id
+    )
     
     # Récupérer tous les étudiants de la filière du cours
     etudiants = Etudiant.objects.filter(
@@ -301,45 +322,32 @@ def prendre_presence(request, seance_id):
     ).order_by('nom', 'prenom')
     
     if request.method == 'POST':
-        # Traiter les présences
-        count = 0
+        # Collecter les saisies du formulaire
+        saisies = {}
         for etudiant in etudiants:
             statut = request.POST.get(f'presence_{etudiant.id}')
-            heure_arrivee = request.POST.get(f'heure_{etudiant.id}')
-            remarque = request.POST.get(f'remarque_{etudiant.id}')
             
             if statut:
-                # Créer ou mettre à jour la présence
-                presence, created = Presence.objects.update_or_create(
-                    etudiant=etudiant,
-                    seance=seance,
-                    defaults={
-                        'statut': statut,
-                        'heure_arrivee': heure_arrivee if heure_arrivee else None,
-                        'remarque': remarque,
-                        'saisi_par': request.user,
-                    }
-                )
-                count += 1
+                saisies[etudiant.id] = {
+                    'statut': statut,
+                    'heure_arrivee': request.POST.get(f'heure_{etudiant.id}'),
+                    'remarque': request.POST.get(f'remarque_{etudiant.id}'),
+                }
         
-        # Marquer la séance comme "présence effectuée"
-        seance.presente = True
-        seance.save()
+        # Écriture groupée (bulk_create / bulk_update) dans une seule transaction
+        with transaction.atomic():
+            enregistrer_presences(seance, saisies, utilisateur=request.user)
+            
+            # Marquer la séance comme "présence effectuée"
+            seance.presente = True
+            seance.save()
+        count = len(saisies)
         
         messages.success(request, f"✅ Présence enregistrée pour {count} étudiant(s)")
         return redirect('dashboard')
     
-    # Pour l'affichage, créer une liste avec les présences existantes
-    etudiants_data = []
-    for etudiant in etudiants:
-        presence = Presence.objects.filter(
-            etudiant=etudiant,
-            seance=seance
-        ).first()
-        etudiants_data.append({
-            'obj': etudiant,
-            'presence': presence
-        })
+    # Pour l'affichage, associer à chaque étudiant sa présence existante
+    etudiants_data = construire_feuille_appel(seance, etudiants)
     
     context = {
         'seance': seance,
@@ -350,6 +358,142 @@ def prendre_presence(request, seance_id):
     return render(request, 'attendance/prendre_presence.html', context)
 
 
+@login_required
+def synchroniser_presences_api(request):
+    """
+    API JSON de synchronisation des présences saisies hors ligne.
+    
+    Corps attendu :
+    {
+        "cle_idempotence": "<uuid généré par l'appareil>",
+        "marques": [
+            {"seance": 12, "etudiant": 34, "statut": "P",
+             "horodatage": "2025-01-06T08:12:00+01:00",
+             "heure_arrivee": "08:10", "remarque": ""}
+        ]
+    }
+    
+    Un lot renvoyé avec la même clé n'est pas réappliqué (réponse identique).
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Méthode non autorisée'}, status=405)
+    
+    try:
+        donnees = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({'success': False, 'message': 'JSON invalide'}, status=400)
+    
+    if not isinstance(donnees, dict):
+        return JsonResponse({'success': False, 'message': 'Objet JSON attendu'}, status=400)
+    
+    cle_idempotence = donnees.get('cle_idempotence')
+    cle_idempotence = cle_idempotence.strip() if isinstance(cle_idempotence, str) else ''
+    marques = donnees.get('marques')
+    
+    if not cle_idempotence or len(cle_idempotence) > 64:
+        return JsonResponse({'success': False, 'message': "Clé d'idempotence manquante ou invalide"}, status=400)
+    
+    # Chaque marque est ensuite validée une à une (rejet individuel avec motif)
+    if not isinstance(marques, list):
+        return JsonResponse({'success': False, 'message': 'Liste de marques invalide'}, status=400)
+    
+    resultat, rejoue = synchroniser_presences(cle_idempotence, marques, utilisateur=request.user)
+    
+    return JsonResponse({
+        'success': True,
+        'cle_idempotence': cle_idempotence,
+        'rejoue': rejoue,
+        **resultat,
+    })
+
+
+# ============================================
+# AUTO-POINTAGE PAR QR CODE
+# ============================================
+
+@login_required
+def pointage_qr(request, seance_id):
+    """Écran enseignant : affiche le QR code de pointage (renouvelé périodiquement)"""
+    seance = get_object_or_404(
+        SeanceCours.objects.select_related('cours__filiere', 'salle'),
+        id=seance_id, annulee=False
+    )
+    
+    jeton = pointage.generer_jeton(seance.id)
+    
+    context = {
+        'seance': seance,
+        'url_pointage': request.build_absolute_uri(reverse('pointer_presence', args=[jeton])),
+        'rotation': pointage.ROTATION_JETON,
+    }
+    
+    return render(request, 'attendance/pointage_qr.html', context)
+
+
+@login_required
+def pointage_qr_jeton(request, seance_id):
+    """API AJAX : renvoie le jeton de pointage courant pour l'écran enseignant"""
+    if not SeanceCours.objects.filter(id=seance_id, annulee=False).exists():
+        return JsonResponse({'success': False, 'message': 'Séance introuvable ou annulée'}, status=404)
+    jeton = pointage.generer_jeton(seance_id)
+    return JsonResponse({
+        'success': True,
+        'url_pointage': request.build_absolute_uri(reverse('pointer_presence', args=[jeton])),
+    })
+
+
+def pointer_presence(request, jeton):
+    """
+    Page étudiant ouverte en scannant le QR code (sans accès à la base).
+    Le jeton est vérifié par signature et le pointage déposé dans le tampon ;
+    la commande vider_pointages vérifie le matricule et crée les présences par lots.
+    Un appareil (cookie signé) ne peut pointer qu'un étudiant par séance.
+    """
+    seance_id = pointage.verifier_jeton(jeton)
+    
+    if seance_id is None:
+        return render(request, 'attendance/pointer_presence.html', {'jeton_invalide': True}, status=403)
+    
+    appareil = request.get_signed_cookie(pointage.COOKIE_APPAREIL, default=None, salt=pointage.SEL_JETON)
+    appareil = appareil or pointage.nouvel_appareil()
+    matricule_pointe = None
+    
+    if request.method == 'POST':
+        matricule = request.POST.get('matricule', '').strip()
+        matricule_pointe = request.get_signed_cookie(pointage.cookie_seance(seance_id), default=None,
+                                                     salt=pointage.SEL_JETON)
+        
+        if not matricule:
+            response = render(request, 'attendance/pointer_presence.html', {
+                'jeton': jeton,
+                'erreur': "Veuillez saisir votre matricule.",
+            }, status=400)
+        else:
+            try:
+                nouveau = pointage.enregistrer_pointage(seance_id, matricule, appareil, matricule_pointe)
+                matricule_pointe = matricule
+                response = render(request, 'attendance/pointer_presence.html', {
+                    'confirme': True,
+                    'deja': not nouveau,
+                    'matricule': matricule,
+                }, status=202 if nouveau else 200)
+            except pointage.PointageRefuse as erreur:
+                response = render(request, 'attendance/pointer_presence.html', {
+                    'jeton': jeton,
+                    'erreur': str(erreur),
+                }, status=400)
+    else:
+        response = render(request, 'attendance/pointer_presence.html', {'jeton': jeton})
+    
+    response.set_signed_cookie(pointage.COOKIE_APPAREIL, appareil, salt=pointage.SEL_JETON,
+                               max_age=365 * 24 * 3600, httponly=True, samesite='Lax')
+    if matricule_pointe:
+        response.set_signed_cookie(pointage.cookie_seance(seance_id), matricule_pointe, salt=pointage.SEL_JETON,
+                                   max_age=int(pointage.CONSERVATION.total_seconds()),
+                                   httponly=True, samesite='Lax')
+    return response
+
+
 @login_required
 def modifier_presence(request, presence_id):
     """
@@ -397,38 +541,28 @@ def liste_presences(request):
     """
     Liste globale de toutes les présences (avec filtres)
     """
+    # Ordre (date, nom, id) fixé par la pagination par curseur
     presences = Presence.objects.select_related(
         'etudiant',
         'seance__cours',
         'seance__salle'
-    ).order_by('-seance__date', 'etudiant__nom')
+    )
     
     # Filtres
-    search_query = request.GET.get('search', '')
-    statut_filtre = request.GET.get('statut', '')
-    date_filtre = request.GET.get('date', '')
-    cours_filtre = request.GET.get('cours', '')
-    
-    if search_query:
-        presences = presences.filter(
-            Q(etudiant__matricule__icontains=search_query) |
-            Q(etudiant__nom__icontains=search_query) |
-            Q(etudiant__prenom__icontains=search_query)
-        )
-    
-    if statut_filtre:
-        presences = presences.filter(statut=statut_filtre)
-    
-    if date_filtre:
-        presences = presences.filter(seance__date=date_filtre)
-    
-    if cours_filtre:
-        presences = presences.filter(seance__cours__code=cours_filtre)
-    
-    # Pagination
-    paginator = Paginator(presences, 50)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    presences, filtres = _filtrer_presences(request, presences)
+    
+    # Pagination par curseur (le coût ne dépend pas de la profondeur de la page)
+    page_obj = paginer_par_curseur(presences, request.GET.get('curseur'), 50)
+    
+    # Total : estimé par défaut (statistiques du moteur, sans COUNT), non
+    # calculé si des filtres sont actifs ; exact sur demande avec ?total=exact
+    total_approximatif = request.GET.get('total') != 'exact'
+    if not total_approximatif:
+        total_presences = presences.count()
+    elif not any(filtres.values()):
+        total_presences = estimer_nombre_lignes(Presence)
+    else:
+        total_presences = None
     
     # Liste des cours pour le filtre
     cours_list = Cours.objects.filter(actif=True)
@@ -438,15 +572,45 @@ def liste_presences(request):
     
     context = {
         'page_obj': page_obj,
-        'total_presences': presences.count(),
+        'total_presences': total_presences,
+        'total_approximatif': total_approximatif,
         'cours_list': cours_list,
         'statuts': statuts,
-        'search_query': search_query,
+        'search_query': filtres['search'],
+        'filtres_url': _filtres_url(request),
     }
     
     return render(request, 'attendance/liste_presences.html', context)
 
 
+@login_required
+def exporter_presences(request, format_export):
+    """
+    Export CSV / XLSX des présences avec les mêmes filtres que la liste
+    (et que la page filière si formation, specialite et niveau sont fournis).
+    Les lignes sont envoyées en flux : la mémoire reste constante.
+    """
+    if format_export not in ('csv', 'xlsx'):
+        raise Http404
+    
+    presences = Presence.objects.order_by('-seance__date', 'etudiant__nom')
+    nom_fichier = 'presences'
+    
+    formation = request.GET.get('formation', '')
+    specialite = request.GET.get('specialite', '')
+    niveau = _normaliser_niveau(request.GET.get('niveau', ''))
+    if formation and specialite and niveau:
+        filiere = get_object_or_404(Filiere, formation=formation, specialite=specialite, niveau=niveau)
+        presences = presences.filter(etudiant__filiere=filiere)
+        nom_fichier = f"presences_{filiere.code}"
+    
+    presences, _ = _filtrer_presences(request, presences)
+    
+    if format_export == 'csv':
+        return export.reponse_csv(presences, nom_fichier)
+    return export.reponse_xlsx(presences, nom_fichier)
+
+
 @login_required
 def detail_presence(request, presence_id):
     """Voir le détail d'une présence"""
@@ -502,11 +666,7 @@ def liste_justificatifs(request):
         justificatifs = justificatifs.filter(type_justificatif=type_filtre)
     
     if search_query:
-        justificatifs = justificatifs.filter(
-            Q(etudiant__matricule__icontains=search_query) |
-            Q(etudiant__nom__icontains=search_query) |
-            Q(etudiant__prenom__icontains=search_query)
-        )
+        justificatifs = rechercher_etudiants(justificatifs, search_query, 'etudiant__')
     
     # 📊 STATISTIQUES (sur la liste COMPLÈTE, pas filtrée)
     tous_justificatifs = Justificatif.objects.all()
@@ -811,11 +971,7 @@ def selectionner_etudiant_justificatif(request):
         etudiants = Etudiant.objects.filter(actif=True).select_related('filiere')
         
         if search_query:
-            etudiants = etudiants.filter(
-                Q(matricule__icontains=search_query) |
-                Q(nom__icontains=search_query) |
-                Q(prenom__icontains=search_query)
-            )
+            etudiants = rechercher_etudiants(etudiants, search_query)
         
         if formation_filtre:
             etudiants = etudiants.filter(filiere__formation=formation_filtre)
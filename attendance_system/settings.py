@@ -155,6 +155,10 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Tampon des auto-pointages QR (voir attendance/pointage.py),
+# vidé par la commande vider_pointages
+POINTAGES_QR_ROOT = BASE_DIR / 'pointages_qr'
+
 # Messages Framework
 from django.contrib.messages import constants as messages
 MESSAGE_TAGS = {
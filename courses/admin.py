@@ -1,4 +1,6 @@
 from django.contrib import admin
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from import_export import resources
 from import_export.admin import ImportExportModelAdmin
 from .models import Salle, Cours, HoraireCours, SeanceCours
@@ -140,9 +142,15 @@ class SalleAdmin(ImportExportModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            nb_cours_actifs=Count('cours', filter=Q(cours__actif=True)),
+        )
+    
     def nombre_cours(self, obj):
-        return obj.cours.filter(actif=True).count()
+        return obj.nb_cours_actifs
     nombre_cours.short_description = "Nb cours"
+    nombre_cours.admin_order_field = 'nb_cours_actifs'
     
     actions = ['rendre_disponible', 'rendre_indisponible']
     
@@ -195,6 +203,18 @@ class CoursAdmin(ImportExportModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        # Une sous-requête par compteur : deux jointures dans un même GROUP BY
+        # multiplieraient les lignes (horaires x séances) avant le DISTINCT
+        horaires = HoraireCours.objects.filter(cours=OuterRef('pk'), actif=True).order_by().values(
+            'cours').annotate(n=Count('id')).values('n')
+        seances = SeanceCours.objects.filter(cours=OuterRef('pk')).order_by().values(
+            'cours').annotate(n=Count('id')).values('n')
+        return super().get_queryset(request).select_related('filiere', 'enseignant').annotate(
+            nb_horaires_actifs=Coalesce(Subquery(horaires), 0),
+            nb_seances_total=Coalesce(Subquery(seances), 0),
+        )
+    
     def filiere_complete(self, obj):
         """Affiche la filière complète (Spécialité + Formation + Niveau)"""
         return obj.filiere.nom_complet()
@@ -208,16 +228,18 @@ class CoursAdmin(ImportExportModelAdmin):
     
     def nombre_horaires(self, obj):
         """Affiche le nombre d'horaires du cours"""
-        count = obj.horaires.filter(actif=True).count()
+        count = obj.nb_horaires_actifs
         if count == 0:
             return '<span style="color: red;">⚠️ Aucun</span>'
         return f'<span style="color: green;">✓ {count}</span>'
     nombre_horaires.short_description = "Horaires"
+    nombre_horaires.admin_order_field = 'nb_horaires_actifs'
     nombre_horaires.allow_tags = True
     
     def nb_seances(self, obj):
-        return obj.get_nombre_seances()
+        return obj.nb_seances_total
     nb_seances.short_description = "Nb séances"
+    nb_seances.admin_order_field = 'nb_seances_total'
     
     actions = ['activer_cours', 'desactiver_cours']
     
@@ -237,6 +259,7 @@ class HoraireCoursAdmin(ImportExportModelAdmin):
     resource_class = HoraireCoursResource
     list_display = ('cours_display', 'jour_semaine', 'heure_debut', 'heure_fin',
                    'salle', 'type_seance', 'duree', 'actif')
+    list_select_related = ('cours', 'salle')
     search_fields = ('cours__code', 'cours__intitule')
     list_filter = ('jour_semaine', 'type_seance', 'actif', 
                   'cours__filiere__specialite',
@@ -284,6 +307,7 @@ class SeanceCoursAdmin(ImportExportModelAdmin):
     resource_class = SeanceCoursResource
     list_display = ('cours', 'date', 'heure_debut', 'heure_fin', 'type_seance', 
                    'salle', 'presente_display', 'annulee_display', 'taux_presence_display')
+    list_select_related = ('cours', 'salle')
     search_fields = ('cours__code', 'cours__intitule')
     list_filter = ('type_seance', 'presente', 'annulee', 'date', 
                   'cours__filiere__specialite',
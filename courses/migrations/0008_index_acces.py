@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_remove_cours_heure_debut_remove_cours_heure_fin_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='seancecours',
+            index=models.Index(fields=['date', 'presente'], name='seance_date_presente_idx'),
+        ),
+    ]
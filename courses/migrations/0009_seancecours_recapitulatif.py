@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_index_acces'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seancecours',
+            name='nombre_absents',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Absents'),
+        ),
+        migrations.AddField(
+            model_name='seancecours',
+            name='nombre_justifies',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Justifiés'),
+        ),
+        migrations.AddField(
+            model_name='seancecours',
+            name='nombre_presents',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Présents'),
+        ),
+        migrations.AddField(
+            model_name='seancecours',
+            name='nombre_retards',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Retards'),
+        ),
+    ]
@@ -182,6 +182,14 @@ class SeanceCours(models.Model):
                                    help_text="La présence a-t-elle été faite?",
                                    verbose_name="Présence effectuée")
     remarque = models.TextField(blank=True, null=True, verbose_name="Remarque")
+    
+    # Récapitulatif des présences (dénormalisé, tenu à jour par des triggers
+    # sur les présences : voir attendance/compteurs.py)
+    nombre_presents = models.IntegerField(default=0, editable=False, verbose_name="Présents")
+    nombre_absents = models.IntegerField(default=0, editable=False, verbose_name="Absents")
+    nombre_retards = models.IntegerField(default=0, editable=False, verbose_name="Retards")
+    nombre_justifies = models.IntegerField(default=0, editable=False, verbose_name="Justifiés")
+    
     annulee = models.BooleanField(default=False, verbose_name="Annulée")
     motif_annulation = models.TextField(blank=True, null=True,
                                        verbose_name="Motif d'annulation")
@@ -192,27 +200,58 @@ class SeanceCours(models.Model):
         verbose_name = "Séance de cours"
         verbose_name_plural = "Séances de cours"
         ordering = ['-date', '-heure_debut']
-        unique_together = ['cours', 'date', 'heure_debut']
+        unique_together = ['cours', 'date', 'heure_debut']  # Sert aussi d'index (cours, date)
+        indexes = [
+            # Séances du jour / séances sans appel
+            models.Index(fields=['date', 'presente'], name='seance_date_presente_idx'),
+        ]
     
     def __str__(self):
         return f"{self.cours.code} - {self.date} ({self.get_type_seance_display()})"
     
+    CHAMPS_RECAPITULATIF = ['nombre_presents', 'nombre_absents', 'nombre_retards', 'nombre_justifies']
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        seance = super().from_db(db, field_names, values)
+        # Date chargée : save() sait si elle a changé
+        seance._date_chargee = seance.__dict__.get('date')
+        return seance
+    
+    def save(self, *args, **kwargs):
+        """
+        Ne jamais réécrire le récapitulatif des présences : il est tenu à jour
+        par la base et la valeur chargée en mémoire peut être périmée.
+        Une nouvelle date est recopiée dans les présences (Presence.date_seance).
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.CHAMPS_RECAPITULATIF
+            ]
+        super().save(*args, **kwargs)
+        if getattr(self, '_date_chargee', None) not in (None, self.date):
+            self.presences.update(date_seance=self.date)
+        self._date_chargee = self.date
+    
+    def get_total_presences(self):
+        """Nombre de présences enregistrées (tous statuts)"""
+        return self.nombre_presents + self.nombre_absents + self.nombre_retards + self.nombre_justifies
+    
     def get_taux_presence(self):
-        """Calcule le taux de présence pour cette séance"""
-        from attendance.models import Presence
-        total = self.presences.count()
+        """Calcule le taux de présence pour cette séance (sans requête)"""
+        total = self.get_total_presences()
         if total == 0:
             return 0
-        presents = self.presences.filter(statut__in=['P', 'R']).count()
-        return round((presents / total) * 100, 2)
+        return round((self.get_nombre_presents() / total) * 100, 2)
     
     def get_nombre_presents(self):
-        """Nombre d'étudiants présents"""
-        return self.presences.filter(statut__in=['P', 'R']).count()
+        """Nombre d'étudiants présents (à l'heure ou en retard)"""
+        return self.nombre_presents + self.nombre_retards
     
     def get_nombre_absents(self):
         """Nombre d'étudiants absents"""
-        return self.presences.filter(statut='A').count()
+        return self.nombre_absents
     
     def get_duree(self):
         """Calcule la durée en heures"""
@@ -312,19 +312,14 @@ def detail_seance(request, seance_id):
     from attendance.models import Presence
     presences = Presence.objects.filter(seance=seance).select_related('etudiant').order_by('etudiant__nom', 'etudiant__prenom')
     
-    # Statistiques
-    total = presences.count()
-    presents = presences.filter(statut__in=['P', 'R']).count()
-    absents = presences.filter(statut='A').count()
-    retards = presences.filter(statut='R').count()
-    
+    # Statistiques (récapitulatif porté par la séance, sans COUNT)
     context = {
         'seance': seance,
         'presences': presences,
-        'total': total,
-        'presents': presents,
-        'absents': absents,
-        'retards': retards,
+        'total': seance.get_total_presences(),
+        'presents': seance.get_nombre_presents(),
+        'absents': seance.nombre_absents,
+        'retards': seance.nombre_retards,
         'taux_presence': seance.get_taux_presence() if seance.presente else None,
     }
     
@@ -1,15 +1,23 @@
 from django.contrib import admin
-from .models import RapportPresence, StatistiqueCache
+from django.utils import timezone
+
+from .cache import purger_cache_expire
+from .models import PlanificationRapport, RapportPresence, StatistiqueCache
+from .planification import prochaine_occurrence
 
 
 @admin.register(RapportPresence)
 class RapportPresenceAdmin(admin.ModelAdmin):
     list_display = ('titre', 'type_rapport', 'format_fichier', 'genere_par', 
-                   'date_generation', 'taille_fichier_display', 'telecharger')
+                   'date_generation', 'statut', 'taille_fichier_display', 'telecharger')
+    list_select_related = ('genere_par',)
     search_fields = ('titre', 'genere_par__username')
-    list_filter = ('type_rapport', 'format_fichier', 'date_generation')
+    list_filter = ('statut', 'type_rapport', 'format_fichier', 'date_generation')
     ordering = ('-date_generation',)
-    readonly_fields = ('date_generation', 'taille_fichier', 'nombre_pages', 'genere_par')
+    readonly_fields = ('date_generation', 'taille_fichier', 'nombre_pages', 'genere_par',
+                       'statut', 'progression', 'message_erreur', 'date_fin_generation',
+                       'empreinte', 'version_donnees', 'planification',
+                       'debut_traitement', 'battement', 'tentatives')
     date_hierarchy = 'date_generation'
     
     fieldsets = (
@@ -22,6 +30,11 @@ class RapportPresenceAdmin(admin.ModelAdmin):
         ('Fichier généré', {
             'fields': ('fichier', 'nombre_pages', 'taille_fichier')
         }),
+        ('Génération', {
+            'fields': ('statut', 'progression', 'message_erreur', 'debut_traitement', 'battement',
+                       'tentatives', 'date_fin_generation', 'empreinte', 'version_donnees', 'planification'),
+            'classes': ('collapse',)
+        }),
         ('Métadonnées', {
             'fields': ('genere_par', 'date_generation'),
             'classes': ('collapse',)
@@ -63,17 +76,57 @@ class RapportPresenceAdmin(admin.ModelAdmin):
     supprimer_rapports.short_description = "🗑️ Supprimer les rapports (et fichiers)"
 
 
+@admin.register(PlanificationRapport)
+class PlanificationRapportAdmin(admin.ModelAdmin):
+    list_display = ('nom', 'type_rapport', 'format_fichier', 'expression_cron',
+                   'prochaine_execution', 'derniere_execution', 'actif')
+    list_filter = ('actif', 'type_rapport')
+    search_fields = ('nom',)
+    readonly_fields = ('prochaine_execution', 'derniere_execution', 'cree_par', 'date_creation')
+    
+    fieldsets = (
+        ('Rapport', {
+            'fields': ('nom', 'type_rapport', 'format_fichier')
+        }),
+        ('Filtres', {
+            'fields': ('etudiant', 'cours', 'filiere', 'periode_jours')
+        }),
+        ('Planification', {
+            'fields': ('expression_cron', 'rattrapage', 'actif', 'prochaine_execution', 'derniere_execution')
+        }),
+        ('Métadonnées', {
+            'fields': ('cree_par', 'date_creation'),
+            'classes': ('collapse',)
+        }),
+    )
+    
+    def save_model(self, request, obj, form, change):
+        if not obj.cree_par:
+            obj.cree_par = request.user
+        # Nouvelle expression (ou réactivation) : l'échéance repart de maintenant
+        if 'expression_cron' in form.changed_data or 'actif' in form.changed_data:
+            obj.prochaine_execution = prochaine_occurrence(obj.expression_cron, timezone.now())
+        super().save_model(request, obj, form, change)
+    
+    actions = ['executer_maintenant']
+    
+    def executer_maintenant(self, request, queryset):
+        count = queryset.update(prochaine_execution=timezone.now())
+        self.message_user(request, f'✅ {count} planification(s) échue(s) : mise en file au prochain passage.')
+    executer_maintenant.short_description = "▶️ Exécuter au prochain passage"
+
+
 @admin.register(StatistiqueCache)
 class StatistiqueCacheAdmin(admin.ModelAdmin):
-    list_display = ('cle', 'date_calcul', 'date_expiration', 'est_expire_display')
+    list_display = ('cle', 'portee', 'objet_id', 'date_calcul', 'date_expiration', 'est_expire_display')
     search_fields = ('cle',)
-    list_filter = ('date_calcul', 'date_expiration')
+    list_filter = ('portee', 'date_calcul', 'date_expiration')
     ordering = ('-date_calcul',)
-    readonly_fields = ('cle', 'valeur', 'date_calcul')
+    readonly_fields = ('cle', 'portee', 'objet_id', 'valeur', 'date_calcul')
     
     fieldsets = (
         ('Cache', {
-            'fields': ('cle', 'valeur')
+            'fields': ('cle', 'portee', 'objet_id', 'valeur')
         }),
         ('Dates', {
             'fields': ('date_calcul', 'date_expiration')
@@ -96,11 +149,7 @@ class StatistiqueCacheAdmin(admin.ModelAdmin):
     vider_cache.short_description = "🗑️ Vider le cache sélectionné"
     
     def supprimer_expires(self, request, queryset):
-        from django.utils import timezone
-        count = 0
-        for cache in queryset:
-            if cache.est_expire():
-                cache.delete()
-                count += 1
+        # Une seule requête DELETE au lieu d'une par entrée
+        count = purger_cache_expire(queryset)
         self.message_user(request, f'✅ {count} cache(s) expiré(s) supprimé(s).')
-    supprimer_expires.short_description = "🗑️ Supprimer les caches expirés"
\ No newline at end of file
+    supprimer_expires.short_description = "🗑️ Supprimer les caches expirés"
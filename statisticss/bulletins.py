@@ -0,0 +1,158 @@
+# ============================================
+# statisticss/bulletins.py
+# Bulletins de présence en masse (un PDF par étudiant, dans une archive ZIP)
+# ============================================
+#
+# Pour une filière ou tout l'établissement :
+#   - deux requêtes suffisent : les étudiants actifs, et les agrégats
+#     (étudiant, cours) en un GROUP BY ; toutes deux triées par étudiant et lues
+#     en flux (iterator), puis appariées au fil de l'eau ;
+#   - le rendu PDF (pur calcul, sans base de données) est réparti sur un pool de
+#     processus ; au plus EN_VOL_PAR_PROCESSUS bulletins par processus sont en
+#     cours à la fois, pour que la mémoire reste bornée quel que soit l'effectif ;
+#   - chaque bulletin terminé est aussitôt écrit dans l'archive puis oublié.
+#
+# Ce module n'importe rien de Django au chargement : les processus de rendu
+# (démarrés en 'spawn') n'ont ni configuration ni connexion à la base.
+
+import io
+import itertools
+import multiprocessing
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from .pdf import ecrire_pdf
+
+ENTETES_BULLETIN = ['Code', 'Cours', 'Total', 'Présents', 'Absents', 'Retards', 'Justifiés', 'Taux (%)']
+EN_VOL_PAR_PROCESSUS = 4
+PAS_PROGRESSION = 50    # bulletins entre deux mises à jour de la progression
+
+
+def _taux(presents, total):
+    return round(presents / total * 100, 2) if total else 0
+
+
+# ============================================
+# DONNÉES (requêtes en flux)
+# ============================================
+
+def _etudiants(rapport):
+    from students.models import Etudiant
+
+    etudiants = Etudiant.objects.filter(actif=True)
+    if rapport.filiere_id:
+        etudiants = etudiants.filter(filiere_id=rapport.filiere_id)
+    return etudiants
+
+
+def _agregats(rapport):
+    """Lignes (étudiant, cours) triées par étudiant puis code du cours"""
+    from django.db.models import Count, Q
+    from attendance.models import Presence
+
+    presences = Presence.objects.filter(etudiant__actif=True)
+    if rapport.filiere_id:
+        presences = presences.filter(etudiant__filiere_id=rapport.filiere_id)
+    if rapport.date_debut:
+        presences = presences.filter(seance__date__gte=rapport.date_debut)
+    if rapport.date_fin:
+        presences = presences.filter(seance__date__lte=rapport.date_fin)
+    return presences.values_list(
+        'etudiant_id', 'seance__cours__code', 'seance__cours__intitule',
+    ).annotate(
+        total=Count('id'),
+        presents=Count('id', filter=Q(statut='P')),
+        absents=Count('id', filter=Q(statut='A')),
+        retards=Count('id', filter=Q(statut='R')),
+        justifies=Count('id', filter=Q(statut='J')),
+    ).order_by('etudiant_id', 'seance__cours__code').iterator()
+
+
+def donnees_bulletins(rapport):
+    """
+    Génère, étudiant par étudiant, les données (sans objet ORM) de son bulletin :
+    {'nom_fichier', 'titre', 'resume', 'lignes'}.
+    """
+    periode = ' - '.join(d.strftime('%d/%m/%Y') for d in (rapport.date_debut, rapport.date_fin) if d)
+    etudiants = _etudiants(rapport).order_by('id').values_list(
+        'id', 'matricule', 'nom', 'prenom', 'filiere__code').iterator()
+    par_etudiant = itertools.groupby(_agregats(rapport), key=lambda ligne: ligne[0])
+    suivant = next(par_etudiant, None)
+
+    for etudiant_id, matricule, nom, prenom, filiere in etudiants:
+        # Les deux flux sont triés par id : on avance les agrégats jusqu'à l'étudiant
+        while suivant is not None and suivant[0] < etudiant_id:
+            suivant = next(par_etudiant, None)
+        cours = []
+        if suivant is not None and suivant[0] == etudiant_id:
+            cours = list(suivant[1])
+            suivant = next(par_etudiant, None)
+
+        lignes = []
+        total = assidus = 0
+        for _, code, intitule, n_total, n_presents, n_absents, n_retards, n_justifies in cours:
+            total += n_total
+            assidus += n_presents + n_retards + n_justifies
+            lignes.append((code, intitule, n_total, n_presents, n_absents, n_retards, n_justifies,
+                           _taux(n_presents + n_retards + n_justifies, n_total)))
+
+        yield {
+            'nom_fichier': f"{filiere}/{matricule}.pdf".replace(' ', '_'),
+            'titre': f"Bulletin de présence - {nom} {prenom}",
+            'resume': [
+                ('Matricule', matricule),
+                ('Filière', filiere),
+                ('Période', periode or 'Toutes les séances'),
+                ('Présences enregistrées', total),
+                ('Taux de présence', f"{_taux(assidus, total)} %"),
+            ],
+            'lignes': lignes,
+        }
+
+
+# ============================================
+# RENDU (exécuté dans les processus du pool)
+# ============================================
+
+def rendre_bulletin(donnees):
+    """Données d'un bulletin -> (nom du fichier, contenu PDF, nombre de pages)"""
+    sortie = io.BytesIO()
+    pages = ecrire_pdf(sortie, donnees['titre'], donnees['resume'], ENTETES_BULLETIN, donnees['lignes'])
+    return donnees['nom_fichier'], sortie.getvalue(), pages
+
+
+def _rendus(bulletins, processus):
+    """Rendus dans l'ordre d'achèvement, avec au plus processus * EN_VOL_PAR_PROCESSUS en cours"""
+    if processus <= 1:
+        yield from map(rendre_bulletin, bulletins)
+        return
+
+    contexte = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=processus, mp_context=contexte) as pool:
+        en_vol = set()
+        for donnees in bulletins:
+            if len(en_vol) >= processus * EN_VOL_PAR_PROCESSUS:
+                termines, en_vol = wait(en_vol, return_when=FIRST_COMPLETED)
+                for futur in termines:
+                    yield futur.result()
+            en_vol.add(pool.submit(rendre_bulletin, donnees))
+        for futur in wait(en_vol).done:
+            yield futur.result()
+
+
+def ecrire_bulletins(sortie, rapport, processus=1, progression=None):
+    """
+    Écrit l'archive ZIP des bulletins dans le fichier binaire 'sortie'.
+    progression(fait, total) est appelée tous les PAS_PROGRESSION bulletins.
+    Retourne le nombre total de pages.
+    """
+    total = _etudiants(rapport).count()
+    pages = 0
+    with zipfile.ZipFile(sortie, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for fait, (nom_fichier, contenu, nombre) in enumerate(
+                _rendus(donnees_bulletins(rapport), processus), start=1):
+            archive.writestr(nom_fichier, contenu)
+            pages += nombre
+            if progression and fait % PAS_PROGRESSION == 0:
+                progression(fait, total)
+    return pages
@@ -0,0 +1,71 @@
+# ============================================
+# statisticss/cache.py
+# Cache des pages de statistiques (table StatistiqueCache)
+# ============================================
+#
+# Chaque entrée porte une portée (globales / filiere / cours / etudiant) et
+# l'id de l'objet concerné. La valeur est un dictionnaire JSON (ids et nombres,
+# jamais d'objets) que la vue ré-hydrate en une requête.
+#
+# Invalidation : des triggers (migration statisticss 0002) sur
+# attendance_presence, attendance_justificatif et courses_seancecours
+# suppriment, dans la transaction de l'écriture, les seules entrées touchées
+# (l'étudiant, sa filière, le cours de la séance et les statistiques globales).
+# La durée de vie borne le reste (changements faits triggers désactivés).
+
+from datetime import timedelta
+
+from django.utils import timezone
+
+DUREE_CACHE = timedelta(minutes=15)
+
+
+# ============================================
+# LECTURE / ÉCRITURE
+# ============================================
+
+def cle_cache(portee, objet_id=None, **parametres):
+    """Clé 'portee:objet_id:param=valeur&...' (paramètres vides ignorés, ordre stable)"""
+    suffixe = '&'.join(f"{nom}={valeur}" for nom, valeur in sorted(parametres.items())
+                       if valeur not in (None, ''))
+    return f"{portee}:{'' if objet_id is None else objet_id}:{suffixe}"
+
+
+def lire_ou_calculer(portee, objet_id, calcul, duree=DUREE_CACHE, **parametres):
+    """
+    Retourne la valeur en cache si elle n'a pas expiré, sinon appelle calcul()
+    (qui doit renvoyer une valeur sérialisable en JSON) et l'enregistre, sauf
+    si une écriture a invalidé la portée entre-temps.
+    """
+    from .models import StatistiqueCache
+
+    cle = cle_cache(portee, objet_id, **parametres)
+    maintenant = timezone.now()
+    valeur = StatistiqueCache.objects.filter(
+        cle=cle, date_expiration__gt=maintenant
+    ).values_list('valeur', flat=True).first()
+    if valeur is not None:
+        return valeur
+
+    # Réservation déjà expirée (jamais servie) : si une écriture touche la
+    # portée pendant le calcul, les triggers la suppriment et le résultat,
+    # peut-être antérieur à cette écriture, n'est pas enregistré
+    StatistiqueCache.objects.update_or_create(cle=cle, defaults={
+        'valeur': {},
+        'portee': portee,
+        'objet_id': objet_id,
+        'date_expiration': maintenant,
+    })
+    valeur = calcul()
+    StatistiqueCache.objects.filter(cle=cle, date_expiration=maintenant).update(
+        valeur=valeur, date_calcul=timezone.now(), date_expiration=maintenant + duree)
+    return valeur
+
+
+def purger_cache_expire(entrees=None):
+    """Supprime en une requête les entrées expirées (parmi 'entrees'). Retourne leur nombre"""
+    from .models import StatistiqueCache
+
+    entrees = StatistiqueCache.objects.all() if entrees is None else entrees
+    return entrees.filter(date_expiration__lt=timezone.now()).delete()[0]
+
@@ -0,0 +1,46 @@
+# ============================================
+# python manage.py generer_rapports [--boucle] [--intervalle N] [--limite N] [--processus N]
+#                                   [--sans-planification] [--max-planifies N]
+# ============================================
+
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from statisticss.planification import MAX_PLANIFIES_EN_COURS, planifier_rapports
+from statisticss.rapports import traiter_rapports_en_attente
+
+
+class Command(BaseCommand):
+    help = ("Génère les fichiers des rapports en attente. Avec --boucle, reste actif "
+            "et surveille la file (processus de travail, plusieurs instances possibles)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--boucle', action='store_true',
+                            help="Ne pas s'arrêter quand la file est vide")
+        parser.add_argument('--intervalle', type=float, default=2,
+                            help="Secondes entre deux consultations de la file (avec --boucle)")
+        parser.add_argument('--limite', type=int, default=None,
+                            help="Nombre maximal de rapports à traiter par passage")
+        parser.add_argument('--processus', type=int, default=os.cpu_count() or 1,
+                            help="Processus de rendu des bulletins par étudiant (1 = sans pool)")
+        parser.add_argument('--sans-planification', action='store_true',
+                            help="Ne pas mettre en file les rapports planifiés échus")
+        parser.add_argument('--max-planifies', type=int, default=MAX_PLANIFIES_EN_COURS,
+                            help="Rapports planifiés en file ou en cours au plus")
+
+    def handle(self, *args, **options):
+        while True:
+            if not options['sans_planification']:
+                planifies = planifier_rapports(maximum=options['max_planifies'])
+                if planifies:
+                    self.stdout.write(f"{planifies} rapport(s) planifié(s) mis en file")
+            nombre = traiter_rapports_en_attente(options['limite'], options['processus'])
+            if nombre:
+                self.stdout.write(f"{nombre} rapport(s) traité(s)")
+            if not options['boucle']:
+                break
+            close_old_connections()
+            time.sleep(options['intervalle'])
@@ -0,0 +1,288 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:36
+
+from django.db import migrations, models
+
+# SQL figé à la création de la migration (ne pas le régénérer depuis le code)
+
+CREATION_SQLITE = [
+    """
+    CREATE TRIGGER statisticss_cache_presence_ai AFTER INSERT
+    ON attendance_presence
+    BEGIN
+        DELETE FROM statisticss_statistiquecache
+        WHERE portee = 'globales'
+        OR (portee = 'etudiant' AND objet_id = new.etudiant_id)
+        OR (portee = 'filiere' AND objet_id = (SELECT filiere_id FROM students_etudiant WHERE id = new.etudiant_id))
+        OR (portee = 'cours' AND objet_id = (SELECT cours_id FROM courses_seancecours WHERE id = new.seance_id));
+    END
+    """,
+    """
+    CREATE TRIGGER statisticss_cache_presence_ad AFTER DELETE
+    ON attendance_presence
+    BEGIN
+        DELETE FROM statisticss_statistiquecache
+        WHERE portee = 'globales'
+        OR (portee = 'etudiant' AND objet_id = old.etudiant_id)
+        OR (portee = 'filiere' AND objet_id = (SELECT filiere_id FROM students_etudiant WHERE id = old.etudiant_id))
+        OR (portee = 'cours' AND objet_id = (SELECT cours_id FROM courses_seancecours WHERE id = old.seance_id));
+    END
+    """,
+    """
+    CREATE TRIGGER statisticss_cache_presence_au AFTER UPDATE OF statut, etudiant_id, seance_id
+    ON attendance_presence
+    WHEN old.statut IS NOT new.statut
+    OR old.etudiant_id IS NOT new.etudiant_id
+    OR old.seance_id IS NOT new.seance_id
+    BEGIN
+        DELETE FROM statisticss_statistiquecache
+        WHERE portee = 'globales'
+        OR (portee = 'etudiant' AND objet_id = old.etudiant_id)
+        OR (portee = 'filiere' AND objet_id = (SELECT filiere_id FROM students_etudiant WHERE id = old.etudiant_id))
+        OR (portee = 'cours' AND objet_id = (SELECT cours_id FROM courses_seancecours WHERE id = old.seance_id));
+        DELETE FROM statisticss_statistiquecache
+        WHERE portee = 'globales'
+        OR (portee = 'etudiant' AND objet_id = new.etudiant_id)
+        OR (portee = 'filiere' AND objet_id = (SELECT filiere_id FROM students_etudiant WHERE id = new.etudiant_id))
+        OR (portee = 'cours' AND objet_id = (SELECT cours_id FROM courses_seancecours WHERE id = new.seance_id));
+    END
+    """,
+    """
+    CREATE TRIGGER statisticss_cache_justificatif_ai AFTER INSERT
+    ON attendance_justificatif
+    BEGIN
+        DELETE FROM statisticss_statistiquecache
+        WHERE (portee = 'etudiant' AND objet_id = new.etudiant_id);
+    END
+    """,
+    """
+    CREATE TRIGGER statisticss_cache_justificatif_ad AFTER DELETE
+    ON attendance_justificatif
+    BEGIN
+        DELETE FROM statisticss_statistiquecache
+        WHERE (portee = 'etudiant' AND objet_id = old.etudiant_id);
+    END
+    """,
+    """
+    CREATE TRIGGER statisticss_cache_justificatif_au AFTER UPDATE OF etudiant_id, valide, date_debut, date_fin
+    ON attendance_justificatif
+    WHEN old.etudiant_id IS NOT new.etudiant_id
+    OR old.valide IS NOT new.valide
+    OR old.date_debut IS NOT new.date_debut
+    OR old.date_fin IS NOT new.date_fin
+    BEGIN
+        DELETE FROM statisticss_statistiquecache
+        WHERE (portee = 'etudiant' AND objet_id = old.etudiant_id);
+        DELETE FROM statisticss_statistiquecache
+        WHERE (portee = 'etudiant' AND objet_id = new.etudiant_id);
+    END
+    """,
+    """
+    CREATE TRIGGER statisticss_cache_seance_ai AFTER INSERT
+    ON courses_seancecours
+    BEGIN
+        DELETE FROM statisticss_statistiquecache
+        WHERE portee = 'globales'
+        OR (portee = 'cours' AND objet_id = new.cours_id)
+        OR (portee = 'filiere' AND objet_id = (SELECT filiere_id FROM courses_cours WHERE id = new.cours_id))
+        OR (portee = 'etudiant' AND objet_id IN (SELECT etudiant_id FROM attendance_presence WHERE seance_id = new.id));
+    END
+    """,
+    """
+    CREATE TRIGGER statisticss_cache_seance_ad AFTER DELETE
+    ON courses_seancecours
+    BEGIN
+        DELETE FROM statisticss_statistiquecache
+        WHERE portee = 'globales'
+        OR (portee = 'cours' AND objet_id = old.cours_id)
+        OR (portee = 'filiere' AND objet_id = (SELECT filiere_id FROM courses_cours WHERE id = old.cours_id))
+        OR (portee = 'etudiant' AND objet_id IN (SELECT etudiant_id FROM attendance_presence WHERE seance_id = old.id));
+    END
+    """,
+    """
+    CREATE TRIGGER statisticss_cache_seance_au AFTER UPDATE OF cours_id, date, heure_debut, heure_fin, type_seance, salle_id, presente
+    ON courses_seancecours
+    WHEN old.cours_id IS NOT new.cours_id
+    OR old.date IS NOT new.date
+    OR old.heure_debut IS NOT new.heure_debut
+    OR old.heure_fin IS NOT new.heure_fin
+    OR old.type_seance IS NOT new.type_seance
+    OR old.salle_id IS NOT new.salle_id
+    OR old.presente IS NOT new.presente
+    BEGIN
+        DELETE FROM statisticss_statistiquecache
+        WHERE portee = 'globales'
+        OR (portee = 'cours' AND objet_id = old.cours_id)
+        OR (portee = 'filiere' AND objet_id = (SELECT filiere_id FROM courses_cours WHERE id = old.cours_id))
+        OR (portee = 'etudiant' AND objet_id IN (SELECT etudiant_id FROM attendance_presence WHERE seance_id = old.id));
+        DELETE FROM statisticss_statistiquecache
+        WHERE portee = 'globales'
+        OR (portee = 'cours' AND objet_id = new.cours_id)
+        OR (portee = 'filiere' AND objet_id = (SELECT filiere_id FROM courses_cours WHERE id = new.cours_id))
+        OR (portee = 'etudiant' AND objet_id IN (SELECT etudiant_id FROM attendance_presence WHERE seance_id = new.id));
+    END
+    """,
+]
+
+SUPPRESSION_SQLITE = [
+    "DROP TRIGGER IF EXISTS statisticss_cache_presence_ai",
+    "DROP TRIGGER IF EXISTS statisticss_cache_presence_ad",
+    "DROP TRIGGER IF EXISTS statisticss_cache_presence_au",
+    "DROP TRIGGER IF EXISTS statisticss_cache_justificatif_ai",
+    "DROP TRIGGER IF EXISTS statisticss_cache_justificatif_ad",
+    "DROP TRIGGER IF EXISTS statisticss_cache_justificatif_au",
+    "DROP TRIGGER IF EXISTS statisticss_cache_seance_ai",
+    "DROP TRIGGER IF EXISTS statisticss_cache_seance_ad",
+    "DROP TRIGGER IF EXISTS statisticss_cache_seance_au",
+]
+
+CREATION_POSTGRESQL = [
+    """
+    CREATE OR REPLACE FUNCTION statisticss_cache_presence() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            DELETE FROM statisticss_statistiquecache
+            WHERE portee = 'globales'
+            OR (portee = 'etudiant' AND objet_id = old.etudiant_id)
+            OR (portee = 'filiere' AND objet_id = (SELECT filiere_id FROM students_etudiant WHERE id = old.etudiant_id))
+            OR (portee = 'cours' AND objet_id = (SELECT cours_id FROM courses_seancecours WHERE id = old.seance_id));
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            DELETE FROM statisticss_statistiquecache
+            WHERE portee = 'globales'
+            OR (portee = 'etudiant' AND objet_id = new.etudiant_id)
+            OR (portee = 'filiere' AND objet_id = (SELECT filiere_id FROM students_etudiant WHERE id = new.etudiant_id))
+            OR (portee = 'cours' AND objet_id = (SELECT cours_id FROM courses_seancecours WHERE id = new.seance_id));
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER statisticss_cache_presence_aid AFTER INSERT OR DELETE
+    ON attendance_presence
+    FOR EACH ROW
+    EXECUTE FUNCTION statisticss_cache_presence()
+    """,
+    """
+    CREATE TRIGGER statisticss_cache_presence_au AFTER UPDATE OF statut, etudiant_id, seance_id
+    ON attendance_presence
+    FOR EACH ROW WHEN (old.statut IS DISTINCT FROM new.statut OR old.etudiant_id IS DISTINCT FROM new.etudiant_id OR old.seance_id IS DISTINCT FROM new.seance_id)
+    EXECUTE FUNCTION statisticss_cache_presence()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION statisticss_cache_justificatif() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            DELETE FROM statisticss_statistiquecache
+            WHERE (portee = 'etudiant' AND objet_id = old.etudiant_id);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            DELETE FROM statisticss_statistiquecache
+            WHERE (portee = 'etudiant' AND objet_id = new.etudiant_id);
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER statisticss_cache_justificatif_aid AFTER INSERT OR DELETE
+    ON attendance_justificatif
+    FOR EACH ROW
+    EXECUTE FUNCTION statisticss_cache_justificatif()
+    """,
+    """
+    CREATE TRIGGER statisticss_cache_justificatif_au AFTER UPDATE OF etudiant_id, valide, date_debut, date_fin
+    ON attendance_justificatif
+    FOR EACH ROW WHEN (old.etudiant_id IS DISTINCT FROM new.etudiant_id OR old.valide IS DISTINCT FROM new.valide OR old.date_debut IS DISTINCT FROM new.date_debut OR old.date_fin IS DISTINCT FROM new.date_fin)
+    EXECUTE FUNCTION statisticss_cache_justificatif()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION statisticss_cache_seance() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            DELETE FROM statisticss_statistiquecache
+            WHERE portee = 'globales'
+            OR (portee = 'cours' AND objet_id = old.cours_id)
+            OR (portee = 'filiere' AND objet_id = (SELECT filiere_id FROM courses_cours WHERE id = old.cours_id))
+            OR (portee = 'etudiant' AND objet_id IN (SELECT etudiant_id FROM attendance_presence WHERE seance_id = old.id));
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            DELETE FROM statisticss_statistiquecache
+            WHERE portee = 'globales'
+            OR (portee = 'cours' AND objet_id = new.cours_id)
+            OR (portee = 'filiere' AND objet_id = (SELECT filiere_id FROM courses_cours WHERE id = new.cours_id))
+            OR (portee = 'etudiant' AND objet_id IN (SELECT etudiant_id FROM attendance_presence WHERE seance_id = new.id));
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER statisticss_cache_seance_aid AFTER INSERT OR DELETE
+    ON courses_seancecours
+    FOR EACH ROW
+    EXECUTE FUNCTION statisticss_cache_seance()
+    """,
+    """
+    CREATE TRIGGER statisticss_cache_seance_au AFTER UPDATE OF cours_id, date, heure_debut, heure_fin, type_seance, salle_id, presente
+    ON courses_seancecours
+    FOR EACH ROW WHEN (old.cours_id IS DISTINCT FROM new.cours_id OR old.date IS DISTINCT FROM new.date OR old.heure_debut IS DISTINCT FROM new.heure_debut OR old.heure_fin IS DISTINCT FROM new.heure_fin OR old.type_seance IS DISTINCT FROM new.type_seance OR old.salle_id IS DISTINCT FROM new.salle_id OR old.presente IS DISTINCT FROM new.presente)
+    EXECUTE FUNCTION statisticss_cache_seance()
+    """,
+]
+
+SUPPRESSION_POSTGRESQL = [
+    "DROP TRIGGER IF EXISTS statisticss_cache_presence_aid ON attendance_presence",
+    "DROP TRIGGER IF EXISTS statisticss_cache_presence_au ON attendance_presence",
+    "DROP FUNCTION IF EXISTS statisticss_cache_presence()",
+    "DROP TRIGGER IF EXISTS statisticss_cache_justificatif_aid ON attendance_justificatif",
+    "DROP TRIGGER IF EXISTS statisticss_cache_justificatif_au ON attendance_justificatif",
+    "DROP FUNCTION IF EXISTS statisticss_cache_justificatif()",
+    "DROP TRIGGER IF EXISTS statisticss_cache_seance_aid ON courses_seancecours",
+    "DROP TRIGGER IF EXISTS statisticss_cache_seance_au ON courses_seancecours",
+    "DROP FUNCTION IF EXISTS statisticss_cache_seance()",
+]
+
+CREATION = {'sqlite': CREATION_SQLITE, 'postgresql': CREATION_POSTGRESQL}
+SUPPRESSION = {'sqlite': SUPPRESSION_SQLITE, 'postgresql': SUPPRESSION_POSTGRESQL}
+
+
+def vider_cache(apps, schema_editor):
+    # Les anciennes clés n'ont pas de portée : elles ne seraient jamais invalidées
+    apps.get_model('statisticss', 'StatistiqueCache').objects.all().delete()
+
+
+def creer_triggers(apps, schema_editor):
+    # Autres moteurs : pas d'invalidation, la durée de vie du cache borne l'écart
+    for sql in CREATION.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def supprimer_triggers(apps, schema_editor):
+    for sql in SUPPRESSION.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('statisticss', '0001_initial'),
+        ('attendance', '0009_recapitulatif_seances'),
+        ('courses', '0009_seancecours_recapitulatif'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='statistiquecache',
+            name='objet_id',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Objet concerné'),
+        ),
+        migrations.AddField(
+            model_name='statistiquecache',
+            name='portee',
+            field=models.CharField(choices=[('globales', 'Statistiques globales'), ('filiere', 'Filière'), ('cours', 'Cours'), ('etudiant', 'Étudiant')], default='globales', max_length=20, verbose_name='Portée'),
+        ),
+        migrations.AddIndex(
+            model_name='statistiquecache',
+            index=models.Index(fields=['portee', 'objet_id'], name='cache_portee_objet_idx'),
+        ),
+        migrations.RunPython(vider_cache, migrations.RunPython.noop),
+        migrations.RunPython(creer_triggers, supprimer_triggers),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_seancecours_recapitulatif'),
+        ('statisticss', '0002_cache_portee'),
+        ('students', '0007_index_acces'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rapportpresence',
+            name='date_fin_generation',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Fin de génération'),
+        ),
+        migrations.AddField(
+            model_name='rapportpresence',
+            name='message_erreur',
+            field=models.TextField(blank=True, verbose_name="Message d'erreur"),
+        ),
+        migrations.AddField(
+            model_name='rapportpresence',
+            name='progression',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Progression (%)'),
+        ),
+        migrations.AddField(
+            model_name='rapportpresence',
+            name='statut',
+            field=models.CharField(choices=[('EN_ATTENTE', 'En attente'), ('EN_COURS', 'En cours'), ('TERMINE', 'Terminé'), ('ECHEC', 'Échec')], default='EN_ATTENTE', max_length=20, verbose_name='Statut'),
+        ),
+        migrations.AddIndex(
+            model_name='rapportpresence',
+            index=models.Index(fields=['statut', 'date_generation'], name='rapport_statut_date_idx'),
+        ),
+    ]
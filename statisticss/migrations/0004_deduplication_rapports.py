@@ -0,0 +1,511 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:47
+
+from django.db import migrations, models
+
+# SQL figé à la création de la migration (ne pas le régénérer depuis le code)
+
+CREATION_SQLITE = [
+    """
+    CREATE TRIGGER statisticss_version_presence_ai AFTER INSERT
+    ON attendance_presence
+    BEGIN
+        INSERT INTO statisticss_versiondonnees (filiere_id, version)
+        SELECT f.filiere_id, 1
+        FROM (SELECT filiere_id FROM students_etudiant WHERE id = new.etudiant_id
+        UNION SELECT c.filiere_id FROM courses_seancecours s JOIN courses_cours c ON c.id = s.cours_id WHERE s.id = new.seance_id) AS f
+        WHERE f.filiere_id IS NOT NULL
+        ON CONFLICT (filiere_id)
+        DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER statisticss_version_presence_ad AFTER DELETE
+    ON attendance_presence
+    BEGIN
+        INSERT INTO statisticss_versiondonnees (filiere_id, version)
+        SELECT f.filiere_id, 1
+        FROM (SELECT filiere_id FROM students_etudiant WHERE id = old.etudiant_id
+        UNION SELECT c.filiere_id FROM courses_seancecours s JOIN courses_cours c ON c.id = s.cours_id WHERE s.id = old.seance_id) AS f
+        WHERE f.filiere_id IS NOT NULL
+        ON CONFLICT (filiere_id)
+        DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER statisticss_version_presence_au AFTER UPDATE OF statut, etudiant_id, seance_id
+    ON attendance_presence
+    WHEN old.statut IS NOT new.statut
+    OR old.etudiant_id IS NOT new.etudiant_id
+    OR old.seance_id IS NOT new.seance_id
+    BEGIN
+        INSERT INTO statisticss_versiondonnees (filiere_id, version)
+        SELECT f.filiere_id, 1
+        FROM (SELECT filiere_id FROM students_etudiant WHERE id = old.etudiant_id
+        UNION SELECT c.filiere_id FROM courses_seancecours s JOIN courses_cours c ON c.id = s.cours_id WHERE s.id = old.seance_id) AS f
+        WHERE f.filiere_id IS NOT NULL
+        ON CONFLICT (filiere_id)
+        DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+        INSERT INTO statisticss_versiondonnees (filiere_id, version)
+        SELECT f.filiere_id, 1
+        FROM (SELECT filiere_id FROM students_etudiant WHERE id = new.etudiant_id
+        UNION SELECT c.filiere_id FROM courses_seancecours s JOIN courses_cours c ON c.id = s.cours_id WHERE s.id = new.seance_id) AS f
+        WHERE f.filiere_id IS NOT NULL
+        ON CONFLICT (filiere_id)
+        DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER statisticss_version_seance_ai AFTER INSERT
+    ON courses_seancecours
+    BEGIN
+        INSERT INTO statisticss_versiondonnees (filiere_id, version)
+        SELECT f.filiere_id, 1
+        FROM (SELECT filiere_id FROM courses_cours WHERE id = new.cours_id
+        UNION SELECT e.filiere_id FROM attendance_presence p JOIN students_etudiant e ON e.id = p.etudiant_id WHERE p.seance_id = new.id) AS f
+        WHERE f.filiere_id IS NOT NULL
+        ON CONFLICT (filiere_id)
+        DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER statisticss_version_seance_ad AFTER DELETE
+    ON courses_seancecours
+    BEGIN
+        INSERT INTO statisticss_versiondonnees (filiere_id, version)
+        SELECT f.filiere_id, 1
+        FROM (SELECT filiere_id FROM courses_cours WHERE id = old.cours_id
+        UNION SELECT e.filiere_id FROM attendance_presence p JOIN students_etudiant e ON e.id = p.etudiant_id WHERE p.seance_id = old.id) AS f
+        WHERE f.filiere_id IS NOT NULL
+        ON CONFLICT (filiere_id)
+        DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER statisticss_version_seance_au AFTER UPDATE OF cours_id, date, presente
+    ON courses_seancecours
+    WHEN old.cours_id IS NOT new.cours_id
+    OR old.date IS NOT new.date
+    OR old.presente IS NOT new.presente
+    BEGIN
+        INSERT INTO statisticss_versiondonnees (filiere_id, version)
+        SELECT f.filiere_id, 1
+        FROM (SELECT filiere_id FROM courses_cours WHERE id = old.cours_id
+        UNION SELECT e.filiere_id FROM attendance_presence p JOIN students_etudiant e ON e.id = p.etudiant_id WHERE p.seance_id = old.id) AS f
+        WHERE f.filiere_id IS NOT NULL
+        ON CONFLICT (filiere_id)
+        DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+        INSERT INTO statisticss_versiondonnees (filiere_id, version)
+        SELECT f.filiere_id, 1
+        FROM (SELECT filiere_id FROM courses_cours WHERE id = new.cours_id
+        UNION SELECT e.filiere_id FROM attendance_presence p JOIN students_etudiant e ON e.id = p.etudiant_id WHERE p.seance_id = new.id) AS f
+        WHERE f.filiere_id IS NOT NULL
+        ON CONFLICT (filiere_id)
+        DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER statisticss_version_etudiant_ai AFTER INSERT
+    ON students_etudiant
+    BEGIN
+        INSERT INTO statisticss_versiondonnees (filiere_id, version)
+        SELECT f.filiere_id, 1
+        FROM (SELECT new.filiere_id AS filiere_id) AS f
+        WHERE f.filiere_id IS NOT NULL
+        ON CONFLICT (filiere_id)
+        DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER statisticss_version_etudiant_ad AFTER DELETE
+    ON students_etudiant
+    BEGIN
+        INSERT INTO statisticss_versiondonnees (filiere_id, version)
+        SELECT f.filiere_id, 1
+        FROM (SELECT old.filiere_id AS filiere_id) AS f
+        WHERE f.filiere_id IS NOT NULL
+        ON CONFLICT (filiere_id)
+        DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER statisticss_version_etudiant_au AFTER UPDATE OF matricule, nom, prenom, filiere_id, actif
+    ON students_etudiant
+    WHEN old.matricule IS NOT new.matricule
+    OR old.nom IS NOT new.nom
+    OR old.prenom IS NOT new.prenom
+    OR old.filiere_id IS NOT new.filiere_id
+    OR old.actif IS NOT new.actif
+    BEGIN
+        INSERT INTO statisticss_versiondonnees (filiere_id, version)
+        SELECT f.filiere_id, 1
+        FROM (SELECT old.filiere_id AS filiere_id) AS f
+        WHERE f.filiere_id IS NOT NULL
+        ON CONFLICT (filiere_id)
+        DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+        INSERT INTO statisticss_versiondonnees (filiere_id, version)
+        SELECT f.filiere_id, 1
+        FROM (SELECT new.filiere_id AS filiere_id) AS f
+        WHERE f.filiere_id IS NOT NULL
+        ON CONFLICT (filiere_id)
+        DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER statisticss_version_cours_ai AFTER INSERT
+    ON courses_cours
+    BEGIN
+        INSERT INTO statisticss_versiondonnees (filiere_id, version)
+        SELECT f.filiere_id, 1
+        FROM (SELECT new.filiere_id AS filiere_id) AS f
+        WHERE f.filiere_id IS NOT NULL
+        ON CONFLICT (filiere_id)
+        DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER statisticss_version_cours_ad AFTER DELETE
+    ON courses_cours
+    BEGIN
+        INSERT INTO statisticss_versiondonnees (filiere_id, version)
+        SELECT f.filiere_id, 1
+        FROM (SELECT old.filiere_id AS filiere_id) AS f
+        WHERE f.filiere_id IS NOT NULL
+        ON CONFLICT (filiere_id)
+        DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER statisticss_version_cours_au AFTER UPDATE OF code, intitule, filiere_id
+    ON courses_cours
+    WHEN old.code IS NOT new.code
+    OR old.intitule IS NOT new.intitule
+    OR old.filiere_id IS NOT new.filiere_id
+    BEGIN
+        INSERT INTO statisticss_versiondonnees (filiere_id, version)
+        SELECT f.filiere_id, 1
+        FROM (SELECT old.filiere_id AS filiere_id) AS f
+        WHERE f.filiere_id IS NOT NULL
+        ON CONFLICT (filiere_id)
+        DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+        INSERT INTO statisticss_versiondonnees (filiere_id, version)
+        SELECT f.filiere_id, 1
+        FROM (SELECT new.filiere_id AS filiere_id) AS f
+        WHERE f.filiere_id IS NOT NULL
+        ON CONFLICT (filiere_id)
+        DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER statisticss_version_filiere_ai AFTER INSERT
+    ON students_filiere
+    BEGIN
+        INSERT INTO statisticss_versiondonnees (filiere_id, version)
+        SELECT f.filiere_id, 1
+        FROM (SELECT new.id AS filiere_id) AS f
+        WHERE f.filiere_id IS NOT NULL
+        ON CONFLICT (filiere_id)
+        DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER statisticss_version_filiere_ad AFTER DELETE
+    ON students_filiere
+    BEGIN
+        INSERT INTO statisticss_versiondonnees (filiere_id, version)
+        SELECT f.filiere_id, 1
+        FROM (SELECT old.id AS filiere_id) AS f
+        WHERE f.filiere_id IS NOT NULL
+        ON CONFLICT (filiere_id)
+        DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER statisticss_version_filiere_au AFTER UPDATE OF code
+    ON students_filiere
+    WHEN old.code IS NOT new.code
+    BEGIN
+        INSERT INTO statisticss_versiondonnees (filiere_id, version)
+        SELECT f.filiere_id, 1
+        FROM (SELECT old.id AS filiere_id) AS f
+        WHERE f.filiere_id IS NOT NULL
+        ON CONFLICT (filiere_id)
+        DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+        INSERT INTO statisticss_versiondonnees (filiere_id, version)
+        SELECT f.filiere_id, 1
+        FROM (SELECT new.id AS filiere_id) AS f
+        WHERE f.filiere_id IS NOT NULL
+        ON CONFLICT (filiere_id)
+        DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+    END
+    """,
+]
+
+SUPPRESSION_SQLITE = [
+    "DROP TRIGGER IF EXISTS statisticss_version_presence_ai",
+    "DROP TRIGGER IF EXISTS statisticss_version_presence_ad",
+    "DROP TRIGGER IF EXISTS statisticss_version_presence_au",
+    "DROP TRIGGER IF EXISTS statisticss_version_seance_ai",
+    "DROP TRIGGER IF EXISTS statisticss_version_seance_ad",
+    "DROP TRIGGER IF EXISTS statisticss_version_seance_au",
+    "DROP TRIGGER IF EXISTS statisticss_version_etudiant_ai",
+    "DROP TRIGGER IF EXISTS statisticss_version_etudiant_ad",
+    "DROP TRIGGER IF EXISTS statisticss_version_etudiant_au",
+    "DROP TRIGGER IF EXISTS statisticss_version_cours_ai",
+    "DROP TRIGGER IF EXISTS statisticss_version_cours_ad",
+    "DROP TRIGGER IF EXISTS statisticss_version_cours_au",
+    "DROP TRIGGER IF EXISTS statisticss_version_filiere_ai",
+    "DROP TRIGGER IF EXISTS statisticss_version_filiere_ad",
+    "DROP TRIGGER IF EXISTS statisticss_version_filiere_au",
+]
+
+CREATION_POSTGRESQL = [
+    """
+    CREATE OR REPLACE FUNCTION statisticss_version_presence() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            INSERT INTO statisticss_versiondonnees (filiere_id, version)
+            SELECT f.filiere_id, 1
+            FROM (SELECT filiere_id FROM students_etudiant WHERE id = old.etudiant_id
+            UNION SELECT c.filiere_id FROM courses_seancecours s JOIN courses_cours c ON c.id = s.cours_id WHERE s.id = old.seance_id) AS f
+            WHERE f.filiere_id IS NOT NULL
+            ON CONFLICT (filiere_id)
+            DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO statisticss_versiondonnees (filiere_id, version)
+            SELECT f.filiere_id, 1
+            FROM (SELECT filiere_id FROM students_etudiant WHERE id = new.etudiant_id
+            UNION SELECT c.filiere_id FROM courses_seancecours s JOIN courses_cours c ON c.id = s.cours_id WHERE s.id = new.seance_id) AS f
+            WHERE f.filiere_id IS NOT NULL
+            ON CONFLICT (filiere_id)
+            DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER statisticss_version_presence_aid AFTER INSERT OR DELETE
+    ON attendance_presence
+    FOR EACH ROW
+    EXECUTE FUNCTION statisticss_version_presence()
+    """,
+    """
+    CREATE TRIGGER statisticss_version_presence_au AFTER UPDATE OF statut, etudiant_id, seance_id
+    ON attendance_presence
+    FOR EACH ROW WHEN (old.statut IS DISTINCT FROM new.statut
+    OR old.etudiant_id IS DISTINCT FROM new.etudiant_id
+    OR old.seance_id IS DISTINCT FROM new.seance_id)
+    EXECUTE FUNCTION statisticss_version_presence()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION statisticss_version_seance() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            INSERT INTO statisticss_versiondonnees (filiere_id, version)
+            SELECT f.filiere_id, 1
+            FROM (SELECT filiere_id FROM courses_cours WHERE id = old.cours_id
+            UNION SELECT e.filiere_id FROM attendance_presence p JOIN students_etudiant e ON e.id = p.etudiant_id WHERE p.seance_id = old.id) AS f
+            WHERE f.filiere_id IS NOT NULL
+            ON CONFLICT (filiere_id)
+            DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO statisticss_versiondonnees (filiere_id, version)
+            SELECT f.filiere_id, 1
+            FROM (SELECT filiere_id FROM courses_cours WHERE id = new.cours_id
+            UNION SELECT e.filiere_id FROM attendance_presence p JOIN students_etudiant e ON e.id = p.etudiant_id WHERE p.seance_id = new.id) AS f
+            WHERE f.filiere_id IS NOT NULL
+            ON CONFLICT (filiere_id)
+            DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER statisticss_version_seance_aid AFTER INSERT OR DELETE
+    ON courses_seancecours
+    FOR EACH ROW
+    EXECUTE FUNCTION statisticss_version_seance()
+    """,
+    """
+    CREATE TRIGGER statisticss_version_seance_au AFTER UPDATE OF cours_id, date, presente
+    ON courses_seancecours
+    FOR EACH ROW WHEN (old.cours_id IS DISTINCT FROM new.cours_id
+    OR old.date IS DISTINCT FROM new.date
+    OR old.presente IS DISTINCT FROM new.presente)
+    EXECUTE FUNCTION statisticss_version_seance()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION statisticss_version_etudiant() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            INSERT INTO statisticss_versiondonnees (filiere_id, version)
+            SELECT f.filiere_id, 1
+            FROM (SELECT old.filiere_id AS filiere_id) AS f
+            WHERE f.filiere_id IS NOT NULL
+            ON CONFLICT (filiere_id)
+            DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO statisticss_versiondonnees (filiere_id, version)
+            SELECT f.filiere_id, 1
+            FROM (SELECT new.filiere_id AS filiere_id) AS f
+            WHERE f.filiere_id IS NOT NULL
+            ON CONFLICT (filiere_id)
+            DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER statisticss_version_etudiant_aid AFTER INSERT OR DELETE
+    ON students_etudiant
+    FOR EACH ROW
+    EXECUTE FUNCTION statisticss_version_etudiant()
+    """,
+    """
+    CREATE TRIGGER statisticss_version_etudiant_au AFTER UPDATE OF matricule, nom, prenom, filiere_id, actif
+    ON students_etudiant
+    FOR EACH ROW WHEN (old.matricule IS DISTINCT FROM new.matricule
+    OR old.nom IS DISTINCT FROM new.nom
+    OR old.prenom IS DISTINCT FROM new.prenom
+    OR old.filiere_id IS DISTINCT FROM new.filiere_id
+    OR old.actif IS DISTINCT FROM new.actif)
+    EXECUTE FUNCTION statisticss_version_etudiant()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION statisticss_version_cours() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            INSERT INTO statisticss_versiondonnees (filiere_id, version)
+            SELECT f.filiere_id, 1
+            FROM (SELECT old.filiere_id AS filiere_id) AS f
+            WHERE f.filiere_id IS NOT NULL
+            ON CONFLICT (filiere_id)
+            DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO statisticss_versiondonnees (filiere_id, version)
+            SELECT f.filiere_id, 1
+            FROM (SELECT new.filiere_id AS filiere_id) AS f
+            WHERE f.filiere_id IS NOT NULL
+            ON CONFLICT (filiere_id)
+            DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER statisticss_version_cours_aid AFTER INSERT OR DELETE
+    ON courses_cours
+    FOR EACH ROW
+    EXECUTE FUNCTION statisticss_version_cours()
+    """,
+    """
+    CREATE TRIGGER statisticss_version_cours_au AFTER UPDATE OF code, intitule, filiere_id
+    ON courses_cours
+    FOR EACH ROW WHEN (old.code IS DISTINCT FROM new.code
+    OR old.intitule IS DISTINCT FROM new.intitule
+    OR old.filiere_id IS DISTINCT FROM new.filiere_id)
+    EXECUTE FUNCTION statisticss_version_cours()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION statisticss_version_filiere() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            INSERT INTO statisticss_versiondonnees (filiere_id, version)
+            SELECT f.filiere_id, 1
+            FROM (SELECT old.id AS filiere_id) AS f
+            WHERE f.filiere_id IS NOT NULL
+            ON CONFLICT (filiere_id)
+            DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO statisticss_versiondonnees (filiere_id, version)
+            SELECT f.filiere_id, 1
+            FROM (SELECT new.id AS filiere_id) AS f
+            WHERE f.filiere_id IS NOT NULL
+            ON CONFLICT (filiere_id)
+            DO UPDATE SET version = statisticss_versiondonnees.version + 1;
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER statisticss_version_filiere_aid AFTER INSERT OR DELETE
+    ON students_filiere
+    FOR EACH ROW
+    EXECUTE FUNCTION statisticss_version_filiere()
+    """,
+    """
+    CREATE TRIGGER statisticss_version_filiere_au AFTER UPDATE OF code
+    ON students_filiere
+    FOR EACH ROW WHEN (old.code IS DISTINCT FROM new.code)
+    EXECUTE FUNCTION statisticss_version_filiere()
+    """,
+]
+
+SUPPRESSION_POSTGRESQL = [
+    "DROP TRIGGER IF EXISTS statisticss_version_presence_aid ON attendance_presence",
+    "DROP TRIGGER IF EXISTS statisticss_version_presence_au ON attendance_presence",
+    "DROP FUNCTION IF EXISTS statisticss_version_presence()",
+    "DROP TRIGGER IF EXISTS statisticss_version_seance_aid ON courses_seancecours",
+    "DROP TRIGGER IF EXISTS statisticss_version_seance_au ON courses_seancecours",
+    "DROP FUNCTION IF EXISTS statisticss_version_seance()",
+    "DROP TRIGGER IF EXISTS statisticss_version_etudiant_aid ON students_etudiant",
+    "DROP TRIGGER IF EXISTS statisticss_version_etudiant_au ON students_etudiant",
+    "DROP FUNCTION IF EXISTS statisticss_version_etudiant()",
+    "DROP TRIGGER IF EXISTS statisticss_version_cours_aid ON courses_cours",
+    "DROP TRIGGER IF EXISTS statisticss_version_cours_au ON courses_cours",
+    "DROP FUNCTION IF EXISTS statisticss_version_cours()",
+    "DROP TRIGGER IF EXISTS statisticss_version_filiere_aid ON students_filiere",
+    "DROP TRIGGER IF EXISTS statisticss_version_filiere_au ON students_filiere",
+    "DROP FUNCTION IF EXISTS statisticss_version_filiere()",
+]
+
+CREATION = {'sqlite': CREATION_SQLITE, 'postgresql': CREATION_POSTGRESQL}
+SUPPRESSION = {'sqlite': SUPPRESSION_SQLITE, 'postgresql': SUPPRESSION_POSTGRESQL}
+
+
+def creer_triggers(apps, schema_editor):
+    # Autres moteurs : pas de triggers
+    for sql in CREATION.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def supprimer_triggers(apps, schema_editor):
+    for sql in SUPPRESSION.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('statisticss', '0003_rapport_generation'),
+        ('students', '0007_index_acces'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionDonnees',
+            fields=[
+                ('filiere_id', models.PositiveIntegerField(primary_key=True, serialize=False, verbose_name='Filière')),
+                ('version', models.BigIntegerField(default=0, verbose_name='Version')),
+            ],
+            options={
+                'verbose_name': 'Version des données',
+                'verbose_name_plural': 'Versions des données',
+            },
+        ),
+        migrations.AddField(
+            model_name='rapportpresence',
+            name='empreinte',
+            field=models.CharField(blank=True, db_index=True, max_length=64, verbose_name='Empreinte des paramètres'),
+        ),
+        migrations.AddField(
+            model_name='rapportpresence',
+            name='version_donnees',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='Version des données'),
+        ),
+        migrations.RunPython(creer_triggers, supprimer_triggers),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('statisticss', '0004_deduplication_rapports'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='rapportpresence',
+            name='format_fichier',
+            field=models.CharField(choices=[('PDF', 'PDF'), ('EXCEL', 'Excel'), ('CSV', 'CSV'), ('ZIP', 'Archive ZIP')], default='PDF', max_length=10, verbose_name='Format'),
+        ),
+        migrations.AlterField(
+            model_name='rapportpresence',
+            name='type_rapport',
+            field=models.CharField(choices=[('ETUDIANT', 'Par étudiant'), ('COURS', 'Par cours'), ('FILIERE', 'Par filière'), ('GLOBAL', 'Global'), ('BULLETINS', 'Bulletins par étudiant')], max_length=20, verbose_name='Type de rapport'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_seancecours_recapitulatif'),
+        ('statisticss', '0005_rapport_bulletins'),
+        ('students', '0007_index_acces'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlanificationRapport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(max_length=200, verbose_name='Nom')),
+                ('type_rapport', models.CharField(choices=[('ETUDIANT', 'Par étudiant'), ('COURS', 'Par cours'), ('FILIERE', 'Par filière'), ('GLOBAL', 'Global'), ('BULLETINS', 'Bulletins par étudiant')], max_length=20, verbose_name='Type de rapport')),
+                ('format_fichier', models.CharField(choices=[('PDF', 'PDF'), ('EXCEL', 'Excel'), ('CSV', 'CSV'), ('ZIP', 'Archive ZIP')], default='PDF', max_length=10, verbose_name='Format')),
+                ('periode_jours', models.PositiveIntegerField(blank=True, help_text="Le rapport couvre les N jours précédant l'exécution (vide : toutes les séances)", null=True, verbose_name='Période (jours)')),
+                ('expression_cron', models.CharField(help_text='minute heure jour mois jour_semaine, ex. « 0 5 * * 1 » : le lundi à 5h00', max_length=100, verbose_name='Expression cron')),
+                ('rattrapage', models.BooleanField(default=True, help_text='Exécutions manquées (serveur arrêté) : mettre une seule exécution de rattrapage en file', verbose_name='Rattrapage')),
+                ('actif', models.BooleanField(default=True, verbose_name='Actif')),
+                ('prochaine_execution', models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Prochaine exécution')),
+                ('derniere_execution', models.DateTimeField(blank=True, null=True, verbose_name='Dernière exécution')),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('cours', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='courses.cours', verbose_name='Cours')),
+                ('cree_par', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Créé par')),
+                ('etudiant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='students.etudiant', verbose_name='Étudiant')),
+                ('filiere', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='students.filiere', verbose_name='Filière')),
+            ],
+            options={
+                'verbose_name': 'Planification de rapport',
+                'verbose_name_plural': 'Planifications de rapports',
+                'ordering': ['nom'],
+            },
+        ),
+        migrations.AddField(
+            model_name='rapportpresence',
+            name='planification',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rapports', to='statisticss.planificationrapport', verbose_name='Planification'),
+        ),
+    ]
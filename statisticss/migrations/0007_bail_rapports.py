@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-17 07:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('statisticss', '0006_planification_rapports'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rapportpresence',
+            name='battement',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Dernier signe de vie'),
+        ),
+        migrations.AddField(
+            model_name='rapportpresence',
+            name='debut_traitement',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Début du traitement'),
+        ),
+        migrations.AddField(
+            model_name='rapportpresence',
+            name='tentatives',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Tentatives'),
+        ),
+    ]
@@ -11,12 +11,21 @@ class RapportPresence(models.Model):
         ('COURS', 'Par cours'),
         ('FILIERE', 'Par filière'),
         ('GLOBAL', 'Global'),
+        ('BULLETINS', 'Bulletins par étudiant'),
     ]
     
     FORMAT_RAPPORT = [
         ('PDF', 'PDF'),
         ('EXCEL', 'Excel'),
         ('CSV', 'CSV'),
+        ('ZIP', 'Archive ZIP'),
+    ]
+    
+    STATUTS = [
+        ('EN_ATTENTE', 'En attente'),
+        ('EN_COURS', 'En cours'),
+        ('TERMINE', 'Terminé'),
+        ('ECHEC', 'Échec'),
     ]
     
     titre = models.CharField(max_length=200, verbose_name="Titre")
@@ -57,19 +66,139 @@ class RapportPresence(models.Model):
                                         help_text="Taille en octets",
                                         verbose_name="Taille du fichier")
     
+    # Génération en arrière-plan (python manage.py generer_rapports)
+    statut = models.CharField(max_length=20, choices=STATUTS, default='EN_ATTENTE',
+                             verbose_name="Statut")
+    progression = models.PositiveSmallIntegerField(default=0, verbose_name="Progression (%)")
+    message_erreur = models.TextField(blank=True, verbose_name="Message d'erreur")
+    date_fin_generation = models.DateTimeField(null=True, blank=True,
+                                              verbose_name="Fin de génération")
+    # Bail du processus de travail : réservation, dernier signe de vie, nombre de
+    # réservations. Sans signe de vie depuis rapports.DELAI_ABANDON, le rapport
+    # est considéré abandonné (processus tué) et remis en file ou mis en échec.
+    debut_traitement = models.DateTimeField(null=True, blank=True,
+                                           verbose_name="Début du traitement")
+    battement = models.DateTimeField(null=True, blank=True,
+                                    verbose_name="Dernier signe de vie")
+    tentatives = models.PositiveSmallIntegerField(default=0, verbose_name="Tentatives")
+    
+    # Déduplication : empreinte des paramètres normalisés et version des
+    # données lue au moment du calcul (cf. versions.py)
+    empreinte = models.CharField(max_length=64, blank=True, db_index=True,
+                                verbose_name="Empreinte des paramètres")
+    version_donnees = models.BigIntegerField(null=True, blank=True,
+                                            verbose_name="Version des données")
+    
+    # Rapport mis en file par une planification (cf. planification.py)
+    planification = models.ForeignKey('PlanificationRapport', on_delete=models.SET_NULL,
+                                      null=True, blank=True, related_name='rapports',
+                                      verbose_name="Planification")
+    
     class Meta:
         verbose_name = "Rapport de présence"
         verbose_name_plural = "Rapports de présence"
         ordering = ['-date_generation']
+        indexes = [
+            # File d'attente du moteur de génération
+            models.Index(fields=['statut', 'date_generation'], name='rapport_statut_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.titre} - {self.date_generation.strftime('%d/%m/%Y %H:%M')}"
+    
+    def est_en_cours(self):
+        return self.statut in ('EN_ATTENTE', 'EN_COURS')
+
+
+class PlanificationRapport(models.Model):
+    """
+    Rapport récurrent : une expression cron (heure locale) indique quand
+    mettre un RapportPresence en file (python manage.py generer_rapports).
+    """
+    nom = models.CharField(max_length=200, verbose_name="Nom")
+    type_rapport = models.CharField(max_length=20, choices=RapportPresence.TYPE_RAPPORT,
+                                   verbose_name="Type de rapport")
+    format_fichier = models.CharField(max_length=10, choices=RapportPresence.FORMAT_RAPPORT,
+                                     default='PDF', verbose_name="Format")
+    etudiant = models.ForeignKey(Etudiant, on_delete=models.CASCADE,
+                                null=True, blank=True, verbose_name="Étudiant")
+    cours = models.ForeignKey(Cours, on_delete=models.CASCADE,
+                             null=True, blank=True, verbose_name="Cours")
+    filiere = models.ForeignKey(Filiere, on_delete=models.CASCADE,
+                               null=True, blank=True, verbose_name="Filière")
+    periode_jours = models.PositiveIntegerField(null=True, blank=True,
+                                               help_text="Le rapport couvre les N jours précédant l'exécution "
+                                                         "(vide : toutes les séances)",
+                                               verbose_name="Période (jours)")
+    
+    expression_cron = models.CharField(max_length=100,
+                                      help_text="minute heure jour mois jour_semaine, "
+                                                "ex. « 0 5 * * 1 » : le lundi à 5h00",
+                                      verbose_name="Expression cron")
+    rattrapage = models.BooleanField(default=True,
+                                    help_text="Exécutions manquées (serveur arrêté) : mettre une "
+                                              "seule exécution de rattrapage en file",
+                                    verbose_name="Rattrapage")
+    actif = models.BooleanField(default=True, verbose_name="Actif")
+    
+    prochaine_execution = models.DateTimeField(null=True, blank=True, db_index=True,
+                                              verbose_name="Prochaine exécution")
+    derniere_execution = models.DateTimeField(null=True, blank=True,
+                                             verbose_name="Dernière exécution")
+    cree_par = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                verbose_name="Créé par")
+    date_creation = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Planification de rapport"
+        verbose_name_plural = "Planifications de rapports"
+        ordering = ['nom']
+    
+    def __str__(self):
+        return f"{self.nom} ({self.expression_cron})"
+    
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        from .planification import ExpressionCronInvalide, analyser_cron
+        from .rapports import REGROUPEMENTS
+        
+        erreurs = {}
+        try:
+            analyser_cron(self.expression_cron)
+        except ExpressionCronInvalide as erreur:
+            erreurs['expression_cron'] = str(erreur)
+        
+        # Filtre exigé par le type de rapport (sans lui, chaque exécution échouerait)
+        filtre = REGROUPEMENTS.get(self.type_rapport, (None,))[0]
+        if filtre and getattr(self, f'{filtre}_id') is None:
+            erreurs[filtre] = f"Obligatoire pour un rapport {self.get_type_rapport_display().lower()}."
+        
+        if erreurs:
+            raise ValidationError(erreurs)
+    
+    def save(self, *args, **kwargs):
+        if self.prochaine_execution is None:
+            from django.utils import timezone
+            from .planification import prochaine_occurrence
+            self.prochaine_execution = prochaine_occurrence(self.expression_cron, timezone.now())
+        super().save(*args, **kwargs)
 
 
 class StatistiqueCache(models.Model):
     """Cache des statistiques calculées pour améliorer les performances"""
+    PORTEES = [
+        ('globales', 'Statistiques globales'),
+        ('filiere', 'Filière'),
+        ('cours', 'Cours'),
+        ('etudiant', 'Étudiant'),
+    ]
+    
     cle = models.CharField(max_length=200, unique=True, 
                           verbose_name="Clé")
+    portee = models.CharField(max_length=20, choices=PORTEES, default='globales',
+                             verbose_name="Portée")
+    objet_id = models.PositiveIntegerField(null=True, blank=True,
+                                          verbose_name="Objet concerné")
     valeur = models.JSONField(verbose_name="Valeur")
     date_calcul = models.DateTimeField(auto_now=True, 
                                       verbose_name="Date de calcul")
@@ -79,6 +208,10 @@ class StatistiqueCache(models.Model):
         verbose_name = "Statistique en cache"
         verbose_name_plural = "Statistiques en cache"
         ordering = ['-date_calcul']
+        indexes = [
+            # Invalidation ciblée par les triggers (statisticss/cache.py)
+            models.Index(fields=['portee', 'objet_id'], name='cache_portee_objet_idx'),
+        ]
     
     def __str__(self):
         return self.cle
@@ -86,4 +219,21 @@ class StatistiqueCache(models.Model):
     def est_expire(self):
         """Vérifie si le cache est expiré"""
         from django.utils import timezone
-        return timezone.now() > self.date_expiration
\ No newline at end of file
+        return timezone.now() > self.date_expiration
+
+
+class VersionDonnees(models.Model):
+    """
+    Version des données de présence d'une filière, incrémentée par triggers
+    (statisticss/versions.py). Pas de clé étrangère : le trigger peut écrire
+    pendant la suppression d'une filière.
+    """
+    filiere_id = models.PositiveIntegerField(primary_key=True, verbose_name="Filière")
+    version = models.BigIntegerField(default=0, verbose_name="Version")
+    
+    class Meta:
+        verbose_name = "Version des données"
+        verbose_name_plural = "Versions des données"
+    
+    def __str__(self):
+        return f"Filière {self.filiere_id} : v{self.version}"
@@ -0,0 +1,125 @@
+# ============================================
+# statisticss/pdf.py
+# Écriture PDF minimale (tableaux de texte) pour les rapports
+# ============================================
+#
+# Pas de dépendance externe : le document est composé de pages A4 portrait,
+# police Helvetica (encodage WinAnsi, accents français compris), un titre,
+# quelques lignes de résumé puis un tableau répété d'en-tête en en-tête de
+# page. Suffisant pour des rapports de présence ; pour une mise en page riche,
+# passer par l'export Excel.
+
+LARGEUR, HAUTEUR = 595, 842   # A4 en points
+MARGE = 40
+TAILLE_POLICE = 9
+INTERLIGNE = 13
+LARGEUR_CARACTERE = 5.0       # approximation Helvetica 9 pt, pour tronquer les cellules
+
+
+def _texte(valeur):
+    """Chaîne PDF littérale (WinAnsi) échappée"""
+    brut = str(valeur).encode('cp1252', errors='replace')
+    return b'(' + brut.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+def _largeurs_colonnes(entetes, lignes):
+    """Largeur de chaque colonne, proportionnelle au contenu le plus long, ramenée à la page"""
+    longueurs = [len(str(entete)) for entete in entetes]
+    for ligne in lignes:
+        for i, valeur in enumerate(ligne):
+            longueurs[i] = max(longueurs[i], len(str(valeur)))
+    largeurs = [(longueur + 2) * LARGEUR_CARACTERE for longueur in longueurs]
+    disponible = LARGEUR - 2 * MARGE
+    total = sum(largeurs)
+    if total > disponible:
+        largeurs = [largeur * disponible / total for largeur in largeurs]
+    return largeurs
+
+
+class _Page:
+    def __init__(self):
+        self.y = HAUTEUR - MARGE
+        self.commandes = []
+
+    def ecrire(self, x, valeur, taille=TAILLE_POLICE, police=b'F1'):
+        self.commandes.append(
+            b'BT /' + police + b' %d Tf %.1f %.1f Td ' % (taille, x, self.y) + _texte(valeur) + b' Tj ET'
+        )
+
+    def ligne_horizontale(self):
+        y = self.y + INTERLIGNE - 3
+        self.commandes.append(b'%.1f %.1f m %.1f %.1f l S' % (MARGE, y, LARGEUR - MARGE, y))
+
+
+def ecrire_pdf(sortie, titre, resume, entetes, lignes):
+    """
+    Écrit le document dans le fichier binaire 'sortie'.
+    resume : [(libellé, valeur)] ; lignes : itérable de tuples. Retourne le nombre de pages.
+    """
+    lignes = list(lignes)
+    largeurs = _largeurs_colonnes(entetes, lignes)
+    positions = [MARGE + sum(largeurs[:i]) for i in range(len(largeurs))]
+
+    def tronquer(valeur, largeur):
+        texte = str(valeur)
+        maximum = max(1, int(largeur / LARGEUR_CARACTERE) - 1)
+        return texte if len(texte) <= maximum else texte[:maximum - 1] + '…'
+
+    def entete_tableau(page):
+        for x, entete, largeur in zip(positions, entetes, largeurs):
+            page.ecrire(x, tronquer(entete, largeur), police=b'F2')
+        page.y -= INTERLIGNE
+        page.ligne_horizontale()
+
+    pages = [_Page()]
+    page = pages[0]
+    page.ecrire(MARGE, titre, taille=14, police=b'F2')
+    page.y -= 2 * INTERLIGNE
+    for libelle, valeur in resume:
+        page.ecrire(MARGE, f"{libelle} : {valeur}")
+        page.y -= INTERLIGNE
+    page.y -= INTERLIGNE
+    entete_tableau(page)
+
+    for ligne in lignes:
+        if page.y < MARGE + 2 * INTERLIGNE:
+            page = _Page()
+            pages.append(page)
+            entete_tableau(page)
+        for x, valeur, largeur in zip(positions, ligne, largeurs):
+            page.ecrire(x, tronquer(valeur, largeur))
+        page.y -= INTERLIGNE
+
+    # Objets : 1 catalogue, 2 arbre des pages, 3-4 polices, puis (contenu, page) par page
+    objets = {
+        3: b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+        4: b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>',
+    }
+    ids_pages = []
+    for numero, page in enumerate(pages, start=1):
+        page.y = MARGE - INTERLIGNE
+        page.ecrire(LARGEUR - MARGE - 50, f"Page {numero} / {len(pages)}", taille=8)
+        contenu = b'\n'.join(page.commandes)
+        id_contenu = 5 + 2 * (numero - 1)
+        objets[id_contenu] = b'<< /Length %d >>\nstream\n' % len(contenu) + contenu + b'\nendstream'
+        objets[id_contenu + 1] = (
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] ' % (LARGEUR, HAUTEUR)
+            + b'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>' % id_contenu
+        )
+        ids_pages.append(id_contenu + 1)
+    objets[1] = b'<< /Type /Catalog /Pages 2 0 R >>'
+    objets[2] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+        b' '.join(b'%d 0 R' % i for i in ids_pages), len(ids_pages))
+
+    debut = sortie.tell()
+    sortie.write(b'%PDF-1.4\n')
+    decalages = {}
+    for numero in sorted(objets):
+        decalages[numero] = sortie.tell() - debut
+        sortie.write(b'%d 0 obj\n' % numero + objets[numero] + b'\nendobj\n')
+    xref = sortie.tell() - debut
+    sortie.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objets) + 1))
+    for numero in sorted(objets):
+        sortie.write(b'%010d 00000 n \n' % decalages[numero])
+    sortie.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objets) + 1, xref))
+    return len(pages)
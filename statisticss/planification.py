@@ -0,0 +1,195 @@
+# ============================================
+# statisticss/planification.py
+# Rapports récurrents (PlanificationRapport) : expressions cron et mise en file
+# ============================================
+#
+# Le processus de travail (python manage.py generer_rapports) appelle
+# planifier_rapports() à chaque passage : chaque planification échue met un
+# RapportPresence 'EN_ATTENTE' en file puis avance à sa prochaine occurrence.
+#
+#   - Réservation : l'avance est un UPDATE conditionnel sur l'ancienne échéance,
+#     plusieurs processus de travail ne mettent donc jamais deux fois en file.
+#   - Rattrapage : après un arrêt, une planification en retard de plusieurs
+#     occurrences ne produit qu'un rapport (ou aucun si rattrapage=False).
+#   - Plafond : au plus MAX_PLANIFIES_EN_COURS rapports planifiés en file ou
+#     en cours (hors rapports abandonnés, cf. rapports.DELAI_ABANDON) ; les
+#     échéances au-delà attendent le passage suivant.
+#   - Expression invalide (modifiée hors formulaire, anciennes règles) : la
+#     planification est désactivée et journalisée, les autres continuent.
+#   - Appel en cours : tant qu'une séance se déroule, rien n'est mis en file.
+#     Les rapports demandés à la main passent avant les rapports planifiés
+#     (cf. rapports.reserver_rapport).
+
+import logging
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from courses.models import SeanceCours
+from .models import PlanificationRapport, RapportPresence
+from .rapports import empreinte_parametres, en_cours_vivant, rapport_identique
+
+logger = logging.getLogger(__name__)
+
+MAX_PLANIFIES_EN_COURS = 2
+ANNEES_RECHERCHE = 5     # « 29 février un lundi » peut attendre plusieurs années
+
+# (nom, minimum, maximum) ; jour_semaine : 0 ou 7 = dimanche
+CHAMPS_CRON = [
+    ('minute', 0, 59),
+    ('heure', 0, 23),
+    ('jour', 1, 31),
+    ('mois', 1, 12),
+    ('jour_semaine', 0, 7),
+]
+
+
+class ExpressionCronInvalide(ValueError):
+    """Expression cron mal formée ou sans occurrence"""
+
+
+# ============================================
+# EXPRESSIONS CRON
+# ============================================
+
+def _valeurs(champ, nom, minimum, maximum):
+    """'*', 'a', 'a-b', listes 'a,b' et pas '/n' -> ensemble des valeurs"""
+    valeurs = set()
+    for partie in champ.split(','):
+        plage, barre, pas = partie.partition('/')
+        try:
+            pas = int(pas) if barre else 1
+            if plage == '*':
+                debut, fin = minimum, maximum
+            elif '-' in plage:
+                debut, fin = (int(borne) for borne in plage.split('-', 1))
+            else:
+                debut = int(plage)
+                fin = maximum if barre else debut
+        except ValueError:
+            raise ExpressionCronInvalide(f"Champ {nom} invalide : « {champ} »")
+        if pas < 1 or not minimum <= debut <= fin <= maximum:
+            raise ExpressionCronInvalide(f"Champ {nom} hors limites ({minimum}-{maximum}) : « {champ} »")
+        valeurs.update(range(debut, fin + 1, pas))
+    return valeurs
+
+
+def analyser_cron(expression):
+    """
+    'minute heure jour mois jour_semaine' -> dict des ensembles de valeurs, plus
+    'jour_libre' / 'jour_semaine_libre' (champ '*') pour la règle cron : si les
+    deux jours sont restreints, l'un OU l'autre suffit.
+    """
+    champs = (expression or '').split()
+    if len(champs) != len(CHAMPS_CRON):
+        raise ExpressionCronInvalide("5 champs attendus : minute heure jour mois jour_semaine")
+    cron = {nom: _valeurs(champ, nom, minimum, maximum)
+            for champ, (nom, minimum, maximum) in zip(champs, CHAMPS_CRON)}
+    cron['jour_semaine'] = {jour % 7 for jour in cron['jour_semaine']}
+    cron['jour_libre'] = champs[2] == '*'
+    cron['jour_semaine_libre'] = champs[4] == '*'
+    return cron
+
+
+def _jour_convient(cron, jour):
+    if jour.month not in cron['mois']:
+        return False
+    par_date = jour.day in cron['jour']
+    par_semaine = (jour.weekday() + 1) % 7 in cron['jour_semaine']
+    if cron['jour_libre'] or cron['jour_semaine_libre']:
+        return par_date and par_semaine
+    return par_date or par_semaine
+
+
+def prochaine_occurrence(expression, apres):
+    """Première occurrence (datetime aware, fuseau local) strictement postérieure à 'apres'"""
+    cron = analyser_cron(expression)
+    depart = timezone.localtime(apres).replace(second=0, microsecond=0) + timedelta(minutes=1)
+    heures, minutes = sorted(cron['heure']), sorted(cron['minute'])
+
+    jour = depart.date()
+    for _ in range(366 * ANNEES_RECHERCHE):
+        if _jour_convient(cron, jour):
+            minimum = (depart.hour, depart.minute) if jour == depart.date() else (0, 0)
+            for heure in heures:
+                for minute in minutes:
+                    if (heure, minute) >= minimum:
+                        return timezone.make_aware(datetime.combine(jour, time(heure, minute)))
+        jour += timedelta(days=1)
+    raise ExpressionCronInvalide(f"Aucune occurrence pour « {expression} »")
+
+
+# ============================================
+# MISE EN FILE
+# ============================================
+
+def seance_en_cours(maintenant):
+    local = timezone.localtime(maintenant)
+    return SeanceCours.objects.filter(
+        date=local.date(), heure_debut__lte=local.time(), heure_fin__gt=local.time(), annulee=False,
+    ).exists()
+
+
+def rapport_planifie(planification, maintenant):
+    """RapportPresence (non enregistré) d'une exécution de la planification"""
+    jour = timezone.localdate(maintenant)
+    rapport = RapportPresence(
+        titre=f"{planification.nom} - {timezone.localtime(maintenant).strftime('%d/%m/%Y %H:%M')}",
+        type_rapport=planification.type_rapport,
+        format_fichier='ZIP' if planification.type_rapport == 'BULLETINS' else planification.format_fichier,
+        etudiant_id=planification.etudiant_id,
+        cours_id=planification.cours_id,
+        filiere_id=planification.filiere_id,
+        genere_par_id=planification.cree_par_id,
+        planification=planification,
+    )
+    if planification.periode_jours:
+        rapport.date_debut = jour - timedelta(days=planification.periode_jours)
+        rapport.date_fin = jour - timedelta(days=1)
+    rapport.empreinte = empreinte_parametres(rapport)
+    return rapport
+
+
+def planifier_rapports(maintenant=None, maximum=MAX_PLANIFIES_EN_COURS):
+    """Met en file les rapports des planifications échues. Retourne le nombre mis en file"""
+    maintenant = maintenant or timezone.now()
+    if seance_en_cours(maintenant):
+        return 0
+
+    # Un rapport EN_COURS abandonné (processus tué) ne garde pas sa place
+    places = maximum - RapportPresence.objects.filter(
+        Q(statut='EN_ATTENTE') | en_cours_vivant(), planification__isnull=False).count()
+    echues = PlanificationRapport.objects.filter(
+        actif=True, prochaine_execution__lte=maintenant).order_by('prochaine_execution')
+
+    nombre = 0
+    for planification in echues:
+        try:
+            suivante = prochaine_occurrence(planification.expression_cron, maintenant)
+            # Une autre occurrence est déjà passée : exécutions manquées
+            manquee = prochaine_occurrence(planification.expression_cron,
+                                           planification.prochaine_execution) <= maintenant
+        except ExpressionCronInvalide as erreur:
+            logger.error("Planification %s désactivée : %s", planification.pk, erreur)
+            PlanificationRapport.objects.filter(pk=planification.pk).update(actif=False)
+            continue
+        executer = planification.rattrapage or not manquee
+        if executer and places <= 0:
+            continue
+
+        # Un autre processus a pu avancer cette planification entre-temps
+        avancee = PlanificationRapport.objects.filter(
+            pk=planification.pk, prochaine_execution=planification.prochaine_execution,
+        ).update(prochaine_execution=suivante)
+        if not avancee or not executer:
+            continue
+
+        rapport = rapport_planifie(planification, maintenant)
+        # Rapport identique déjà en file ou à jour : rien à refaire
+        if rapport_identique(rapport) is None:
+            rapport.save()
+            places -= 1
+            nombre += 1
+        PlanificationRapport.objects.filter(pk=planification.pk).update(derniere_execution=maintenant)
+    return nombre
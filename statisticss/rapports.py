@@ -0,0 +1,347 @@
+# ============================================
+# statisticss/rapports.py
+# Moteur de génération des rapports de présence
+# ============================================
+#
+# generer_rapport (vue) enregistre seulement un RapportPresence 'EN_ATTENTE'
+# et rend la main. Un ou plusieurs processus de travail
+# (python manage.py generer_rapports --boucle) réservent les rapports en
+# attente (UPDATE conditionnel : un rapport n'est traité qu'une fois), calculent
+# les données par requêtes d'agrégation, écrivent le fichier (PDF / Excel / CSV)
+# et enregistrent sa taille et son nombre de pages. La progression est écrite
+# au fil de l'eau et affichée par liste_rapports.
+#
+# Bail : chaque écriture de progression est aussi un signe de vie (battement).
+# Un rapport EN_COURS muet depuis DELAI_ABANDON appartient à un processus
+# arrêté (tué, mémoire, redémarrage) : la réservation suivante le remet en
+# file, ou le met en échec après MAX_TENTATIVES réservations.
+#
+# Déduplication : chaque rapport porte l'empreinte de ses paramètres normalisés
+# et la version des données (versions.py) lue avant le calcul. Une demande
+# identique est servie par le rapport existant tant que cette version n'a pas
+# changé (ou s'il est encore en file : il sera calculé sur des données à jour).
+#
+# Bulletins : le type 'BULLETINS' produit une archive ZIP d'un bulletin PDF par
+# étudiant (d'une filière, ou de tout l'établissement) ; voir bulletins.py.
+
+import csv
+import hashlib
+import io
+import json
+import logging
+import tempfile
+from datetime import timedelta
+
+from django.core.files import File
+from django.db.models import BooleanField, Count, ExpressionWrapper, F, Q
+from django.utils import timezone
+from openpyxl import Workbook
+
+from attendance.models import Presence
+from .bulletins import ecrire_bulletins
+from .models import RapportPresence
+from .pdf import ecrire_pdf
+from .versions import version_filiere, version_globale
+
+logger = logging.getLogger(__name__)
+
+COLONNES_STATS = ['Total', 'Présents', 'Absents', 'Retards', 'Justifiés', 'Taux (%)']
+EXTENSIONS = {'PDF': 'pdf', 'EXCEL': 'xlsx', 'CSV': 'csv', 'ZIP': 'zip'}
+
+# type de rapport : (filtre requis, regroupement, en-têtes des colonnes de regroupement)
+REGROUPEMENTS = {
+    'ETUDIANT': ('etudiant', ['seance__cours__code', 'seance__cours__intitule'], ['Code', 'Cours']),
+    'COURS': ('cours', ['etudiant__matricule', 'etudiant__nom', 'etudiant__prenom'],
+              ['Matricule', 'Nom', 'Prénom']),
+    'FILIERE': ('filiere', ['etudiant__matricule', 'etudiant__nom', 'etudiant__prenom'],
+                ['Matricule', 'Nom', 'Prénom']),
+    'GLOBAL': (None, ['etudiant__filiere__code'], ['Filière']),
+}
+BULLETINS = 'BULLETINS'   # filière facultative : sans filière, tout l'établissement
+FILTRES = {
+    'etudiant': 'etudiant',
+    'cours': 'seance__cours',
+    'filiere': 'etudiant__filiere',
+}
+
+
+DELAI_ABANDON = timedelta(minutes=15)
+MAX_TENTATIVES = 2
+DELAI_ATTENTE = timedelta(minutes=2)   # au-delà, un rapport en file signale un processus absent
+
+
+class RapportInvalide(Exception):
+    """Rapport impossible à générer (filtre manquant)"""
+
+
+# ============================================
+# DONNÉES (requêtes d'agrégation)
+# ============================================
+
+def _taux(presents, total):
+    return round(presents / total * 100, 2) if total else 0
+
+
+def presences_rapport(rapport):
+    """Présences couvertes par le rapport (filtre principal + période)"""
+    filtre, _, _ = REGROUPEMENTS[rapport.type_rapport]
+    presences = Presence.objects.all()
+    if filtre:
+        objet_id = getattr(rapport, f'{filtre}_id')
+        if objet_id is None:
+            raise RapportInvalide(f"Rapport {rapport.get_type_rapport_display().lower()} sans {filtre}")
+        presences = presences.filter(**{f'{FILTRES[filtre]}_id': objet_id})
+    if rapport.date_debut:
+        presences = presences.filter(seance__date__gte=rapport.date_debut)
+    if rapport.date_fin:
+        presences = presences.filter(seance__date__lte=rapport.date_fin)
+    return presences
+
+
+def donnees_rapport(rapport):
+    """
+    Calcule le contenu du rapport en une requête GROUP BY.
+    Retourne {'titre', 'resume': [(libellé, valeur)], 'entetes', 'lignes': [tuples]}.
+    """
+    _, regroupement, entetes = REGROUPEMENTS[rapport.type_rapport]
+    agregats = presences_rapport(rapport).values(*regroupement).annotate(
+        total=Count('id'),
+        presents=Count('id', filter=Q(statut='P')),
+        absents=Count('id', filter=Q(statut='A')),
+        retards=Count('id', filter=Q(statut='R')),
+        justifies=Count('id', filter=Q(statut='J')),
+    ).order_by(*regroupement)
+
+    lignes = []
+    total = presents = 0
+    for ligne in agregats:
+        assidus = ligne['presents'] + ligne['retards'] + ligne['justifies']
+        total += ligne['total']
+        presents += assidus
+        lignes.append((
+            *(ligne[champ] for champ in regroupement),
+            ligne['total'], ligne['presents'], ligne['absents'], ligne['retards'], ligne['justifies'],
+            _taux(assidus, ligne['total']),
+        ))
+
+    periode = ' - '.join(d.strftime('%d/%m/%Y') for d in (rapport.date_debut, rapport.date_fin) if d)
+    resume = [
+        ('Type', rapport.get_type_rapport_display()),
+        ('Période', periode or 'Toutes les séances'),
+        ('Présences enregistrées', total),
+        ('Taux de présence', f"{_taux(presents, total)} %"),
+    ]
+    for filtre in ('etudiant', 'cours', 'filiere'):
+        objet = getattr(rapport, filtre)
+        if objet is not None:
+            resume.insert(1, (objet._meta.verbose_name.capitalize(), str(objet)))
+    return {
+        'titre': rapport.titre,
+        'resume': resume,
+        'entetes': entetes + COLONNES_STATS,
+        'lignes': lignes,
+    }
+
+
+# ============================================
+# DÉDUPLICATION
+# ============================================
+
+def empreinte_parametres(rapport):
+    """SHA-256 des paramètres qui déterminent le fichier (le titre et l'auteur n'en font pas partie)"""
+    if rapport.type_rapport == BULLETINS:
+        filtre = 'filiere'
+    else:
+        filtre, _, _ = REGROUPEMENTS.get(rapport.type_rapport, (None, None, None))
+    parametres = {
+        'type': rapport.type_rapport,
+        'format': rapport.format_fichier,
+        'objet': getattr(rapport, f'{filtre}_id') if filtre else None,
+        'debut': rapport.date_debut.isoformat() if rapport.date_debut else None,
+        'fin': rapport.date_fin.isoformat() if rapport.date_fin else None,
+    }
+    return hashlib.sha256(json.dumps(parametres, sort_keys=True).encode()).hexdigest()
+
+
+def version_rapport(rapport):
+    """Version courante des données lues par le rapport"""
+    if rapport.type_rapport == 'GLOBAL' or (rapport.type_rapport == BULLETINS and not rapport.filiere_id):
+        return version_globale()
+    if rapport.type_rapport == 'ETUDIANT' and rapport.etudiant_id:
+        return version_filiere(rapport.etudiant.filiere_id)
+    if rapport.type_rapport == 'COURS' and rapport.cours_id:
+        return version_filiere(rapport.cours.filiere_id)
+    return version_filiere(rapport.filiere_id)
+
+
+def rapport_identique(rapport):
+    """
+    Rapport existant réutilisable pour les mêmes paramètres, ou None : terminé
+    sur la même version des données, ou en file / en cours depuis moins de
+    DELAI_ABANDON (un rapport abandonné ne retient jamais les demandes suivantes).
+    """
+    candidats = RapportPresence.objects.filter(empreinte=empreinte_parametres(rapport)).filter(
+        Q(statut='EN_ATTENTE', date_generation__gte=limite_abandon())
+        | en_cours_vivant()
+        | Q(statut='TERMINE', version_donnees=version_rapport(rapport))
+    ).exclude(pk=rapport.pk)
+    return candidats.order_by('-date_generation').first()
+
+
+# ============================================
+# FORMATS
+# ============================================
+
+def _ecrire_csv(sortie, donnees):
+    texte = io.TextIOWrapper(sortie, encoding='utf-8-sig', newline='')
+    writer = csv.writer(texte, delimiter=';')
+    writer.writerow(donnees['entetes'])
+    writer.writerows(donnees['lignes'])
+    texte.flush()
+    texte.detach()
+    return 1
+
+
+def _ecrire_xlsx(sortie, donnees):
+    classeur = Workbook(write_only=True)
+    feuille = classeur.create_sheet('Rapport')
+    feuille.append([donnees['titre']])
+    for libelle, valeur in donnees['resume']:
+        feuille.append([libelle, valeur])
+    feuille.append([])
+    feuille.append(donnees['entetes'])
+    for ligne in donnees['lignes']:
+        feuille.append(ligne)
+    classeur.save(sortie)
+    return 1
+
+
+def _ecrire_pdf(sortie, donnees):
+    return ecrire_pdf(sortie, donnees['titre'], donnees['resume'], donnees['entetes'], donnees['lignes'])
+
+
+ECRIVAINS = {'PDF': _ecrire_pdf, 'EXCEL': _ecrire_xlsx, 'CSV': _ecrire_csv}
+
+
+# ============================================
+# FILE D'ATTENTE / TRAITEMENT
+# ============================================
+
+def _progression(rapport, valeur, **champs):
+    RapportPresence.objects.filter(pk=rapport.pk).update(
+        progression=valeur, battement=timezone.now(), **champs)
+
+
+def limite_abandon():
+    """Un rapport EN_COURS sans signe de vie depuis cette date est abandonné"""
+    return timezone.now() - DELAI_ABANDON
+
+
+def en_cours_vivant():
+    """Filtre des rapports EN_COURS dont le processus de travail donne signe de vie"""
+    return Q(statut='EN_COURS', battement__gte=limite_abandon())
+
+
+def file_sans_processus():
+    """
+    Des rapports attendent depuis plus de DELAI_ATTENTE et aucun n'est traité
+    par un processus vivant : generer_rapports ne tourne vraisemblablement pas.
+    """
+    anciens = RapportPresence.objects.filter(statut='EN_ATTENTE',
+                                             date_generation__lt=timezone.now() - DELAI_ATTENTE)
+    return anciens.exists() and not RapportPresence.objects.filter(en_cours_vivant()).exists()
+
+
+def liberer_rapports_abandonnes():
+    """
+    Rapports EN_COURS abandonnés : remis en file, ou en échec après
+    MAX_TENTATIVES réservations. Retourne (remis en file, en échec).
+    """
+    abandonnes = RapportPresence.objects.filter(statut='EN_COURS').exclude(en_cours_vivant())
+    remis = abandonnes.filter(tentatives__lt=MAX_TENTATIVES).update(statut='EN_ATTENTE', progression=0)
+    echecs = abandonnes.update(
+        statut='ECHEC', progression=0, date_fin_generation=timezone.now(),
+        message_erreur="Génération interrompue : le processus de travail s'est arrêté",
+    )
+    return remis, echecs
+
+
+def reserver_rapport():
+    """
+    Réserve le plus ancien rapport en attente (EN_ATTENTE -> EN_COURS), les
+    rapports demandés à la main avant les rapports planifiés. None si la file est vide.
+    """
+    liberer_rapports_abandonnes()
+    while True:
+        rapport_id = RapportPresence.objects.filter(statut='EN_ATTENTE').annotate(
+            planifie=ExpressionWrapper(Q(planification__isnull=False), output_field=BooleanField()),
+        ).order_by('planifie', 'date_generation').values_list('id', flat=True).first()
+        if rapport_id is None:
+            return None
+        # Un autre processus a pu réserver ce rapport entre-temps : on passe au suivant
+        maintenant = timezone.now()
+        if RapportPresence.objects.filter(id=rapport_id, statut='EN_ATTENTE').update(
+                statut='EN_COURS', progression=0, debut_traitement=maintenant, battement=maintenant,
+                tentatives=F('tentatives') + 1):
+            return RapportPresence.objects.select_related('etudiant', 'cours', 'filiere').get(id=rapport_id)
+
+
+def _ecrire_rapport(sortie, rapport, processus):
+    """Écrit le fichier du rapport dans 'sortie'. Retourne le nombre de pages"""
+    if rapport.type_rapport == BULLETINS:
+        if rapport.format_fichier != 'ZIP':
+            raise RapportInvalide("Les bulletins sont produits en archive ZIP")
+        return ecrire_bulletins(sortie, rapport, processus, progression=lambda fait, total: _progression(
+            rapport, min(90, 5 + 85 * fait // max(total, 1))))
+
+    if rapport.format_fichier not in ECRIVAINS:
+        raise RapportInvalide(f"Format {rapport.get_format_fichier_display()} réservé aux bulletins")
+    donnees = donnees_rapport(rapport)
+    _progression(rapport, 50)
+    return ECRIVAINS[rapport.format_fichier](sortie, donnees)
+
+
+def generer_fichier(rapport, processus=1):
+    """
+    Génère le fichier d'un rapport réservé et enregistre taille, pages et statut.
+    processus : taille du pool de rendu des bulletins (1 = rendu dans ce processus).
+    """
+    try:
+        # Version lue avant les données : une écriture concurrente la rend
+        # seulement plus ancienne (régénération inutile, jamais de fichier périmé)
+        rapport.version_donnees = version_rapport(rapport)
+
+        with tempfile.TemporaryFile() as sortie:
+            nombre_pages = _ecrire_rapport(sortie, rapport, processus)
+            _progression(rapport, 90)
+            sortie.seek(0)
+            nom = f"rapport_{rapport.pk}_{rapport.type_rapport.lower()}.{EXTENSIONS[rapport.format_fichier]}"
+            rapport.fichier.save(nom, File(sortie), save=False)
+
+        rapport.taille_fichier = rapport.fichier.size
+        rapport.nombre_pages = nombre_pages
+        rapport.statut = 'TERMINE'
+        rapport.progression = 100
+        rapport.message_erreur = ''
+        rapport.date_fin_generation = timezone.now()
+        rapport.save(update_fields=['fichier', 'taille_fichier', 'nombre_pages', 'statut', 'progression',
+                                    'message_erreur', 'date_fin_generation', 'version_donnees'])
+    except Exception as erreur:
+        if not isinstance(erreur, RapportInvalide):
+            logger.exception("Échec de la génération du rapport %s", rapport.pk)
+        _progression(rapport, 0, statut='ECHEC', message_erreur=str(erreur),
+                     date_fin_generation=timezone.now())
+        return False
+    return True
+
+
+def traiter_rapports_en_attente(limite=None, processus=1):
+    """Traite les rapports en attente (au plus 'limite'). Retourne le nombre traité"""
+    nombre = 0
+    while limite is None or nombre < limite:
+        rapport = reserver_rapport()
+        if rapport is None:
+            break
+        generer_fichier(rapport, processus)
+        nombre += 1
+    return nombre
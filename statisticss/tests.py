@@ -1,3 +1,555 @@
-from django.test import TestCase
+import shutil
+import tempfile
+import zipfile
+from datetime import date, datetime, timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from attendance.models import Presence
+from courses.models import Cours, SeanceCours
+from attendance.tests import creer_filiere_avec_etudiants
+from .bulletins import ecrire_bulletins
+from .cache import cle_cache, lire_ou_calculer, purger_cache_expire
+from .models import PlanificationRapport, RapportPresence, StatistiqueCache
+from .planification import ExpressionCronInvalide, planifier_rapports, prochaine_occurrence
+from .versions import version_filiere, version_globale
+from .rapports import DELAI_ABANDON, DELAI_ATTENTE, reserver_rapport, traiter_rapports_en_attente
+from .views import (
+    SEANCES_PAR_PAGE, _calculer_statistiques_classe, _calculer_statistiques_cours,
+    _calculer_statistiques_etudiant, _calculer_statistiques_globales,
+)
+
+
+class CacheStatistiquesTests(TestCase):
+    """Pages de statistiques servies depuis StatistiqueCache, invalidées par les écritures"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@test.cm', 'pass')
+        self.client.force_login(self.user)
+        self.seance, self.etudiants = creer_filiere_avec_etudiants(3)
+        self.seance.presente = True
+        self.seance.save()
+        for etudiant in self.etudiants:
+            Presence.objects.create(etudiant=etudiant, seance=self.seance, statut='P')
+        self.cours = self.seance.cours
+        self.filiere = self.cours.filiere
+
+    def _afficher_pages(self):
+        urls = [
+            reverse('statistiques_globales'),
+            reverse('statistiques_par_classe') + f'?filiere={self.filiere.id}',
+            reverse('statistiques_par_cours', args=[self.cours.code]),
+            reverse('statistiques_par_etudiant', args=[self.etudiants[0].matricule]),
+            reverse('statistiques_par_etudiant', args=[self.etudiants[1].matricule]),
+        ]
+        with CaptureQueriesContext(connection) as requetes:
+            for url in urls:
+                self.assertEqual(self.client.get(url).status_code, 200)
+        return len(requetes)
+
+    def test_second_affichage_depuis_le_cache(self):
+        premier = self._afficher_pages()
+        self.assertEqual(StatistiqueCache.objects.count(), 5)
+        self.assertLess(self._afficher_pages(), premier)
+
+        response = self.client.get(reverse('statistiques_par_cours', args=[self.cours.code]))
+        self.assertEqual(response.context['stats_seances'][0]['seance'], self.seance)
+        self.assertEqual(response.context['taux_moyen'], 100.0)
+
+    def test_invalidation_ciblee(self):
+        self._afficher_pages()
+
+        Presence.objects.filter(etudiant=self.etudiants[0]).update(statut='A')
+        restantes = list(StatistiqueCache.objects.values_list('portee', 'objet_id'))
+        self.assertEqual(restantes, [('etudiant', self.etudiants[1].id)])
+
+        response = self.client.get(reverse('statistiques_par_cours', args=[self.cours.code]))
+        self.assertEqual(response.context['stats_seances'][0]['presents'], 2)
+
+        # Séance modifiée : son cours, sa filière et les étudiants qui y ont une présence
+        self._afficher_pages()
+        StatistiqueCache.objects.create(cle='cours:0:', portee='cours', objet_id=0, valeur={},
+                                        date_expiration=timezone.now() + timedelta(minutes=5))
+        self.seance.heure_fin = self.seance.heure_fin.replace(hour=11)
+        self.seance.save()
+        self.assertEqual(list(StatistiqueCache.objects.values_list('cle', flat=True)), ['cours:0:'])
+
+    def test_ecriture_pendant_le_calcul(self):
+        def calcul():
+            # Présence modifiée (commitée) pendant le calcul : le résultat est peut-être périmé
+            Presence.objects.filter(etudiant=self.etudiants[0]).update(statut='A')
+            return {'presents': 3}
+
+        cle = cle_cache('etudiant', self.etudiants[0].id)
+        self.assertEqual(lire_ou_calculer('etudiant', self.etudiants[0].id, calcul), {'presents': 3})
+        self.assertFalse(StatistiqueCache.objects.filter(cle=cle).exists())
+
+        self.assertEqual(lire_ou_calculer('etudiant', self.etudiants[0].id, lambda: {'presents': 2}),
+                         {'presents': 2})
+        self.assertEqual(lire_ou_calculer('etudiant', self.etudiants[0].id, calcul), {'presents': 2})
+
+    def test_purge_des_entrees_expirees(self):
+        maintenant = timezone.now()
+        for i in range(3):
+            StatistiqueCache.objects.create(cle=f'globales::{i}', valeur={},
+                                            date_expiration=maintenant - timedelta(minutes=1))
+        StatistiqueCache.objects.create(cle='globales::ok', valeur={},
+                                        date_expiration=maintenant + timedelta(minutes=5))
+        with self.assertNumQueries(1):
+            self.assertEqual(purger_cache_expire(), 3)
+        self.assertEqual(StatistiqueCache.objects.count(), 1)
+
+
+class StatistiquesGlobalesTests(TestCase):
+    """Tableau de bord global : un nombre constant de requêtes GROUP BY"""
+
+    def _creer_filiere(self, niveau, statuts):
+        seance, etudiants = creer_filiere_avec_etudiants(len(statuts), niveau=niveau)
+        for etudiant, statut in zip(etudiants, statuts):
+            Presence.objects.create(etudiant=etudiant, seance=seance, statut=statut)
+        return seance.cours.filiere, etudiants
+
+    def test_agregats_par_filiere(self):
+        gi3, etudiants = self._creer_filiere('N3', ['P', 'R', 'A', 'J'])
+        gi4, _ = self._creer_filiere('N4', ['A', 'A'])
+        etudiants[0].actif = False
+        etudiants[0].save()
+
+        with self.assertNumQueries(5):
+            donnees = _calculer_statistiques_globales()
+
+        self.assertEqual(donnees['total_presences'], 6)
+        self.assertEqual(donnees['taux_presence_global'], 50.0)
+        self.assertEqual(donnees['total_etudiants'], 5)
+        par_filiere = {s['filiere_id']: s for s in donnees['stats_filieres']}
+        # L'étudiant inactif n'est compté ni dans l'effectif ni dans le taux
+        self.assertEqual(par_filiere[gi3.id]['nb_etudiants'], 3)
+        self.assertEqual(par_filiere[gi3.id]['taux_presence'], 66.67)
+        self.assertEqual(par_filiere[gi4.id]['taux_presence'], 0)
+
+        self._creer_filiere('N5', ['P'])
+        with self.assertNumQueries(5):
+            self.assertEqual(len(_calculer_statistiques_globales()['stats_filieres']), 3)
+
+
+class StatistiquesParClasseTests(TestCase):
+    """Tableau par classe : une requête annotée, triable, exportable en CSV"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@test.cm', 'pass')
+        self.client.force_login(self.user)
+        seance, self.etudiants = creer_filiere_avec_etudiants(4)
+        for etudiant, statut in zip(self.etudiants, ['P', 'A', 'R', 'A']):
+            Presence.objects.create(etudiant=etudiant, seance=seance, statut=statut)
+        self.filiere = seance.cours.filiere
+
+    def test_tri_par_absences_et_taux(self):
+        url = reverse('statistiques_par_classe')
+        response = self.client.get(url, {'filiere': self.filiere.id, 'tri': '-absences'})
+        stats = response.context['stats']
+        self.assertEqual([s['absents'] for s in stats], [1, 1, 0, 0])
+        self.assertEqual([s['etudiant'] for s in stats[:2]], [self.etudiants[1], self.etudiants[3]])
+
+        response = self.client.get(url, {'filiere': self.filiere.id, 'tri': '-taux'})
+        self.assertEqual([s['taux_presence'] for s in response.context['stats']], [100.0, 100.0, 0.0, 0.0])
+
+    def test_nombre_de_requetes_constant(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(len(_calculer_statistiques_classe(self.filiere.id, 'nom')), 4)
+
+    def test_export_csv(self):
+        response = self.client.get(reverse('exporter_statistiques_classe'),
+                                   {'filiere': self.filiere.id, 'tri': 'taux'})
+        lignes = response.content.decode('utf-8-sig').splitlines()
+        self.assertEqual(len(lignes), 5)
+        self.assertTrue(lignes[1].startswith(self.etudiants[1].matricule))
+        self.assertTrue(lignes[1].endswith(';1;0;0.0'))
+
+
+class StatistiquesParCoursTests(TestCase):
+    """Série des séances d'un cours : une requête annotée, moyennes calculées en SQL"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@test.cm', 'pass')
+        self.client.force_login(self.user)
+        self.seance, self.etudiants = creer_filiere_avec_etudiants(4)
+        self.cours = self.seance.cours
+        # Séance 1 (06/01) : 4 étudiants, 1 présent ; séance 2 (13/01) : 2 étudiants, 2 présents
+        self._remplir(self.seance, ['P', 'A', 'A', 'A'])
+        seance = SeanceCours.objects.create(cours=self.cours, date=date(2025, 1, 13),
+                                            heure_debut=self.seance.heure_debut,
+                                            heure_fin=self.seance.heure_fin)
+        self._remplir(seance, ['P', 'J'])
+
+    def _remplir(self, seance, statuts):
+        for etudiant, statut in zip(self.etudiants, statuts):
+            Presence.objects.create(etudiant=etudiant, seance=seance, statut=statut)
+        SeanceCours.objects.filter(pk=seance.pk).update(presente=True)
+
+    def test_moyennes_simple_et_ponderee(self):
+        with self.assertNumQueries(2):
+            donnees = _calculer_statistiques_cours(self.cours, None, None, 1)
+        self.assertEqual(donnees['total_seances'], 2)
+        self.assertEqual(donnees['taux_moyen'], 62.5)
+        self.assertEqual(donnees['taux_pondere'], 50.0)
+        self.assertEqual([(s['total'], s['presents'], s['taux']) for s in donnees['stats_seances']],
+                         [(2, 2, 100.0), (4, 1, 25.0)])
+
+    def test_filtre_par_dates(self):
+        url = reverse('statistiques_par_cours', args=[self.cours.code])
+        response = self.client.get(url, {'date_fin': '2025-01-10', 'date_debut': 'invalide'})
+        self.assertEqual(response.context['total_seances'], 1)
+        self.assertEqual(response.context['stats_seances'][0]['seance'], self.seance)
+        self.assertEqual(response.context['taux_pondere'], 25.0)
+
+    def test_pagination(self):
+        SeanceCours.objects.bulk_create([
+            SeanceCours(cours=self.cours, date=date(2024, 1, 1) + timedelta(days=i), presente=True,
+                        heure_debut=self.seance.heure_debut, heure_fin=self.seance.heure_fin)
+            for i in range(SEANCES_PAR_PAGE)
+        ])
+        url = reverse('statistiques_par_cours', args=[self.cours.code])
+        response = self.client.get(url, {'page': 99})
+        self.assertEqual(response.context['page_obj'].number, 2)
+        self.assertEqual(len(response.context['stats_seances']), 2)
+
+
+class StatistiquesParEtudiantTests(TestCase):
+    """Fiche étudiant : répartition par cours en une requête avec jointure externe"""
+
+    def setUp(self):
+        self.seance, etudiants = creer_filiere_avec_etudiants(1)
+        self.etudiant = etudiants[0]
+        self.cours = self.seance.cours
+        self.cours_vide = Cours.objects.create(
+            code='C-VIDE', intitule="Sans séance", filiere=self.cours.filiere,
+            semestre=1, annee_academique='2024-2025',
+        )
+        autre = SeanceCours.objects.create(cours=self.cours, date=date.today(),
+                                           heure_debut=self.seance.heure_debut,
+                                           heure_fin=self.seance.heure_fin)
+        Presence.objects.create(etudiant=self.etudiant, seance=self.seance, statut='J')
+        Presence.objects.create(etudiant=self.etudiant, seance=autre, statut='R')
+
+    def test_repartition_par_cours(self):
+        with self.assertNumQueries(1):
+            donnees = _calculer_statistiques_etudiant(self.etudiant, date.today() - timedelta(days=30))
+
+        par_cours = {s['cours_id']: s for s in donnees['stats_par_cours']}
+        self.assertEqual(par_cours[self.cours.id], {'cours_id': self.cours.id, 'total': 2,
+                                                    'presents': 2, 'taux': 100.0})
+        self.assertEqual(par_cours[self.cours_vide.id]['total'], 0)
+        self.assertEqual((donnees['total_seances'], donnees['retards'], donnees['justifies']), (2, 1, 1))
+        self.assertEqual(donnees['taux_presence'], self.etudiant.get_taux_presence())
+        self.assertEqual([p['statut'] for p in donnees['presences_recentes']], ['R'])
+
+
+class GenerationRapportsTests(TestCase):
+    """Rapports produits en arrière-plan : fichier réel, taille et nombre de pages"""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        reglages = override_settings(MEDIA_ROOT=self.media)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+
+        self.user = User.objects.create_superuser('admin', 'admin@test.cm', 'pass')
+        self.client.force_login(self.user)
+        seance, self.etudiants = creer_filiere_avec_etudiants(120)
+        Presence.objects.bulk_create([
+            Presence(etudiant=e, seance=seance, date_seance=seance.date, statut='A' if i % 3 == 0 else 'P')
+            for i, e in enumerate(self.etudiants)
+        ])
+        self.filiere = seance.cours.filiere
+
+    def _demander(self, **donnees):
+        response = self.client.post(reverse('generer_rapport'), donnees)
+        self.assertRedirects(response, reverse('liste_rapports'))
+        return RapportPresence.objects.latest('id')
+
+    def test_generation_des_trois_formats(self):
+        rapports = [
+            self._demander(type_rapport='FILIERE', format_fichier=format_fichier, filiere=self.filiere.id)
+            for format_fichier in ('PDF', 'EXCEL', 'CSV')
+        ]
+        # La requête HTTP ne produit rien : le rapport attend le processus de travail
+        self.assertEqual({r.statut for r in rapports}, {'EN_ATTENTE'})
+        self.assertFalse(rapports[0].fichier)
+
+        self.assertEqual(traiter_rapports_en_attente(), 3)
+        pdf, excel, csv_ = [RapportPresence.objects.get(pk=r.pk) for r in rapports]
+        for rapport in (pdf, excel, csv_):
+            self.assertEqual(rapport.statut, 'TERMINE')
+            self.assertEqual(rapport.progression, 100)
+            self.assertEqual(rapport.taille_fichier, rapport.fichier.size)
+
+        with pdf.fichier.open('rb') as fichier:
+            contenu = fichier.read()
+        self.assertTrue(contenu.startswith(b'%PDF-1.4'))
+        self.assertGreater(pdf.nombre_pages, 1)
+        self.assertIn(b'/Count %d' % pdf.nombre_pages, contenu)
+
+        with csv_.fichier.open('rb') as fichier:
+            lignes = fichier.read().decode('utf-8-sig').splitlines()
+        self.assertEqual(len(lignes), 121)
+        self.assertEqual(lignes[1].split(';')[3:], ['1', '0', '1', '0', '0', '0.0'])
+
+    def test_rapport_invalide_et_suivi(self):
+        rapport = self._demander(type_rapport='ETUDIANT', format_fichier='PDF')
+        response = self.client.get(reverse('etat_rapports'), {'ids': f'{rapport.id},x'})
+        self.assertEqual(response.json()['rapports'][0]['statut'], 'EN_ATTENTE')
+
+        traiter_rapports_en_attente()
+        rapport.refresh_from_db()
+        self.assertEqual(rapport.statut, 'ECHEC')
+        self.assertIn('sans etudiant', rapport.message_erreur)
+        self.assertEqual(traiter_rapports_en_attente(), 0)
+
+    def test_alerte_sans_processus_de_travail(self):
+        rapport = self._demander(type_rapport='GLOBAL', format_fichier='CSV')
+        self.assertFalse(self.client.get(reverse('liste_rapports')).context['processus_absent'])
+
+        # En file depuis plus de DELAI_ATTENTE, rien en cours : le processus n'est pas lancé
+        RapportPresence.objects.filter(pk=rapport.pk).update(
+            date_generation=timezone.now() - DELAI_ATTENTE - timedelta(minutes=1))
+        response = self.client.get(reverse('liste_rapports'))
+        self.assertContains(response, 'generer_rapports --boucle')
+
+        # Un processus vivant traite un autre rapport : pas d'alerte
+        autre = self._demander(type_rapport='FILIERE', format_fichier='CSV', filiere=self.filiere.id)
+        RapportPresence.objects.filter(pk=autre.pk).update(statut='EN_COURS', battement=timezone.now())
+        self.assertFalse(self.client.get(reverse('liste_rapports')).context['processus_absent'])
+
+    def test_rapport_abandonne_remis_en_file_puis_en_echec(self):
+        rapport = self._demander(type_rapport='GLOBAL', format_fichier='CSV')
+        self.assertEqual(reserver_rapport(), rapport)
+
+        # Processus tué en pleine génération : plus aucun signe de vie
+        abandon = timezone.now() - DELAI_ABANDON - timedelta(minutes=1)
+        RapportPresence.objects.filter(pk=rapport.pk).update(battement=abandon)
+        self.assertEqual(reserver_rapport(), rapport)
+        rapport.refresh_from_db()
+        self.assertEqual((rapport.statut, rapport.tentatives), ('EN_COURS', 2))
+
+        # Abandonné une seconde fois : échec, la file est vide
+        RapportPresence.objects.filter(pk=rapport.pk).update(battement=abandon)
+        self.assertIsNone(reserver_rapport())
+        rapport.refresh_from_db()
+        self.assertEqual(rapport.statut, 'ECHEC')
+        self.assertIn('interrompue', rapport.message_erreur)
+
+    def test_deduplication_tant_que_les_donnees_ne_changent_pas(self):
+        demande = {'type_rapport': 'FILIERE', 'format_fichier': 'CSV', 'filiere': self.filiere.id,
+                   'date_debut': '2025-01-01'}
+        premier = self._demander(**demande)
+        self._demander(**demande)  # encore en file : réutilisé
+        self.assertEqual(RapportPresence.objects.count(), 1)
+
+        traiter_rapports_en_attente()
+        premier.refresh_from_db()
+        self.assertEqual(premier.version_donnees, version_filiere(self.filiere.id))
+        self._demander(**demande)
+        self._demander(**{**demande, 'format_fichier': 'PDF'})  # autre format : nouveau rapport
+        self.assertEqual(RapportPresence.objects.count(), 2)
+
+        Presence.objects.filter(etudiant=self.etudiants[0]).update(statut='P')
+        self.assertNotEqual(premier.version_donnees, version_filiere(self.filiere.id))
+        self.assertNotEqual(self._demander(**demande).pk, premier.pk)
+        self.assertEqual(RapportPresence.objects.count(), 3)
+
+    def test_rapport_abandonne_jamais_reutilise(self):
+        demande = {'type_rapport': 'GLOBAL', 'format_fichier': 'CSV'}
+        bloque = self._demander(**demande)
+        reserver_rapport()
+        self.assertEqual(self._demander(**demande).pk, bloque.pk)  # en cours, vivant : réutilisé
+
+        abandon = timezone.now() - DELAI_ABANDON - timedelta(minutes=1)
+        RapportPresence.objects.filter(pk=bloque.pk).update(battement=abandon)
+        self.assertNotEqual(self._demander(**demande).pk, bloque.pk)
+
+        # Vieille demande jamais prise en charge : pas réutilisée non plus
+        RapportPresence.objects.filter(statut='EN_ATTENTE').update(date_generation=abandon)
+        self.assertEqual(RapportPresence.objects.count(), 2)
+        self._demander(**demande)
+        self.assertEqual(RapportPresence.objects.count(), 3)
+
+    def test_bulletins_par_etudiant_en_archive_zip(self):
+        rapport = self._demander(type_rapport='BULLETINS', format_fichier='PDF', filiere=self.filiere.id)
+        self.assertEqual(rapport.format_fichier, 'ZIP')
+
+        self.assertEqual(traiter_rapports_en_attente(processus=2), 1)
+        rapport.refresh_from_db()
+        self.assertEqual(rapport.statut, 'TERMINE')
+        self.assertTrue(rapport.fichier.name.endswith('.zip'))
+        with rapport.fichier.open('rb') as fichier, zipfile.ZipFile(fichier) as archive:
+            noms = archive.namelist()
+            bulletin = archive.read(f"{self.filiere.code}/{self.etudiants[0].matricule}.pdf")
+        self.assertEqual(len(noms), 120)
+        self.assertEqual(rapport.nombre_pages, 120)
+        self.assertTrue(bulletin.startswith(b'%PDF-1.4'))
+        self.assertIn(b'(C-%s)' % self.filiere.code.encode(), bulletin)
+
+    def test_bulletins_sans_pool_en_requetes_constantes(self):
+        # Tout l'établissement, rendu dans le processus courant
+        rapport = self._demander(type_rapport='BULLETINS')
+        rapport.refresh_from_db()
+        with tempfile.TemporaryFile() as sortie:
+            with CaptureQueriesContext(connection) as requetes:
+                pages = ecrire_bulletins(sortie, rapport, processus=1)
+            sortie.seek(0)
+            with zipfile.ZipFile(sortie) as archive:
+                self.assertEqual(len(archive.namelist()), 120)
+        self.assertEqual(pages, 120)
+        # comptage, étudiants, agrégats (étudiant, cours)
+        self.assertEqual(len(requetes), 3)
+
+
+class VersionDonneesTests(TestCase):
+    """Filigrane par filière tenu par les triggers"""
+
+    def test_increments(self):
+        seance, (etudiant,) = creer_filiere_avec_etudiants(1)
+        filiere_id = seance.cours.filiere_id
+        depart = version_filiere(filiere_id)
+
+        presence = Presence.objects.create(etudiant=etudiant, seance=seance, statut='P')
+        self.assertEqual(version_filiere(filiere_id), depart + 1)
+
+        presence.remarque = "Sans effet sur les rapports"
+        presence.save()
+        etudiant.email = 'autre@test.cm'
+        etudiant.save()
+        self.assertEqual(version_filiere(filiere_id), depart + 1)
+
+        etudiant.nom = 'Renommé'
+        etudiant.save()
+        apres_renommage = version_filiere(filiere_id)
+        self.assertGreater(apres_renommage, depart + 1)
+        Presence.objects.filter(pk=presence.pk).delete()
+        self.assertEqual(version_filiere(filiere_id), apres_renommage + 1)
+
+        globale = version_globale()
+        creer_filiere_avec_etudiants(1, niveau='N4')
+        self.assertGreater(version_globale(), globale)
+
+
+def heure_locale(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+class PlanificationRapportsTests(TestCase):
+    """Rapports récurrents : occurrences cron, rattrapage, plafond et séances en cours"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@test.cm', 'pass')
+        seance, _ = creer_filiere_avec_etudiants(3)
+        self.filiere = seance.cours.filiere
+
+    def _planifier(self, echeance, **champs):
+        valeurs = {'nom': 'Hebdomadaire', 'type_rapport': 'FILIERE', 'format_fichier': 'CSV',
+                   'filiere': self.filiere, 'expression_cron': '0 5 * * 1', 'periode_jours': 7,
+                   'cree_par': self.user, 'prochaine_execution': echeance}
+        valeurs.update(champs)
+        return PlanificationRapport.objects.create(**valeurs)
+
+    def test_filtre_requis_par_le_type(self):
+        planification = PlanificationRapport(nom='Sans filière', type_rapport='FILIERE', format_fichier='CSV',
+                                             expression_cron='0 5 * * 1')
+        with self.assertRaises(ValidationError) as erreur:
+            planification.full_clean()
+        self.assertIn('filiere', erreur.exception.message_dict)
+
+        planification.filiere = self.filiere
+        planification.full_clean()
+        # Global et bulletins : sans filtre
+        PlanificationRapport(nom='Global', type_rapport='GLOBAL', format_fichier='CSV',
+                             expression_cron='0 5 * * 1').full_clean()
+
+    def test_prochaine_occurrence(self):
+        dimanche = heure_locale(2025, 1, 5, 10, 7)
+        self.assertEqual(prochaine_occurrence('0 5 * * 1', dimanche), heure_locale(2025, 1, 6, 5, 0))
+        self.assertEqual(prochaine_occurrence('*/15 * * * *', dimanche), heure_locale(2025, 1, 5, 10, 15))
+        self.assertEqual(prochaine_occurrence('30 22 1-3 * *', dimanche), heure_locale(2025, 2, 1, 22, 30))
+        # Jour du mois et jour de la semaine restreints : l'un ou l'autre
+        self.assertEqual(prochaine_occurrence('0 6 15 * 1,7', dimanche), heure_locale(2025, 1, 6, 6, 0))
+        for invalide in ('0 5 * *', '60 * * * *', 'a * * * *', '0 0 31 2 *'):
+            with self.assertRaises(ExpressionCronInvalide):
+                prochaine_occurrence(invalide, dimanche)
+
+    def test_mise_en_file_et_reservation(self):
+        lundi = heure_locale(2025, 1, 13, 5, 0)
+        planification = self._planifier(lundi)
+
+        self.assertEqual(planifier_rapports(lundi + timedelta(minutes=1)), 1)
+        rapport = RapportPresence.objects.get()
+        self.assertEqual((rapport.planification, rapport.filiere, rapport.genere_par),
+                         (planification, self.filiere, self.user))
+        self.assertEqual((rapport.date_debut, rapport.date_fin), (date(2025, 1, 6), date(2025, 1, 12)))
+        planification.refresh_from_db()
+        self.assertEqual(planification.prochaine_execution, heure_locale(2025, 1, 20, 5, 0))
+
+        # Déjà avancée : rien de plus au passage suivant
+        self.assertEqual(planifier_rapports(lundi + timedelta(minutes=2)), 0)
+
+    def test_rattrapage_des_executions_manquees(self):
+        maintenant = heure_locale(2025, 2, 3, 9, 0)
+        avec = self._planifier(heure_locale(2025, 1, 13, 5, 0))
+        sans = self._planifier(heure_locale(2025, 1, 13, 5, 0), nom='Sans rattrapage', rattrapage=False,
+                               format_fichier='PDF')
+
+        # Trois lundis manqués : un seul rapport de rattrapage
+        self.assertEqual(planifier_rapports(maintenant), 1)
+        self.assertEqual(RapportPresence.objects.get().planification, avec)
+        for planification in (avec, sans):
+            planification.refresh_from_db()
+            self.assertEqual(planification.prochaine_execution, heure_locale(2025, 2, 10, 5, 0))
+
+    def test_plafond_et_priorite_des_demandes_manuelles(self):
+        echeance = heure_locale(2025, 1, 13, 5, 0)
+        for format_fichier in ('CSV', 'PDF', 'EXCEL'):
+            self._planifier(echeance, format_fichier=format_fichier)
+
+        self.assertEqual(planifier_rapports(echeance, maximum=2), 2)
+        self.assertEqual(PlanificationRapport.objects.filter(prochaine_execution=echeance).count(), 1)
+
+        # Rapport planifié bloqué EN_COURS par un processus tué : sa place est libérée
+        abandon = timezone.now() - DELAI_ABANDON - timedelta(minutes=1)
+        RapportPresence.objects.filter(planification__format_fichier='PDF').update(
+            statut='EN_COURS', battement=abandon)
+        self.assertEqual(planifier_rapports(echeance, maximum=2), 1)
+        RapportPresence.objects.filter(planification__format_fichier='PDF').update(statut='TERMINE')
+        PlanificationRapport.objects.update(prochaine_execution=echeance)
+
+        manuel = RapportPresence.objects.create(titre='Manuel', type_rapport='GLOBAL', genere_par=self.user)
+        self.assertEqual(reserver_rapport(), manuel)
+        RapportPresence.objects.filter(planification__format_fichier='CSV').update(statut='TERMINE')
+        self.assertEqual(planifier_rapports(echeance + timedelta(minutes=1), maximum=2), 1)
+
+    def test_expression_invalide_desactivee_sans_bloquer_les_autres(self):
+        echeance = heure_locale(2025, 1, 13, 5, 0)
+        invalide = self._planifier(echeance, nom='Invalide', format_fichier='PDF')
+        PlanificationRapport.objects.filter(pk=invalide.pk).update(expression_cron='0 5 * *')
+        self._planifier(echeance)
+
+        with self.assertLogs('statisticss.planification', 'ERROR'):
+            self.assertEqual(planifier_rapports(echeance), 1)
+        invalide.refresh_from_db()
+        self.assertFalse(invalide.actif)
+
+    def test_aucune_mise_en_file_pendant_une_seance(self):
+        # Séance de test : lundi 6 janvier 2025, 8h-10h
+        self._planifier(heure_locale(2025, 1, 6, 5, 0))
+        self.assertEqual(planifier_rapports(heure_locale(2025, 1, 6, 9, 0)), 0)
+        self.assertEqual(planifier_rapports(heure_locale(2025, 1, 6, 10, 0)), 1)
+
+    def test_seance_annulee_ne_bloque_pas(self):
+        SeanceCours.objects.update(annulee=True)
+        self._planifier(heure_locale(2025, 1, 6, 5, 0))
+        self.assertEqual(planifier_rapports(heure_locale(2025, 1, 6, 9, 0)), 1)
@@ -0,0 +1,34 @@
+# ============================================
+# statisticss/versions.py
+# Filigrane de version des données de présence, par filière
+# ============================================
+#
+# VersionDonnees tient un compteur par filière, incrémenté par des triggers
+# (SQL figé dans la migration statisticss 0004) à chaque écriture qui peut
+# changer le contenu d'un rapport : présences, séances (date, cours, état),
+# étudiants (identité, filière, activité), cours (code, intitulé, filière) et
+# code de filière. Un rapport enregistre la version lue au moment du calcul ;
+# tant qu'elle n'a pas bougé, son fichier reste exact et peut être resservi
+# (cf. rapports.rapport_identique).
+
+from django.db.models import Sum
+
+
+# ============================================
+# LECTURE
+# ============================================
+
+def version_filiere(filiere_id):
+    from .models import VersionDonnees
+
+    if filiere_id is None:
+        return 0
+    return VersionDonnees.objects.filter(filiere_id=filiere_id).values_list(
+        'version', flat=True).first() or 0
+
+
+def version_globale():
+    """Somme des versions : change dès qu'une filière change (les compteurs ne font que croître)"""
+    from .models import VersionDonnees
+
+    return VersionDonnees.objects.aggregate(total=Sum('version'))['total'] or 0
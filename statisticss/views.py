@@ -1,60 +1,247 @@
+import csv
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Count, Q, Avg
-from django.http import HttpResponse
-from datetime import datetime, timedelta
+from django.core.paginator import Paginator
+from django.db.models import Avg, Count, DateField, F, FilteredRelation, FloatField, Q, Sum, Value
+from django.db.models.functions import Coalesce, NullIf, Round
+from django.http import HttpResponse, JsonResponse
+from django.utils.dateparse import parse_date
+from datetime import date, datetime, timedelta
 from students.models import Etudiant, Filiere  # ✅ Suppression de Niveau
 from courses.models import Cours, SeanceCours
-from attendance.models import Presence
+from attendance.compteurs import CHAMPS_COMPTEURS
+from attendance.models import CompteurPresence, Presence
+from .cache import lire_ou_calculer
 from .models import RapportPresence
+from .rapports import empreinte_parametres, file_sans_processus, rapport_identique
 
 
-@login_required
-def statistiques_globales(request):
-    """Statistiques globales de présence"""
+# ============================================
+# CALCULS (valeurs JSON mises en cache, cf. cache.py)
+# ============================================
+
+def _taux(presents, total):
+    return round(presents / total * 100, 2) if total else 0
+
+
+def _calculer_statistiques_globales():
+    # Les sommes portent sur les compteurs par étudiant et par cours
+    # (CompteurPresence) : une ligne par couple au lieu d'une par présence.
+    presents = F('presents') + F('retards') + F('justifies')
+    totaux = CompteurPresence.objects.aggregate(
+        total=Coalesce(Sum('total'), 0),
+        presents=Coalesce(Sum(presents), 0),
+    )
     
-    # Statistiques générales
-    total_etudiants = Etudiant.objects.filter(actif=True).count()
-    total_cours = Cours.objects.filter(actif=True).count()
-    total_seances = SeanceCours.objects.filter(presente=True).count()
-    total_presences = Presence.objects.count()
+    # Statistiques par filière (regroupées par spécialité + formation + niveau),
+    # en une seule requête GROUP BY. Seuls les étudiants actifs sont comptés.
+    actifs = Q(etudiants__actif=True)
+    compteurs = 'etudiants__compteurs_presence__'
+    filieres = Filiere.objects.filter(actif=True).annotate(
+        nb_etudiants=Count('etudiants', filter=actifs, distinct=True),
+        total=Coalesce(Sum(f'{compteurs}total', filter=actifs), 0),
+        presents=Coalesce(Sum(
+            F(f'{compteurs}presents') + F(f'{compteurs}retards') + F(f'{compteurs}justifies'),
+            filter=actifs,
+        ), 0),
+    ).values('id', 'nb_etudiants', 'total', 'presents')
     
-    # Taux de présence global
-    if total_presences > 0:
-        presents = Presence.objects.filter(statut__in=['P', 'R', 'J']).count()
-        taux_presence_global = round((presents / total_presences) * 100, 2)
-    else:
-        taux_presence_global = 0
+    stats_filieres = [
+        {
+            'filiere_id': ligne['id'],
+            'nb_etudiants': ligne['nb_etudiants'],
+            'taux_presence': _taux(ligne['presents'], ligne['total']),
+        }
+        for ligne in filieres
+    ]
     
-    # Statistiques par filière (regroupées par spécialité + formation + niveau)
-    stats_filieres = []
-    for filiere in Filiere.objects.filter(actif=True):
-        etudiants_filiere = Etudiant.objects.filter(filiere=filiere, actif=True)
-        presences_filiere = Presence.objects.filter(etudiant__in=etudiants_filiere)
-        
-        total = presences_filiere.count()
-        if total > 0:
-            presents = presences_filiere.filter(statut__in=['P', 'R', 'J']).count()
-            taux = round((presents / total) * 100, 2)
-        else:
-            taux = 0
-        
-        stats_filieres.append({
-            'filiere': filiere,
-            'nb_etudiants': etudiants_filiere.count(),
-            'taux_presence': taux,
+    return {
+        'total_etudiants': Etudiant.objects.filter(actif=True).count(),
+        'total_cours': Cours.objects.filter(actif=True).count(),
+        'total_seances': SeanceCours.objects.filter(presente=True).count(),
+        'total_presences': totaux['total'],
+        'taux_presence_global': _taux(totaux['presents'], totaux['total']),
+        'stats_filieres': stats_filieres,
+    }
+
+
+# Tris proposés sur le tableau par classe (paramètre GET 'tri')
+TRIS_CLASSE = {
+    'nom': ('nom', 'prenom'),
+    'taux': ('taux_presence', 'nom', 'prenom'),
+    '-taux': ('-taux_presence', 'nom', 'prenom'),
+    'absences': ('absents', 'nom', 'prenom'),
+    '-absences': ('-absents', 'nom', 'prenom'),
+}
+CHAMPS_CLASSE = ['total_seances', 'presents', 'absents', 'retards', 'taux_presence']
+
+
+def _statistiques_classe(filiere_id, tri='nom'):
+    """Étudiants actifs de la filière annotés de leurs totaux (une seule requête GROUP BY)"""
+    compteurs = 'compteurs_presence__'
+    total = Sum(f'{compteurs}total')
+    presents = Sum(F(f'{compteurs}presents') + F(f'{compteurs}retards') + F(f'{compteurs}justifies'))
+    return Etudiant.objects.filter(filiere_id=filiere_id, actif=True).annotate(
+        total_seances=Coalesce(total, 0),
+        presents=Coalesce(presents, 0),
+        absents=Coalesce(Sum(f'{compteurs}absents'), 0),
+        retards=Coalesce(Sum(f'{compteurs}retards'), 0),
+        taux_presence=Coalesce(
+            Round(presents * 100.0 / NullIf(total, 0), 2), 0.0, output_field=FloatField(),
+        ),
+    ).order_by(*TRIS_CLASSE.get(tri, TRIS_CLASSE['nom']))
+
+
+def _calculer_statistiques_classe(filiere_id, tri):
+    return [
+        {'etudiant_id': ligne.pop('id'), **ligne}
+        for ligne in _statistiques_classe(filiere_id, tri).values('id', *CHAMPS_CLASSE)
+    ]
+
+
+def _calculer_statistiques_etudiant(etudiant, date_debut):
+    # Une seule requête (UNION ALL sur des colonnes communes) :
+    # - une ligne par cours : les cours actifs de la filière, plus tout cours
+    #   où l'étudiant a des présences, en jointure externe sur son compteur
+    #   (CompteurPresence, déjà regroupé par étudiant et par cours) : un cours
+    #   sans séance ressort avec des zéros ;
+    # - puis une ligne par présence depuis date_debut (évolution récente).
+    colonnes = ['recente', 'cours_ref', 'code_cours', *CHAMPS_COMPTEURS, 'date_ligne', 'statut_ligne']
+    par_cours = Cours.objects.annotate(
+        compteur=FilteredRelation('compteurs_presence',
+                                  condition=Q(compteurs_presence__etudiant=etudiant)),
+    ).filter(
+        Q(filiere_id=etudiant.filiere_id, actif=True) | Q(compteur__isnull=False)
+    ).annotate(
+        recente=Value(False),
+        cours_ref=F('id'),
+        code_cours=F('code'),
+        **{champ: Coalesce(f'compteur__{champ}', 0) for champ in CHAMPS_COMPTEURS},
+        date_ligne=Value(None, output_field=DateField()),
+        statut_ligne=Value(''),
+    ).order_by().values_list(*colonnes)
+    recentes = Presence.objects.filter(
+        etudiant=etudiant, date_seance__gte=date_debut
+    ).annotate(
+        recente=Value(True),
+        cours_ref=F('seance__cours_id'),
+        code_cours=F('seance__cours__code'),
+        **{champ: Value(0) for champ in CHAMPS_COMPTEURS},
+        date_ligne=F('date_seance'),
+        statut_ligne=F('statut'),
+    ).order_by().values_list(*colonnes)
+    
+    stats_par_cours = []
+    presences_recentes = []
+    totaux = dict.fromkeys(CHAMPS_COMPTEURS, 0)
+    for recente, cours_id, code, *valeurs, date_seance, statut in par_cours.union(
+            recentes, all=True).order_by('recente', 'date_ligne', 'code_cours'):
+        if recente:
+            presences_recentes.append({'date': date_seance.isoformat(), 'cours': code, 'statut': statut})
+            continue
+        compteur = dict(zip(CHAMPS_COMPTEURS, valeurs))
+        for champ, valeur in compteur.items():
+            totaux[champ] += valeur
+        presents = compteur['presents'] + compteur['retards'] + compteur['justifies']
+        stats_par_cours.append({
+            'cours_id': cours_id,
+            'total': compteur['total'],
+            'presents': presents,
+            'taux': _taux(presents, compteur['total']),
         })
     
-    # ❌ SUPPRIMÉ : stats_niveaux (maintenant intégré dans stats_filieres)
+    return {
+        'total_seances': totaux['total'],
+        'presents': totaux['presents'] + totaux['retards'] + totaux['justifies'],
+        'absents': totaux['absents'],
+        'retards': totaux['retards'],
+        'justifies': totaux['justifies'],
+        # Même définition que Etudiant.get_taux_presence() (présents + retards)
+        'taux_presence': _taux(totaux['presents'] + totaux['retards'], totaux['total']),
+        'stats_par_cours': stats_par_cours,
+        'presences_recentes': presences_recentes,
+    }
+
+
+SEANCES_PAR_PAGE = 50
+
+
+def _seances_cours(cours, date_debut=None, date_fin=None):
+    """
+    Séances effectuées du cours annotées de leurs totaux. Les nombres viennent
+    du récapitulatif porté par la séance (nombre_*) : aucune jointure.
+    """
+    presents = F('nombre_presents') + F('nombre_retards') + F('nombre_justifies')
+    total = presents + F('nombre_absents')
+    seances = SeanceCours.objects.filter(cours=cours, presente=True)
+    if date_debut:
+        seances = seances.filter(date__gte=date_debut)
+    if date_fin:
+        seances = seances.filter(date__lte=date_fin)
+    return seances.annotate(
+        total=total,
+        presents=presents,
+        taux=Coalesce(Round(presents * 100.0 / NullIf(total, 0), 2), 0.0, output_field=FloatField()),
+    ).order_by('-date', '-heure_debut')
+
+
+def _calculer_statistiques_cours(cours, date_debut, date_fin, page):
+    seances = _seances_cours(cours, date_debut, date_fin)
+    
+    # Taux moyen : simple (moyenne des taux des séances) et pondéré par l'effectif
+    resume = seances.aggregate(
+        total_seances=Count('id'),
+        taux_moyen=Coalesce(Round(Avg('taux'), 2), 0.0, output_field=FloatField()),
+        taux_pondere=Coalesce(
+            Round(Sum('presents') * 100.0 / NullIf(Sum('total'), 0), 2), 0.0, output_field=FloatField(),
+        ),
+    )
     
+    nb_pages = max(1, -(-resume['total_seances'] // SEANCES_PAR_PAGE))
+    page = min(max(page, 1), nb_pages)
+    debut = (page - 1) * SEANCES_PAR_PAGE
+    stats_seances = [
+        {'seance_id': ligne.pop('id'), **ligne}
+        for ligne in seances[debut:debut + SEANCES_PAR_PAGE].values('id', 'total', 'presents', 'taux')
+    ]
+    
+    return {**resume, 'page': page, 'stats_seances': stats_seances}
+
+
+def _lire_date(valeur):
+    """Date AAAA-MM-JJ d'un paramètre GET, None si absente ou invalide"""
+    try:
+        return parse_date(valeur or '')
+    except ValueError:
+        return None
+
+
+def _hydrater(lignes, champ_id, cle, objets):
+    """Remplace l'id 'champ_id' de chaque ligne par l'objet correspondant (clé 'cle')"""
+    resultat = []
+    for ligne in lignes:
+        ligne = dict(ligne)
+        objet = objets.get(ligne.pop(champ_id))
+        if objet is not None:
+            resultat.append({cle: objet, **ligne})
+    return resultat
+
+
+# ============================================
+# VUES
+# ============================================
+
+@login_required
+def statistiques_globales(request):
+    """Statistiques globales de présence"""
+    donnees = lire_ou_calculer('globales', None, _calculer_statistiques_globales)
+    
+    filieres = Filiere.objects.in_bulk([s['filiere_id'] for s in donnees['stats_filieres']])
     context = {
-        'total_etudiants': total_etudiants,
-        'total_cours': total_cours,
-        'total_seances': total_seances,
-        'total_presences': total_presences,
-        'taux_presence_global': taux_presence_global,
-        'stats_filieres': stats_filieres,
+        **donnees,
+        'stats_filieres': _hydrater(donnees['stats_filieres'], 'filiere_id', 'filiere', filieres),
     }
     
     return render(request, 'statisticss/statistiques_globales.html', context)
@@ -65,101 +252,75 @@ def statistiques_par_classe(request):
     """Statistiques de présence par classe (filière complète)"""
     
     filiere_id = request.GET.get('filiere')
+    tri = request.GET.get('tri', 'nom')
+    if tri not in TRIS_CLASSE:
+        tri = 'nom'
     
     stats = []
     
-    if filiere_id:
-        # Filtrer par filière spécifique
-        etudiants = Etudiant.objects.filter(
-            filiere_id=filiere_id,
-            actif=True
-        )
-        
-        for etudiant in etudiants:
-            presences = Presence.objects.filter(etudiant=etudiant)
-            total = presences.count()
-            
-            if total > 0:
-                presents = presences.filter(statut__in=['P', 'R', 'J']).count()
-                absents = presences.filter(statut='A').count()
-                retards = presences.filter(statut='R').count()
-                taux = round((presents / total) * 100, 2)
-            else:
-                presents = absents = retards = 0
-                taux = 0
-            
-            stats.append({
-                'etudiant': etudiant,
-                'total_seances': total,
-                'presents': presents,
-                'absents': absents,
-                'retards': retards,
-                'taux_presence': taux,
-            })
+    if filiere_id and filiere_id.isdigit():
+        lignes = lire_ou_calculer('filiere', int(filiere_id),
+                                  lambda: _calculer_statistiques_classe(filiere_id, tri),
+                                  vue='classe', tri=tri)
+        etudiants = Etudiant.objects.in_bulk([s['etudiant_id'] for s in lignes])
+        stats = _hydrater(lignes, 'etudiant_id', 'etudiant', etudiants)
     
     context = {
         'stats': stats,
         'filieres': Filiere.objects.filter(actif=True),
         'filiere_selectionnee': filiere_id,
+        'tri': tri,
     }
     
     return render(request, 'statisticss/statistiques_par_classe.html', context)
 
 
 @login_required
-def statistiques_par_etudiant(request, matricule):
-    """Statistiques détaillées d'un étudiant"""
-    etudiant = get_object_or_404(Etudiant, matricule=matricule)
-    
-    # Toutes les présences de l'étudiant
-    presences = Presence.objects.filter(etudiant=etudiant).select_related('seance__cours')
+def exporter_statistiques_classe(request):
+    """Export CSV du tableau par classe (mêmes filtre et tri que la page)"""
+    filiere_id = request.GET.get('filiere', '')
+    if not filiere_id.isdigit():
+        messages.error(request, 'Veuillez choisir une filière.')
+        return redirect('statistiques_par_classe')
+    filiere = get_object_or_404(Filiere, id=filiere_id)
+    tri = request.GET.get('tri', 'nom')
     
-    total_seances = presences.count()
-    presents = presences.filter(statut__in=['P', 'R', 'J']).count()
-    absents = presences.filter(statut='A').count()
-    retards = presences.filter(statut='R').count()
-    justifies = presences.filter(statut='J').count()
-    
-    taux_presence = etudiant.get_taux_presence()
-    
-    # Statistiques par cours
-    stats_par_cours = []
-    cours_suivis = Cours.objects.filter(
-        filiere=etudiant.filiere,
-        actif=True
+    response = HttpResponse(content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="statistiques_{filiere.code}.csv"'
+    response.write('\ufeff')  # BOM : ouverture correcte des accents dans Excel
+    writer = csv.writer(response, delimiter=';')
+    writer.writerow(['Matricule', 'Nom', 'Prénom', 'Total séances', 'Présents',
+                     'Absents', 'Retards', 'Taux de présence (%)'])
+    writer.writerows(
+        _statistiques_classe(filiere.id, tri).values_list('matricule', 'nom', 'prenom', *CHAMPS_CLASSE)
     )
+    return response
+
+
+@login_required
+def statistiques_par_etudiant(request, matricule):
+    """Statistiques détaillées d'un étudiant"""
+    etudiant = get_object_or_404(Etudiant.objects.select_related('filiere'), matricule=matricule)
     
-    for cours in cours_suivis:
-        presences_cours = presences.filter(seance__cours=cours)
-        total = presences_cours.count()
-        
-        if total > 0:
-            presents_cours = presences_cours.filter(statut__in=['P', 'R', 'J']).count()
-            taux_cours = round((presents_cours / total) * 100, 2)
-        else:
-            presents_cours = 0
-            taux_cours = 0
-        
-        stats_par_cours.append({
-            'cours': cours,
-            'total': total,
-            'presents': presents_cours,
-            'taux': taux_cours,
-        })
-    
-    # Évolution sur les 30 derniers jours
+    # Évolution sur les 30 derniers jours (la date fait partie de la clé)
     date_debut = datetime.now().date() - timedelta(days=30)
-    presences_recentes = presences.filter(seance__date__gte=date_debut).order_by('seance__date')
+    donnees = lire_ou_calculer('etudiant', etudiant.id,
+                               lambda: _calculer_statistiques_etudiant(etudiant, date_debut),
+                               depuis=date_debut.isoformat())
+    
+    cours = Cours.objects.in_bulk([s['cours_id'] for s in donnees['stats_par_cours']])
+    presences_recentes = [
+        {
+            'seance': {'date': date.fromisoformat(p['date']), 'cours': {'code': p['cours']}},
+            'statut': p['statut'],
+        }
+        for p in donnees['presences_recentes']
+    ]
     
     context = {
+        **donnees,
         'etudiant': etudiant,
-        'total_seances': total_seances,
-        'presents': presents,
-        'absents': absents,
-        'retards': retards,
-        'justifies': justifies,
-        'taux_presence': taux_presence,
-        'stats_par_cours': stats_par_cours,
+        'stats_par_cours': _hydrater(donnees['stats_par_cours'], 'cours_id', 'cours', cours),
         'presences_recentes': presences_recentes,
     }
     
@@ -169,45 +330,30 @@ def statistiques_par_etudiant(request, matricule):
 @login_required
 def statistiques_par_cours(request, code_cours):
     """Statistiques de présence pour un cours"""
-    cours = get_object_or_404(Cours, code=code_cours)
+    cours = get_object_or_404(Cours.objects.select_related('enseignant', 'filiere'), code=code_cours)
     
-    # Toutes les séances du cours
-    seances = SeanceCours.objects.filter(cours=cours, presente=True).order_by('-date')
-    
-    # Statistiques globales du cours
-    total_seances = seances.count()
-    
-    stats_seances = []
-    for seance in seances:
-        presences = Presence.objects.filter(seance=seance)
-        total = presences.count()
-        
-        if total > 0:
-            presents = presences.filter(statut__in=['P', 'R', 'J']).count()
-            taux = round((presents / total) * 100, 2)
-        else:
-            presents = 0
-            taux = 0
-        
-        stats_seances.append({
-            'seance': seance,
-            'total': total,
-            'presents': presents,
-            'taux': taux,
-        })
+    date_debut = _lire_date(request.GET.get('date_debut'))
+    date_fin = _lire_date(request.GET.get('date_fin'))
+    page = request.GET.get('page', '1')
+    page = int(page) if page.isdigit() else 1
     
-    # Taux de présence moyen pour ce cours
-    if stats_seances:
-        taux_moyen = sum(s['taux'] for s in stats_seances) / len(stats_seances)
-        taux_moyen = round(taux_moyen, 2)
-    else:
-        taux_moyen = 0
+    donnees = lire_ou_calculer(
+        'cours', cours.id, lambda: _calculer_statistiques_cours(cours, date_debut, date_fin, page),
+        debut=date_debut, fin=date_fin, page=page,
+    )
     
+    seances = SeanceCours.objects.select_related('salle').in_bulk(
+        [s['seance_id'] for s in donnees['stats_seances']]
+    )
+    # Pagination reconstituée depuis le nombre en cache (range : aucune requête)
+    page_obj = Paginator(range(donnees['total_seances']), SEANCES_PAR_PAGE).get_page(donnees['page'])
     context = {
+        **donnees,
         'cours': cours,
-        'total_seances': total_seances,
-        'stats_seances': stats_seances,
-        'taux_moyen': taux_moyen,
+        'stats_seances': _hydrater(donnees['stats_seances'], 'seance_id', 'seance', seances),
+        'page_obj': page_obj,
+        'date_debut': date_debut,
+        'date_fin': date_fin,
     }
     
     return render(request, 'statisticss/statistiques_par_cours.html', context)
@@ -215,14 +361,15 @@ def statistiques_par_cours(request, code_cours):
 
 @login_required
 def generer_rapport(request):
-    """Générer un rapport de présence"""
+    """Demander un rapport de présence (le fichier est produit en arrière-plan)"""
     
     if request.method == 'POST':
         type_rapport = request.POST.get('type_rapport')
         format_fichier = request.POST.get('format_fichier', 'PDF')
         
-        # Créer le rapport (pour l'instant, juste l'enregistrer)
-        rapport = RapportPresence.objects.create(
+        # Le rapport n'est enregistré qu'une fois complet : le moteur de
+        # génération ne doit pas le réserver avant que ses filtres soient posés
+        rapport = RapportPresence(
             titre=f"Rapport {type_rapport} - {datetime.now().strftime('%d/%m/%Y %H:%M')}",
             type_rapport=type_rapport,
             format_fichier=format_fichier,
@@ -245,20 +392,30 @@ def generer_rapport(request):
             if filiere_id:
                 rapport.filiere = Filiere.objects.get(id=filiere_id)
         
+        elif type_rapport == 'BULLETINS':
+            # Un bulletin PDF par étudiant, regroupés dans une archive ZIP ;
+            # sans filière : tout l'établissement
+            rapport.format_fichier = 'ZIP'
+            filiere_id = request.POST.get('filiere')
+            if filiere_id:
+                rapport.filiere = Filiere.objects.get(id=filiere_id)
+        
         # ❌ SUPPRIMÉ : type_rapport == 'NIVEAU'
         
         # Dates
-        date_debut = request.POST.get('date_debut')
-        date_fin = request.POST.get('date_fin')
+        rapport.date_debut = _lire_date(request.POST.get('date_debut'))
+        rapport.date_fin = _lire_date(request.POST.get('date_fin'))
         
-        if date_debut:
-            rapport.date_debut = date_debut
-        if date_fin:
-            rapport.date_fin = date_fin
+        # Même demande, données inchangées : le fichier existant est réutilisé
+        rapport.empreinte = empreinte_parametres(rapport)
+        existant = rapport_identique(rapport)
+        if existant is not None:
+            messages.info(request, f'Un rapport identique et à jour existe déjà : « {existant.titre} ».')
+            return redirect('liste_rapports')
         
         rapport.save()
         
-        messages.success(request, 'Rapport généré avec succès.')
+        messages.success(request, 'Rapport mis en file de génération. Il sera disponible dans quelques instants.')
         return redirect('liste_rapports')
     
     context = {
@@ -275,10 +432,21 @@ def generer_rapport(request):
 @login_required
 def liste_rapports(request):
     """Liste des rapports générés"""
-    rapports = RapportPresence.objects.all().order_by('-date_generation')
+    rapports = RapportPresence.objects.select_related('genere_par').order_by('-date_generation')
     
     context = {
         'rapports': rapports,
+        # File en souffrance : le processus de génération n'est pas lancé
+        'processus_absent': file_sans_processus(),
     }
     
-    return render(request, 'statisticss/liste_rapports.html', context)
\ No newline at end of file
+    return render(request, 'statisticss/liste_rapports.html', context)
+
+
+@login_required
+def etat_rapports(request):
+    """API AJAX : avancement des rapports demandés (?ids=1,2,3)"""
+    ids = [i for i in request.GET.get('ids', '').split(',') if i.isdigit()]
+    rapports = RapportPresence.objects.filter(id__in=ids).values(
+        'id', 'statut', 'progression', 'message_erreur')
+    return JsonResponse({'success': True, 'rapports': list(rapports)})
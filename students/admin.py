@@ -1,4 +1,6 @@
 from django.contrib import admin
+from django.db.models import Count, F, FloatField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, NullIf, Round
 from import_export import resources
 from import_export.admin import ImportExportModelAdmin
 from .models import Filiere, HoraireSupplementaire, Etudiant
@@ -92,20 +94,35 @@ class FiliereAdmin(ImportExportModelAdmin):
         return obj.get_horaire()
     horaire_principal.short_description = "Horaire principal"
     
+    def get_queryset(self, request):
+        from courses.models import Cours
+        
+        # Une sous-requête par compteur : deux jointures dans un même GROUP BY
+        # multiplieraient les lignes (étudiants x cours) avant le DISTINCT
+        etudiants = Etudiant.objects.filter(filiere=OuterRef('pk'), actif=True).order_by().values(
+            'filiere').annotate(n=Count('id')).values('n')
+        cours = Cours.objects.filter(filiere=OuterRef('pk'), actif=True).order_by().values(
+            'filiere').annotate(n=Count('id')).values('n')
+        return super().get_queryset(request).annotate(
+            nb_etudiants_actifs=Coalesce(Subquery(etudiants), 0),
+            nb_cours_actifs=Coalesce(Subquery(cours), 0),
+        )
+    
     def nombre_etudiants(self, obj):
-        count = obj.etudiants.filter(actif=True).count()
-        return f'{count} étudiant(s)'
+        return f'{obj.nb_etudiants_actifs} étudiant(s)'
     nombre_etudiants.short_description = "Étudiants actifs"
+    nombre_etudiants.admin_order_field = 'nb_etudiants_actifs'
     
     def nombre_cours(self, obj):
-        count = obj.cours.filter(actif=True).count()
-        return f'{count} cours'
+        return f'{obj.nb_cours_actifs} cours'
     nombre_cours.short_description = "Cours"
+    nombre_cours.admin_order_field = 'nb_cours_actifs'
 
 
 @admin.register(HoraireSupplementaire)
 class HoraireSupplementaireAdmin(admin.ModelAdmin):
     list_display = ('filiere', 'jour_semaine', 'heure_debut', 'heure_fin', 'salle', 'actif')
+    list_select_related = ('filiere', 'salle')
     search_fields = ('filiere__code', 'jour_semaine')
     list_filter = ('filiere__specialite', 'jour_semaine', 'actif')
     ordering = ('filiere', 'jour_semaine', 'heure_debut')
@@ -149,12 +166,23 @@ class EtudiantAdmin(ImportExportModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        # Taux calculé en SQL depuis les compteurs dénormalisés (triable)
+        total = Sum('compteurs_presence__total')
+        presents = Sum(F('compteurs_presence__presents') + F('compteurs_presence__retards'))
+        return super().get_queryset(request).select_related('filiere').annotate(
+            taux_presence=Coalesce(
+                Round(presents * 100.0 / NullIf(total, 0), 2), 0.0, output_field=FloatField(),
+            ),
+        )
+    
     def filiere_complete(self, obj):
         return obj.filiere.nom_complet()
     filiere_complete.short_description = "Filière"
+    filiere_complete.admin_order_field = 'filiere__code'
     
     def taux_presence_display(self, obj):
-        taux = obj.get_taux_presence()
+        taux = obj.taux_presence
         if taux >= 75:
             color = 'green'
         elif taux >= 50:
@@ -163,6 +191,7 @@ class EtudiantAdmin(ImportExportModelAdmin):
             color = 'red'
         return f'<span style="color: {color}; font-weight: bold;">{taux}%</span>'
     taux_presence_display.short_description = "Taux de présence"
+    taux_presence_display.admin_order_field = 'taux_presence'
     taux_presence_display.allow_tags = True
     
     actions = ['activer_etudiants', 'desactiver_etudiants']
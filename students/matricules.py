@@ -0,0 +1,108 @@
+# ============================================
+# students/matricules.py
+# Attribution des matricules département (AAGITSPECNXXXXX)
+# ============================================
+#
+# Un compteur par préfixe (année + GIT + spécialité + niveau) dans la table
+# SequenceMatricule. Réserver des numéros = un UPDATE « dernier_numero + n »
+# puis la relecture de la ligne, dans la même transaction : l'UPDATE verrouille
+# la ligne jusqu'au COMMIT, deux enregistrements concurrents ne peuvent donc
+# pas obtenir le même numéro. Un bloc de n numéros coûte autant qu'un seul :
+# la génération en masse fait quelques requêtes par préfixe, pas par étudiant.
+#
+# À la création d'un préfixe, le compteur part du plus grand numéro déjà
+# attribué (matricules saisis avant le compteur). Un matricule saisi à la main
+# ensuite fait avancer le compteur jusqu'à son numéro (suivre_matricule).
+
+import re
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Length
+
+DEPARTEMENT = 'GIT'
+CHIFFRES = 5
+
+
+def prefixe_matricule(filiere, annee=None):
+    """'25GITGRT3' : année (2 chiffres), département, spécialité (3 lettres), niveau"""
+    annee = annee or datetime.now().year
+    return f"{str(annee)[-2:]}{DEPARTEMENT}{filiere.specialite[:3].upper()}{filiere.niveau[-1]}"
+
+
+def formater_matricule(prefixe, numero):
+    return f"{prefixe}{str(numero).zfill(CHIFFRES)}"
+
+
+def matricule_conforme(matricule, prefixe):
+    """Le matricule appartient-il déjà à ce préfixe ? (inutile d'en réserver un autre)"""
+    return bool(matricule) and re.fullmatch(rf'{re.escape(prefixe)}[0-9]+', matricule) is not None
+
+
+def _plus_grand_numero(prefixe):
+    """Plus grand numéro déjà attribué sous ce préfixe (0 si aucun)"""
+    from .models import Etudiant
+
+    dernier = Etudiant.objects.filter(
+        matricule_departement__startswith=prefixe,
+        matricule_departement__regex=rf'^{re.escape(prefixe)}[0-9]+$',
+    ).order_by(
+        Length('matricule_departement').desc(), '-matricule_departement'
+    ).values_list('matricule_departement', flat=True).first()
+    return int(dernier[len(prefixe):]) if dernier else 0
+
+
+def reserver_numeros(prefixe, nombre=1):
+    """Réserve 'nombre' numéros consécutifs pour le préfixe. Retourne le premier"""
+    from .models import SequenceMatricule
+
+    with transaction.atomic():
+        if not SequenceMatricule.objects.filter(prefixe=prefixe).update(
+                dernier_numero=F('dernier_numero') + nombre):
+            # Premier matricule de ce préfixe : une création concurrente fait
+            # échouer get_or_create sur la clé primaire, qui relit alors la ligne
+            SequenceMatricule.objects.get_or_create(
+                prefixe=prefixe, defaults={'dernier_numero': _plus_grand_numero(prefixe)})
+            SequenceMatricule.objects.filter(prefixe=prefixe).update(
+                dernier_numero=F('dernier_numero') + nombre)
+        dernier = SequenceMatricule.objects.filter(prefixe=prefixe).values_list(
+            'dernier_numero', flat=True).get()
+    return dernier - nombre + 1
+
+
+def suivre_matricule(matricule):
+    """
+    Matricule département saisi à la main : le compteur de son préfixe passe au
+    moins à son numéro, pour ne jamais le réattribuer (une requête, sans effet
+    si le compteur est déjà au-delà ou si le préfixe n'a pas encore de compteur).
+    """
+    from .models import SequenceMatricule
+
+    correspondance = re.fullmatch(rf'([0-9]{{2}}{DEPARTEMENT}[^0-9]{{1,3}}[0-9])([0-9]+)', matricule or '')
+    if correspondance:
+        prefixe, numero = correspondance.group(1), int(correspondance.group(2))
+        SequenceMatricule.objects.filter(prefixe=prefixe, dernier_numero__lt=numero).update(
+            dernier_numero=numero)
+
+
+def attribuer_matricules(etudiants, taille_lot=500):
+    """
+    Attribue un nouveau matricule département à chaque étudiant (filière
+    chargée) : un bloc de numéros par préfixe, puis un bulk_update.
+    Retourne le nombre d'étudiants mis à jour.
+    """
+    from .models import Etudiant
+
+    par_prefixe = {}
+    for etudiant in etudiants:
+        par_prefixe.setdefault(prefixe_matricule(etudiant.filiere), []).append(etudiant)
+
+    with transaction.atomic():
+        for prefixe, groupe in par_prefixe.items():
+            premier = reserver_numeros(prefixe, len(groupe))
+            for numero, etudiant in enumerate(groupe, start=premier):
+                etudiant.matricule_departement = formater_matricule(prefixe, numero)
+        tous = [etudiant for groupe in par_prefixe.values() for etudiant in groupe]
+        Etudiant.objects.bulk_update(tous, ['matricule_departement'], batch_size=taille_lot)
+    return len(tous)
@@ -0,0 +1,87 @@
+# Index de recherche plein texte des étudiants (FTS5 sous SQLite, trigrammes sous PostgreSQL)
+#
+# SQL figé ici : la migration ne dépend pas du code de l'application
+# (students/recherche.py peut évoluer sans réécrire l'historique).
+
+from django.db import migrations
+
+TABLE_FTS = 'students_etudiant_fts'
+COLONNES = 'matricule, matricule_departement, nom, prenom, email'
+NOUVELLES = 'new.matricule, new.matricule_departement, new.nom, new.prenom, new.email'
+ANCIENNES = 'old.matricule, old.matricule_departement, old.nom, old.prenom, old.email'
+TEXTE_PG = (
+    "students_sans_accents(lower(coalesce(matricule, '') || ' ' || coalesce(matricule_departement, '') "
+    "|| ' ' || coalesce(nom, '') || ' ' || coalesce(prenom, '') || ' ' || coalesce(email, '')))"
+)
+
+
+def _fts5_disponible(connection):
+    """SQLite compilé avec FTS5 (absent de certaines distributions)"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def creer_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    # Sans FTS5, pas d'index : la recherche se replie sur icontains
+    if vendor == 'sqlite' and _fts5_disponible(schema_editor.connection):
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {TABLE_FTS} USING fts5({COLONNES}, "
+            f"content='students_etudiant', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER students_etudiant_fts_ai AFTER INSERT ON students_etudiant BEGIN "
+            f"INSERT INTO {TABLE_FTS}(rowid, {COLONNES}) VALUES (new.id, {NOUVELLES}); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER students_etudiant_fts_ad AFTER DELETE ON students_etudiant BEGIN "
+            f"INSERT INTO {TABLE_FTS}({TABLE_FTS}, rowid, {COLONNES}) "
+            f"VALUES ('delete', old.id, {ANCIENNES}); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER students_etudiant_fts_au AFTER UPDATE ON students_etudiant BEGIN "
+            f"INSERT INTO {TABLE_FTS}({TABLE_FTS}, rowid, {COLONNES}) "
+            f"VALUES ('delete', old.id, {ANCIENNES}); "
+            f"INSERT INTO {TABLE_FTS}(rowid, {COLONNES}) VALUES (new.id, {NOUVELLES}); END"
+        )
+        # Indexer les étudiants déjà présents
+        schema_editor.execute(f"INSERT INTO {TABLE_FTS}({TABLE_FTS}) VALUES ('rebuild')")
+
+    elif vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+        # unaccent() n'est pas IMMUTABLE : enveloppe nécessaire pour l'indexer
+        schema_editor.execute(
+            "CREATE OR REPLACE FUNCTION students_sans_accents(text) RETURNS text "
+            "AS $$ SELECT public.unaccent('public.unaccent', $1) $$ "
+            "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX students_etudiant_recherche_trgm ON students_etudiant "
+            f"USING gin (({TEXTE_PG}) gin_trgm_ops)"
+        )
+
+
+def supprimer_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for suffixe in ('ai', 'ad', 'au'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS students_etudiant_fts_{suffixe}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE_FTS}")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS students_etudiant_recherche_trgm")
+        schema_editor.execute("DROP FUNCTION IF EXISTS students_sans_accents(text)")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0005_alter_filiere_niveau'),
+    ]
+
+    operations = [
+        migrations.RunPython(creer_index, supprimer_index),
+    ]
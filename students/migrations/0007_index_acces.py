@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0006_etudiant_recherche_fts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='etudiant',
+            index=models.Index(fields=['filiere', 'actif'], name='etudiant_filiere_actif_idx'),
+        ),
+    ]
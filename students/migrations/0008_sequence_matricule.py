@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0007_index_acces'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SequenceMatricule',
+            fields=[
+                ('prefixe', models.CharField(max_length=15, primary_key=True, serialize=False, verbose_name='Préfixe')),
+                ('dernier_numero', models.PositiveIntegerField(default=0, verbose_name='Dernier numéro')),
+            ],
+            options={
+                'verbose_name': 'Séquence de matricules',
+                'verbose_name_plural': 'Séquences de matricules',
+            },
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Index trigrammes des matricules (FTS5 'trigram' sous SQLite) : recherche par
+# fragment de matricule ('00042' pour 21G00042) sans parcourir la table.
+# Sous PostgreSQL, l'index trigrammes de la migration 0006 couvre déjà les matricules.
+#
+# SQL figé ici : la migration ne dépend pas du code de l'application.
+
+from django.db import migrations
+
+TABLE_FTS = 'students_etudiant_matricule_fts'
+COLONNES = 'matricule, matricule_departement'
+NOUVELLES = 'new.matricule, new.matricule_departement'
+ANCIENNES = 'old.matricule, old.matricule_departement'
+
+
+def _trigram_disponible(connection):
+    """FTS5 compilé, et tokenizer 'trigram' (SQLite 3.34 ou plus récent)"""
+    if connection.Database.sqlite_version_info < (3, 34, 0):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def creer_index(apps, schema_editor):
+    # Sans trigrammes, pas d'index : les fragments de matricule ne sont pas cherchés
+    if schema_editor.connection.vendor != 'sqlite' or not _trigram_disponible(schema_editor.connection):
+        return
+
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE {TABLE_FTS} USING fts5({COLONNES}, "
+        f"content='students_etudiant', content_rowid='id', tokenize='trigram')"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER students_etudiant_matricule_fts_ai AFTER INSERT ON students_etudiant BEGIN "
+        f"INSERT INTO {TABLE_FTS}(rowid, {COLONNES}) VALUES (new.id, {NOUVELLES}); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER students_etudiant_matricule_fts_ad AFTER DELETE ON students_etudiant BEGIN "
+        f"INSERT INTO {TABLE_FTS}({TABLE_FTS}, rowid, {COLONNES}) "
+        f"VALUES ('delete', old.id, {ANCIENNES}); END"
+    )
+    # Seule une modification des matricules réindexe la ligne
+    schema_editor.execute(
+        f"CREATE TRIGGER students_etudiant_matricule_fts_au "
+        f"AFTER UPDATE OF matricule, matricule_departement ON students_etudiant BEGIN "
+        f"INSERT INTO {TABLE_FTS}({TABLE_FTS}, rowid, {COLONNES}) "
+        f"VALUES ('delete', old.id, {ANCIENNES}); "
+        f"INSERT INTO {TABLE_FTS}(rowid, {COLONNES}) VALUES (new.id, {NOUVELLES}); END"
+    )
+    # Indexer les étudiants déjà présents
+    schema_editor.execute(f"INSERT INTO {TABLE_FTS}({TABLE_FTS}) VALUES ('rebuild')")
+
+
+def supprimer_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for suffixe in ('ai', 'ad', 'au'):
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS students_etudiant_matricule_fts_{suffixe}")
+    schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE_FTS}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0008_sequence_matricule'),
+    ]
+
+    operations = [
+        migrations.RunPython(creer_index, supprimer_index),
+    ]
@@ -1,6 +1,6 @@
 from django.db import models
+from django.db.models import F, Sum
 from django.core.validators import MinValueValidator
-from datetime import datetime
 
 
 class Filiere(models.Model):
@@ -167,6 +167,10 @@ class Etudiant(models.Model):
         verbose_name = "Étudiant"
         verbose_name_plural = "Étudiants"
         ordering = ['nom', 'prenom']
+        indexes = [
+            # Étudiants actifs d'une filière (feuilles d'appel, statistiques par classe)
+            models.Index(fields=['filiere', 'actif'], name='etudiant_filiere_actif_idx'),
+        ]
     
     def __str__(self):
         if self.matricule_departement:
@@ -177,13 +181,15 @@ class Etudiant(models.Model):
         return f"{self.prenom} {self.nom}"
     
     def get_taux_presence(self):
-        """Calcule le taux de présence de l'étudiant"""
-        from attendance.models import Presence
-        total = self.presences.count()
+        """Calcule le taux de présence de l'étudiant (lu dans les compteurs dénormalisés)"""
+        totaux = self.compteurs_presence.aggregate(
+            total=Sum('total'),
+            presents=Sum(F('presents') + F('retards')),
+        )
+        total = totaux['total'] or 0
         if total == 0:
             return 0
-        presents = self.presences.filter(statut__in=['P', 'R']).count()
-        return round((presents / total) * 100, 2)
+        return round((totaux['presents'] / total) * 100, 2)
     
     def generer_matricule_departement(self):
         """
@@ -197,55 +203,48 @@ class Etudiant(models.Model):
         
         Exemple : 25GITGRT300001
         """
-        # 1. Année académique (2 derniers chiffres)
-        annee = str(datetime.now().year)[-2:]
+        # Numéro réservé atomiquement dans le compteur du préfixe
+        # (students/matricules.py) : jamais deux fois le même, même en concurrence
+        from .matricules import formater_matricule, matricule_conforme, prefixe_matricule, reserver_numeros
         
-        # 2. Département (fixe)
-        departement = "GIT"
-        
-        # 3. Spécialité (prendre les 3 premières lettres)
-        specialite = self.filiere.specialite[:3].upper()
-        
-        # 4. Niveau (extraire le chiffre de N1, N2, etc.)
-        niveau = self.filiere.niveau[-1]  # N3 → 3
-        
-        # 5. Numéro incrémental
-        # Chercher le dernier matricule avec ce pattern
-        pattern_base = f"{annee}{departement}{specialite}{niveau}"
-        
-        # Récupérer tous les matricules qui commencent par ce pattern
-        derniers_matricules = Etudiant.objects.filter(
-            matricule_departement__startswith=pattern_base
-        ).exclude(
-            id=self.id  # Exclure l'étudiant actuel si on régénère
-        ).values_list('matricule_departement', flat=True)
-        
-        # Trouver le numéro le plus élevé
-        max_numero = 0
-        for mat in derniers_matricules:
-            try:
-                # Extraire les 5 derniers chiffres
-                numero = int(mat[-5:])
-                if numero > max_numero:
-                    max_numero = numero
-            except (ValueError, IndexError):
-                continue
-        
-        # Incrémenter et formater sur 5 chiffres
-        nouveau_numero = max_numero + 1
-        numero_formate = str(nouveau_numero).zfill(5)
-        
-        # 6. Assembler le matricule complet
-        matricule_complet = f"{pattern_base}{numero_formate}"
-        
-        return matricule_complet
+        prefixe = prefixe_matricule(self.filiere)
+        # Matricule déjà au bon préfixe (même année, spécialité, niveau) : conservé
+        if matricule_conforme(self.matricule_departement, prefixe):
+            return self.matricule_departement
+        return formater_matricule(prefixe, reserver_numeros(prefixe))
     
     def save(self, *args, **kwargs):
         """
         Générer automatiquement le matricule département si absent
         """
+        from .matricules import suivre_matricule
+        
         # Générer le matricule département si vide
         if not self.matricule_departement and self.filiere:
             self.matricule_departement = self.generer_matricule_departement()
+        elif self.matricule_departement != getattr(self, '_matricule_departement_charge', None):
+            # Saisi ou modifié à la main : le compteur ne doit jamais le réattribuer
+            suivre_matricule(self.matricule_departement)
         
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+        self._matricule_departement_charge = self.matricule_departement
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        etudiant = super().from_db(db, field_names, values)
+        # Matricule département chargé : save() sait s'il a été modifié
+        etudiant._matricule_departement_charge = etudiant.__dict__.get('matricule_departement')
+        return etudiant
+
+
+class SequenceMatricule(models.Model):
+    """Dernier numéro attribué par préfixe de matricule département (AAGITSPECN)"""
+    prefixe = models.CharField(max_length=15, primary_key=True, verbose_name="Préfixe")
+    dernier_numero = models.PositiveIntegerField(default=0, verbose_name="Dernier numéro")
+    
+    class Meta:
+        verbose_name = "Séquence de matricules"
+        verbose_name_plural = "Séquences de matricules"
+    
+    def __str__(self):
+        return f"{self.prefixe} : {self.dernier_numero}"
@@ -0,0 +1,107 @@
+# ============================================
+# students/recherche.py
+# Recherche plein texte des étudiants (index partagé par toutes les listes)
+# ============================================
+#
+# - SQLite : table virtuelle FTS5 'students_etudiant_fts' (contenu externe,
+#   tokenizer unicode61 sans accents), tenue à jour par des triggers sur
+#   students_etudiant : toute écriture (save, bulk_create, update...) est indexée.
+# - PostgreSQL : index GIN trigrammes (pg_trgm) sur le texte sans accents.
+# - Autres moteurs, ou SQLite compilé sans FTS5 (la migration n'a alors pas
+#   créé la table) : repli sur icontains.
+#
+# Champs indexés : matricule, matricule_departement, nom, prénom, email.
+# Un terme d'un seul mot (3 caractères au moins) est aussi cherché en
+# sous-chaîne dans les matricules, par la table FTS5 'trigram'
+# 'students_etudiant_matricule_fts' (SQLite 3.34+ ; sans elle, les matricules
+# ne sont cherchés que par préfixe). Les trigrammes PostgreSQL le font déjà.
+# Les index et leurs triggers sont créés par les migrations students 0006 et 0009.
+
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+TABLE_FTS = 'students_etudiant_fts'
+TABLE_FTS_MATRICULE = 'students_etudiant_matricule_fts'
+CHAMPS_RECHERCHE = ['matricule', 'matricule_departement', 'nom', 'prenom', 'email']
+TAILLE_MIN_FRAGMENT = 3   # un trigramme
+
+_SQL_TEXTE_PG = (
+    "students_sans_accents(lower("
+    + " || ' ' || ".join(f"coalesce({champ}, '')" for champ in CHAMPS_RECHERCHE)
+    + "))"
+)
+
+_tables_disponibles = {}   # (nom de la base, table) -> table présente
+
+
+def _table_disponible(table):
+    """La table FTS existe-t-elle dans cette base ? (vérifié une fois par base)"""
+    cle = (connection.settings_dict['NAME'], table)
+    if cle not in _tables_disponibles:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [table])
+            _tables_disponibles[cle] = cursor.fetchone() is not None
+    return _tables_disponibles[cle]
+
+
+def _index_fts_disponible():
+    """Table FTS principale présente (sinon repli sur icontains)"""
+    return _table_disponible(TABLE_FTS)
+
+
+def _requete_fts(terme):
+    """
+    Transforme la saisie utilisateur en requête FTS5 : chaque mot devient un
+    préfixe entre guillemets ("dup"* trouve Dupont), les mots sont combinés en ET.
+    """
+    mots = [mot.replace('"', '""') for mot in terme.split() if re.search(r'\w', mot)]
+    return ' '.join(f'"{mot}"*' for mot in mots)
+
+
+def _echapper_like(mot):
+    """'%' et '_' saisis par l'utilisateur sont des caractères, pas des jokers LIKE"""
+    return mot.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def rechercher_etudiants(queryset, terme, prefixe=''):
+    """
+    Filtre un queryset sur les étudiants correspondant à la recherche.
+
+    prefixe : chemin vers l'étudiant depuis le modèle du queryset
+    ('' pour Etudiant, 'etudiant__' pour Presence ou Justificatif).
+    """
+    terme = (terme or '').strip()
+    if not terme:
+        return queryset
+
+    if connection.vendor == 'sqlite' and _index_fts_disponible():
+        requete = _requete_fts(terme)
+        if not requete:
+            return queryset.none()
+        sql, params = f"SELECT rowid FROM {TABLE_FTS} WHERE {TABLE_FTS} MATCH %s", [requete]
+        if (len(terme.split()) == 1 and len(terme) >= TAILLE_MIN_FRAGMENT
+                and _table_disponible(TABLE_FTS_MATRICULE)):
+            # FTS5 ne cherche que des préfixes : fragment de matricule
+            # ('00042' pour 21G00042) par l'index trigrammes
+            sql += (f" UNION SELECT rowid FROM {TABLE_FTS_MATRICULE} "
+                    f"WHERE {TABLE_FTS_MATRICULE} MATCH %s")
+            params.append('"{}"'.format(terme.replace('"', '""')))
+        return queryset.filter(**{f'{prefixe}id__in': RawSQL(sql, params)})
+
+    if connection.vendor == 'postgresql':
+        for mot in terme.split():
+            ids = RawSQL(
+                f"SELECT id FROM students_etudiant WHERE {_SQL_TEXTE_PG} "
+                f"LIKE '%%' || students_sans_accents(lower(%s)) || '%%' ESCAPE '\\'",
+                [_echapper_like(mot)],
+            )
+            queryset = queryset.filter(**{f'{prefixe}id__in': ids})
+        return queryset
+
+    condition = Q()
+    for champ in CHAMPS_RECHERCHE:
+        condition |= Q(**{f'{prefixe}{champ}__icontains': terme})
+    return queryset.filter(condition)
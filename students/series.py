@@ -0,0 +1,109 @@
+# ============================================
+# students/series.py
+# Séries de présence d'un étudiant (graphiques de la fiche détail)
+# ============================================
+#
+# Deux requêtes GROUP BY, quel que soit le nombre de séances suivies :
+#   - (semestre, année académique) sur tout l'historique : totaux et séries
+#     par semestre et par année, quelques lignes ;
+#   - (mois, semaine) limitée à la fenêtre affichée (NB_MOIS derniers mois,
+#     NB_SEMAINES dernières semaines) : au plus une quarantaine de lignes.
+
+from datetime import date, timedelta
+
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth, TruncWeek
+
+NB_MOIS = 6
+NB_SEMAINES = 8
+STATUTS_PRESENTS = ['P', 'R']
+
+
+def couleur_taux(taux):
+    """Couleur Chart.js selon le taux (vert >= 90, jaune >= 70, rouge sinon)"""
+    if taux >= 90:
+        return 'rgba(40, 167, 69, 0.8)'
+    if taux >= 70:
+        return 'rgba(255, 193, 7, 0.8)'
+    return 'rgba(220, 53, 69, 0.8)'
+
+
+def _taux(presents, total):
+    return round(presents / total * 100, 2) if total else 0
+
+
+def _serie(buckets, libelle):
+    """{cle: [total, presents]} -> tableaux compacts {labels, taux, couleurs}"""
+    taux = [_taux(presents, total) for total, presents in buckets.values()]
+    return {
+        'labels': [libelle(cle) for cle in buckets],
+        'taux': taux,
+        'couleurs': [couleur_taux(t) for t in taux],
+    }
+
+
+def _ajouter(buckets, cle, ligne, creer=False):
+    """Ajoute total / présents de la ligne au bucket 'cle' (hors fenêtre : ignoré sauf si creer)"""
+    if cle not in buckets:
+        if not creer:
+            return
+        buckets[cle] = [0, 0]
+    buckets[cle][0] += ligne['total']
+    buckets[cle][1] += ligne['presents']
+
+
+def _premiers_des_mois(jour, nombre):
+    """Premiers jours des 'nombre' derniers mois calendaires (mois courant inclus)"""
+    mois = []
+    annee, numero = jour.year, jour.month
+    for _ in range(nombre):
+        mois.append(date(annee, numero, 1))
+        annee, numero = (annee, numero - 1) if numero > 1 else (annee - 1, 12)
+    return mois[::-1]
+
+
+def series_presences(presences, aujourd_hui=None):
+    """
+    Totaux et séries d'un queryset de présences (celles d'un étudiant).
+    Retourne {'totaux': {...}, 'mois', 'semaines', 'semestres', 'annees': {labels, taux, couleurs}}.
+    """
+    aujourd_hui = aujourd_hui or date.today()
+    lundi = aujourd_hui - timedelta(days=aujourd_hui.weekday())
+    mois = {debut: [0, 0] for debut in _premiers_des_mois(aujourd_hui, NB_MOIS)}
+    semaines = {lundi - timedelta(weeks=i): [0, 0] for i in range(NB_SEMAINES - 1, -1, -1)}
+    semestres, annees = {}, {}
+    totaux = dict.fromkeys(['total', 'presents', 'absents', 'retards', 'justifies'], 0)
+
+    agregats = {
+        'total': Count('id'),
+        'presents': Count('id', filter=Q(statut__in=STATUTS_PRESENTS)),
+    }
+    par_periode = presences.order_by().values(
+        'seance__cours__semestre', 'seance__cours__annee_academique',
+    ).annotate(
+        **agregats,
+        absents=Count('id', filter=Q(statut='A')),
+        retards=Count('id', filter=Q(statut='R')),
+        justifies=Count('id', filter=Q(statut='J')),
+    )
+    for ligne in par_periode:
+        for champ in totaux:
+            totaux[champ] += ligne[champ]
+        _ajouter(semestres, ligne['seance__cours__semestre'], ligne, creer=True)
+        _ajouter(annees, ligne['seance__cours__annee_academique'], ligne, creer=True)
+
+    debut_fenetre = min(next(iter(mois)), next(iter(semaines)))
+    par_date = presences.filter(seance__date__gte=debut_fenetre).annotate(
+        mois=TruncMonth('seance__date'), semaine=TruncWeek('seance__date'),
+    ).order_by().values('mois', 'semaine').annotate(**agregats)
+    for ligne in par_date:
+        _ajouter(mois, ligne['mois'], ligne)
+        _ajouter(semaines, ligne['semaine'], ligne)
+
+    return {
+        'totaux': totaux,
+        'mois': _serie(mois, lambda debut: debut.strftime('%b %Y')),
+        'semaines': _serie(semaines, lambda debut: f"S{debut.isocalendar()[1]}"),
+        'semestres': _serie(dict(sorted(semestres.items())), lambda semestre: f"Semestre {semestre}"),
+        'annees': _serie(dict(sorted(annees.items())), str),
+    }
@@ -1,3 +1,202 @@
+from datetime import date, timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from attendance.models import Presence
+from attendance.tests import creer_filiere_avec_etudiants
+from courses.models import SeanceCours
+from .matricules import attribuer_matricules, prefixe_matricule
+from .models import Etudiant, Filiere, SequenceMatricule
+from .recherche import _echapper_like, rechercher_etudiants
+from .series import series_presences
+
+
+class RechercheEtudiantsTests(TestCase):
+    """Index plein texte des étudiants (sans accents, tenu à jour à l'écriture)"""
+
+    def setUp(self):
+        self.filiere = Filiere.objects.create(specialite='GI', formation='FI', niveau='N3')
+        self.helene = Etudiant.objects.create(
+            matricule='21G00001', nom='Ngué', prenom='Hélène',
+            email='helene@test.cm', filiere=self.filiere,
+        )
+        self.paul = Etudiant.objects.create(
+            matricule='21G00002', nom='Mbarga', prenom='Paul', filiere=self.filiere,
+        )
+
+    def rechercher(self, terme):
+        return set(rechercher_etudiants(Etudiant.objects.all(), terme))
+
+    def test_accents_et_prefixes(self):
+        self.assertEqual(self.rechercher('helene'), {self.helene})
+        self.assertEqual(self.rechercher('NGUE'), {self.helene})
+        self.assertEqual(self.rechercher('mbar'), {self.paul})
+        self.assertEqual(self.rechercher('21G'), {self.helene, self.paul})
+        self.assertEqual(self.rechercher('paul 21g'), {self.paul})
+        self.assertEqual(self.rechercher('"'), set())
+
+    def test_fragment_de_matricule(self):
+        self.assertEqual(self.rechercher('00001'), {self.helene})
+        self.assertEqual(self.rechercher('G0000'), {self.helene, self.paul})
+        self.assertEqual(self.rechercher('00001 paul'), set())
+        # Le fragment suit les modifications du matricule
+        Etudiant.objects.filter(pk=self.paul.pk).update(matricule='22H00777')
+        self.assertEqual(self.rechercher('0077'), {self.paul})
+        self.assertEqual(self.rechercher('G0000'), {self.helene})
+
+    def test_echappement_like_postgresql(self):
+        self.assertEqual(_echapper_like('50%_a\\b'), '50\\%\\_a\\\\b')
+
+    def test_index_suit_les_modifications(self):
+        self.paul.nom = 'Essomba'
+        self.paul.save()
+        Etudiant.objects.filter(pk=self.helene.pk).update(prenom='Ariane')
+        self.assertEqual(self.rechercher('mbarga'), set())
+        self.assertEqual(self.rechercher('essomba'), {self.paul})
+        self.assertEqual(self.rechercher('ariane'), {self.helene})
+        self.paul.delete()
+        self.assertEqual(self.rechercher('essomba'), set())
+
+    def test_sans_fts5(self):
+        # SQLite sans FTS5 : la migration ne crée pas la table, repli sur icontains
+        with mock.patch('students.recherche._index_fts_disponible', return_value=False):
+            self.assertEqual(self.rechercher('Mbar'), {self.paul})
+            self.assertEqual(self.rechercher('00001'), {self.helene})
+
+    def test_liste_etudiants(self):
+        user = User.objects.create_superuser('admin', 'admin@test.cm', 'pass')
+        self.client.force_login(user)
+        response = self.client.get(reverse('liste_etudiants'), {'search': 'hélène'})
+        self.assertEqual(list(response.context['page_obj']), [self.helene])
+
+
+class SeriesDetailEtudiantTests(TestCase):
+    """Graphiques de la fiche étudiant : deux requêtes GROUP BY, quel que soit l'historique"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@test.cm', 'pass')
+        self.client.force_login(self.user)
+
+    def _etudiant_avec_seances(self, nb_seances, niveau, aujourd_hui):
+        seance, (etudiant,) = creer_filiere_avec_etudiants(1, niveau=niveau)
+        seances = SeanceCours.objects.bulk_create([
+            SeanceCours(cours=seance.cours, date=aujourd_hui - timedelta(days=3 * i),
+                        heure_debut=seance.heure_debut, heure_fin=seance.heure_fin)
+            for i in range(nb_seances)
+        ])
+        Presence.objects.bulk_create([
+            Presence(etudiant=etudiant, seance=s, date_seance=s.date, statut='A' if i % 4 == 0 else 'P')
+            for i, s in enumerate(seances)
+        ])
+        return etudiant
+
+    def test_series(self):
+        aujourd_hui = date(2025, 3, 12)  # mercredi
+        etudiant = self._etudiant_avec_seances(8, 'N3', aujourd_hui)
+        series = series_presences(Presence.objects.filter(etudiant=etudiant), aujourd_hui)
+
+        self.assertEqual(series['totaux']['total'], 8)
+        self.assertEqual(series['totaux']['absents'], 2)
+        self.assertEqual(series['mois']['labels'][-2:], ['Feb 2025', 'Mar 2025'])
+        # Mars : 12, 09, 06, 03 (une absence) ; février : 28, 25, 22, 19 (une absence)
+        self.assertEqual(series['mois']['taux'], [0, 0, 0, 0, 75.0, 75.0])
+        self.assertEqual(series['semaines']['labels'][-1], 'S11')
+        self.assertEqual(series['semaines']['taux'][-2:], [100.0, 0.0])  # 03-06-09 / 12 (absence)
+        self.assertEqual(series['semestres']['labels'], ['Semestre 1'])
+        self.assertEqual(series['annees'], {'labels': ['2024-2025'], 'taux': [75.0],
+                                            'couleurs': ['rgba(255, 193, 7, 0.8)']})
+
+    def test_historique_hors_fenetre(self):
+        aujourd_hui = date(2025, 3, 12)
+        etudiant = self._etudiant_avec_seances(60, 'N3', aujourd_hui)  # depuis septembre 2024
+        presences = Presence.objects.filter(etudiant=etudiant)
+        series = series_presences(presences, aujourd_hui)
+        self.assertEqual(series['totaux']['total'], 60)
+        self.assertEqual(len(series['mois']['labels']), 6)
+        # Les séries par mois et semaine ne lisent que la fenêtre affichée
+        with CaptureQueriesContext(connection) as requetes:
+            series_presences(presences, aujourd_hui)
+        self.assertEqual(len(requetes), 2)
+        self.assertIn('2024-10-01', requetes[1]['sql'])
+
+    def test_nombre_de_requetes_independant_de_l_historique(self):
+        nombres = []
+        for nb_seances, niveau in ((3, 'N3'), (120, 'N4')):
+            etudiant = self._etudiant_avec_seances(nb_seances, niveau, date.today())
+            with CaptureQueriesContext(connection) as requetes:
+                response = self.client.get(reverse('detail_etudiant', args=[etudiant.matricule]))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context['total_seances'], nb_seances)
+            nombres.append(len(requetes))
+        self.assertEqual(nombres[0], nombres[1])
+
+
+class MatriculesDepartementTests(TestCase):
+    """Compteur par préfixe : numéros uniques, blocs pour la génération en masse"""
+
+    def setUp(self):
+        self.filiere = Filiere.objects.create(specialite='GI', formation='FI', niveau='N3')
+        self.prefixe = prefixe_matricule(self.filiere)
+
+    def creer(self, numero, **champs):
+        return Etudiant.objects.create(matricule=f"M{numero:05d}", nom=f"Nom{numero:05d}", prenom="Test",
+                                       filiere=self.filiere, **champs)
+
+    def test_numeros_consecutifs_depuis_l_existant(self):
+        # Matricule saisi avant le compteur : la séquence repart de son numéro
+        self.creer(0, matricule_departement=f"{self.prefixe}00041")
+        self.assertEqual(self.creer(1).matricule_departement, f"{self.prefixe}00042")
+        self.assertEqual(self.creer(2).matricule_departement, f"{self.prefixe}00043")
+        self.assertEqual(SequenceMatricule.objects.get(prefixe=self.prefixe).dernier_numero, 43)
+
+        # Régénération d'un matricule déjà au bon préfixe : conservé, aucun numéro consommé
+        etudiant = Etudiant.objects.get(matricule='M00001')
+        self.assertEqual(etudiant.generer_matricule_departement(), f"{self.prefixe}00042")
+        # Autre préfixe (changement de niveau) : nouveau numéro
+        etudiant.matricule_departement = "24GITGI300007"
+        self.assertEqual(etudiant.generer_matricule_departement(), f"{self.prefixe}00044")
+
+    def test_saisie_manuelle_fait_avancer_le_compteur(self):
+        self.assertEqual(self.creer(1).matricule_departement, f"{self.prefixe}00001")
+        # Saisie à la main au-delà du compteur (admin, import)
+        self.creer(2, matricule_departement=f"{self.prefixe}00050")
+        self.assertEqual(self.creer(3).matricule_departement, f"{self.prefixe}00051")
+        # En deçà : le compteur ne recule pas
+        self.creer(4, matricule_departement=f"{self.prefixe}00010")
+        self.assertEqual(self.creer(5).matricule_departement, f"{self.prefixe}00052")
+
+        # Modification ordinaire : le compteur n'est pas touché
+        etudiant = Etudiant.objects.get(matricule='M00002')
+        etudiant.prenom = 'Modifié'
+        with CaptureQueriesContext(connection) as requetes:
+            etudiant.save()
+        self.assertFalse(any('students_sequencematricule' in q['sql'] for q in requetes.captured_queries))
+        # Matricule modifié à la main : suivi
+        etudiant.matricule_departement = f"{self.prefixe}00060"
+        etudiant.save()
+        self.assertEqual(self.creer(6).matricule_departement, f"{self.prefixe}00061")
+
+    def test_generation_en_masse_en_requetes_constantes(self):
+        autre = Filiere.objects.create(specialite='GT', formation='FI', niveau='N1')
+        Etudiant.objects.bulk_create(
+            [Etudiant(matricule=f"M{i:05d}", nom=f"Nom{i:05d}", prenom="Test",
+                      filiere=self.filiere if i % 2 else autre) for i in range(2000)]
+        )
+        etudiants = Etudiant.objects.filter(matricule_departement__isnull=True).select_related('filiere')
+        with CaptureQueriesContext(connection) as requetes:
+            self.assertEqual(attribuer_matricules(etudiants), 2000)
+        # Par préfixe : UPDATE, création (SELECT, max existant, INSERT), UPDATE,
+        # relecture, avec leurs savepoints ; puis 4 lots de bulk_update.
+        # Indépendant du nombre d'étudiants.
+        self.assertLessEqual(len(requetes), 30)
+
+        matricules = list(Etudiant.objects.values_list('matricule_departement', flat=True))
+        self.assertEqual(len(set(matricules)), 2000)
+        self.assertIn(f"{self.prefixe}01000", matricules)
+        self.assertEqual(SequenceMatricule.objects.get(prefixe=self.prefixe).dernier_numero, 1000)
 
-# Create your tests here.
@@ -4,11 +4,12 @@ from django.contrib import messages
 from django.db.models import Q, Count, Avg
 from django.core.paginator import Paginator
 from .models import Etudiant, Filiere, HoraireSupplementaire
+from .matricules import attribuer_matricules
+from .recherche import rechercher_etudiants
+from .series import series_presences
 from attendance.models import Presence
 from django.http import JsonResponse
-from django.db import transaction
 
-from datetime import datetime, timedelta
 import json
 
 
@@ -24,13 +25,7 @@ def liste_etudiants(request):
     # Recherche
     search_query = request.GET.get('search', '')
     if search_query:
-        etudiants = etudiants.filter(
-            Q(matricule__icontains=search_query) |
-            Q(matricule_departement__icontains=search_query) |
-            Q(nom__icontains=search_query) |
-            Q(prenom__icontains=search_query) |
-            Q(email__icontains=search_query)
-        )
+        etudiants = rechercher_etudiants(etudiants, search_query)
     
     # Filtres
     filiere_id = request.GET.get('filiere')
@@ -75,12 +70,14 @@ def detail_etudiant(request, matricule):
     # Récupérer toutes les présences de l'étudiant
     presences = Presence.objects.filter(etudiant=etudiant).select_related('seance__cours')
     
-    # === STATISTIQUES GLOBALES ===
-    total_seances = presences.count()
-    presents = presences.filter(statut__in=['P', 'R']).count()
-    absents = presences.filter(statut='A').count()
-    retards = presences.filter(statut='R').count()
-    justifies = presences.filter(statut='J').count()
+    # === STATISTIQUES GLOBALES ET SÉRIES (deux requêtes GROUP BY) ===
+    series = series_presences(presences)
+    totaux = series['totaux']
+    total_seances = totaux['total']
+    presents = totaux['presents']
+    absents = totaux['absents']
+    retards = totaux['retards']
+    justifies = totaux['justifies']
     
     taux_presence = round((presents / total_seances * 100), 2) if total_seances > 0 else 0
     
@@ -135,114 +132,6 @@ def detail_etudiant(request, matricule):
         cours_absents.append(absents_count)
         cours_colors.append(color)
     
-    # === STATISTIQUES PAR MOIS (6 derniers mois) ===
-    mois_labels = []
-    mois_taux = []
-    mois_colors = []
-    
-    for i in range(5, -1, -1):
-        date_debut = datetime.now() - timedelta(days=30*i)
-        date_fin = datetime.now() - timedelta(days=30*(i-1)) if i > 0 else datetime.now()
-        
-        presences_mois = presences.filter(
-            seance__date__gte=date_debut.date(),
-            seance__date__lte=date_fin.date()
-        )
-        
-        total_mois = presences_mois.count()
-        presents_mois = presences_mois.filter(statut__in=['P', 'R']).count()
-        taux_mois = round((presents_mois / total_mois * 100), 2) if total_mois > 0 else 0
-        
-        # Code couleur
-        if taux_mois >= 90:
-            color = 'rgba(40, 167, 69, 0.8)'  # Vert
-        elif taux_mois >= 70:
-            color = 'rgba(255, 193, 7, 0.8)'  # Jaune
-        else:
-            color = 'rgba(220, 53, 69, 0.8)'  # Rouge
-        
-        mois_labels.append(date_debut.strftime('%b %Y'))
-        mois_taux.append(taux_mois)
-        mois_colors.append(color)
-    
-    # === STATISTIQUES PAR SEMAINE (8 dernières semaines) ===
-    semaine_labels = []
-    semaine_taux = []
-    semaine_colors = []
-    
-    for i in range(7, -1, -1):
-        date_debut = datetime.now() - timedelta(weeks=i)
-        date_fin = datetime.now() - timedelta(weeks=i-1) if i > 0 else datetime.now()
-        
-        presences_semaine = presences.filter(
-            seance__date__gte=date_debut.date(),
-            seance__date__lte=date_fin.date()
-        )
-        
-        total_semaine = presences_semaine.count()
-        presents_semaine = presences_semaine.filter(statut__in=['P', 'R']).count()
-        taux_semaine = round((presents_semaine / total_semaine * 100), 2) if total_semaine > 0 else 0
-        
-        # Code couleur
-        if taux_semaine >= 90:
-            color = 'rgba(40, 167, 69, 0.8)'
-        elif taux_semaine >= 70:
-            color = 'rgba(255, 193, 7, 0.8)'
-        else:
-            color = 'rgba(220, 53, 69, 0.8)'
-        
-        semaine_labels.append(f"S{date_debut.isocalendar()[1]}")
-        semaine_taux.append(taux_semaine)
-        semaine_colors.append(color)
-    
-    # === STATISTIQUES PAR SEMESTRE ===
-    semestre_labels = []
-    semestre_taux = []
-    semestre_colors = []
-    
-    for semestre in range(1, 9):  # 8 semestres
-        presences_semestre = presences.filter(seance__cours__semestre=semestre)
-        total_sem = presences_semestre.count()
-        presents_sem = presences_semestre.filter(statut__in=['P', 'R']).count()
-        taux_sem = round((presents_sem / total_sem * 100), 2) if total_sem > 0 else 0
-        
-        if total_sem > 0:  # Seulement si l'étudiant a des cours ce semestre
-            # Code couleur
-            if taux_sem >= 90:
-                color = 'rgba(40, 167, 69, 0.8)'
-            elif taux_sem >= 70:
-                color = 'rgba(255, 193, 7, 0.8)'
-            else:
-                color = 'rgba(220, 53, 69, 0.8)'
-            
-            semestre_labels.append(f"Semestre {semestre}")
-            semestre_taux.append(taux_sem)
-            semestre_colors.append(color)
-    
-    # === STATISTIQUES PAR ANNÉE ACADÉMIQUE ===
-    annees = presences.values_list('seance__cours__annee_academique', flat=True).distinct().order_by('seance__cours__annee_academique')
-    annee_labels = []
-    annee_taux = []
-    annee_colors = []
-    
-    for annee in annees:
-        presences_annee = presences.filter(seance__cours__annee_academique=annee)
-        total_annee = presences_annee.count()
-        presents_annee = presences_annee.filter(statut__in=['P', 'R']).count()
-        taux_annee = round((presents_annee / total_annee * 100), 2) if total_annee > 0 else 0
-        
-        # Code couleur
-        if taux_annee >= 90:
-            color = 'rgba(40, 167, 69, 0.8)'
-        elif taux_annee >= 70:
-            color = 'rgba(255, 193, 7, 0.8)'
-        else:
-            color = 'rgba(220, 53, 69, 0.8)'
-        
-        annee_labels.append(annee)
-        annee_taux.append(taux_annee)
-        annee_colors.append(color)
-    
     # === FILTRES POUR L'HISTORIQUE ===
     presences_historique = presences.order_by('-seance__date')
     
@@ -305,21 +194,21 @@ def detail_etudiant(request, matricule):
         'cours_absents_json': json.dumps(cours_absents),
         'cours_colors_json': json.dumps(cours_colors),
         
-        'mois_labels_json': json.dumps(mois_labels),
-        'mois_taux_json': json.dumps(mois_taux),
-        'mois_colors_json': json.dumps(mois_colors),
+        'mois_labels_json': json.dumps(series['mois']['labels']),
+        'mois_taux_json': json.dumps(series['mois']['taux']),
+        'mois_colors_json': json.dumps(series['mois']['couleurs']),
         
-        'semaine_labels_json': json.dumps(semaine_labels),
-        'semaine_taux_json': json.dumps(semaine_taux),
-        'semaine_colors_json': json.dumps(semaine_colors),
+        'semaine_labels_json': json.dumps(series['semaines']['labels']),
+        'semaine_taux_json': json.dumps(series['semaines']['taux']),
+        'semaine_colors_json': json.dumps(series['semaines']['couleurs']),
         
-        'semestre_labels_json': json.dumps(semestre_labels),
-        'semestre_taux_json': json.dumps(semestre_taux),
-        'semestre_colors_json': json.dumps(semestre_colors),
+        'semestre_labels_json': json.dumps(series['semestres']['labels']),
+        'semestre_taux_json': json.dumps(series['semestres']['taux']),
+        'semestre_colors_json': json.dumps(series['semestres']['couleurs']),
         
-        'annee_labels_json': json.dumps(annee_labels),
-        'annee_taux_json': json.dumps(annee_taux),
-        'annee_colors_json': json.dumps(annee_colors),
+        'annee_labels_json': json.dumps(series['annees']['labels']),
+        'annee_taux_json': json.dumps(series['annees']['taux']),
+        'annee_colors_json': json.dumps(series['annees']['couleurs']),
     }
     
     return render(request, 'students/detail_etudiant.html', context)
@@ -446,6 +335,10 @@ def generer_matricule_etudiant(request, matricule):
             # Générer le nouveau matricule
             nouveau_matricule = etudiant.generer_matricule_departement()
             
+            if nouveau_matricule == etudiant.matricule_departement:
+                messages.info(request, f'ℹ️ Le matricule {nouveau_matricule} est déjà à jour.')
+                return redirect('detail_etudiant', matricule=matricule)
+            
             # Vérifier qu'il est unique
             if Etudiant.objects.filter(matricule_departement=nouveau_matricule).exclude(id=etudiant.id).exists():
                 messages.error(request, f'❌ Erreur : Le matricule {nouveau_matricule} existe déjà.')
@@ -491,24 +384,9 @@ def generer_matricules_masse(request):
                 messages.info(request, 'ℹ️ Tous les étudiants ont déjà un matricule département.')
                 return redirect('liste_etudiants')
             
-            # Générer les matricules
-            succes = 0
-            erreurs = 0
-            
-            with transaction.atomic():
-                for etudiant in etudiants_sans_matricule:
-                    try:
-                        etudiant.matricule_departement = etudiant.generer_matricule_departement()
-                        etudiant.save()
-                        succes += 1
-                    except Exception as e:
-                        erreurs += 1
-                        print(f"Erreur pour {etudiant.matricule}: {e}")
-            
-            if erreurs == 0:
-                messages.success(request, f'✅ {succes} matricules générés avec succès.')
-            else:
-                messages.warning(request, f'⚠️ {succes} matricules générés, {erreurs} erreurs.')
+            # Un bloc de numéros par préfixe, puis une mise à jour groupée
+            succes = attribuer_matricules(etudiants_sans_matricule.order_by('filiere', 'nom', 'prenom'))
+            messages.success(request, f'✅ {succes} matricules générés avec succès.')
             
             return redirect('liste_etudiants')
         
@@ -541,6 +419,14 @@ def generer_matricule_ajax(request, matricule):
     try:
         nouveau_matricule = etudiant.generer_matricule_departement()
         
+        if nouveau_matricule == etudiant.matricule_departement:
+            return JsonResponse({
+                'success': True,
+                'matricule': nouveau_matricule,
+                'ancien_matricule': nouveau_matricule,
+                'message': f'Matricule déjà à jour : {nouveau_matricule}'
+            })
+        
         # Vérifier unicité
         if Etudiant.objects.filter(matricule_departement=nouveau_matricule).exclude(id=etudiant.id).exists():
             return JsonResponse({
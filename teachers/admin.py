@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.models import User
+from django.db.models import Count, Q
 from import_export import resources
 from import_export.admin import ImportExportModelAdmin
 from .models import Enseignant
@@ -68,9 +69,15 @@ class EnseignantAdmin(ImportExportModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            nb_cours_actifs=Count('cours', filter=Q(cours__actif=True)),
+        )
+    
     def nombre_cours(self, obj):
-        return obj.get_nombre_cours()
+        return obj.nb_cours_actifs
     nombre_cours.short_description = "Nb cours"
+    nombre_cours.admin_order_field = 'nb_cours_actifs'
     
     actions = ['activer_enseignants', 'desactiver_enseignants', 'reinitialiser_mot_de_passe']
     